@@ -1,22 +1,55 @@
-from typing import Optional
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+import asyncio
 import os
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Header, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, StreamingResponse
 from dotenv import load_dotenv
+from pydantic import ValidationError
 
-from core.models import CortexRequest, CortexResponse, CortexResult
-from flows.lead_sales.flow import run_lead_sales_flow
+from core.compression import GzipMiddleware
+from core.event_stream import NDJSON_MEDIA_TYPE, SSE_MEDIA_TYPE, frame, wants_sse
+from core.idempotency import IDEMPOTENCY_IN_PROGRESS, Compute, IdempotencyInProgress, get_idempotency_store
+from core.models import AbcpCacheEntry, AbcpCachePut, CortexPayload, CortexRequest, CortexResponse, CortexResult
+from core.price_cache import AbcpPriceCache, get_price_cache, normalize_price_oem
+from core.request_body import abcp_compact_enabled, parse_msgpack_body, read_request_json
+from core.session_cache import SESSION_RESYNC_REQUIRED, get_session_cache
+from core.wire import MsgpackResponse, is_msgpack_content, msgpack_available, prefers_msgpack
+from flows.lead_sales.flow import (
+    DECISION_FIELDS,
+    LeadSalesTurn,
+    complete_lead_sales,
+    decision_of,
+    prepare_lead_sales,
+    preview_lead_sales,
+    run_lead_sales_flow,
+)
+from flows.lead_sales.parsers.oem_index import persist_oem_index
 
 # Подтягиваем переменные из .env (OPENAI_API_KEY, HF_CORTEX_PORT, HF_CORTEX_TOKEN и т.д.)
 load_dotenv()
 
 HF_CORTEX_TOKEN = os.getenv("HF_CORTEX_TOKEN")
 
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+    yield
+    # Индекс форматов OEM, дообученный на ответах ABCP, — обратно в HF_CORTEX_OEM_INDEX_FILE
+    persist_oem_index(force=True)
+
+
 app = FastAPI(
     title="HF-CORTEX for Rozatti",
     version="1.0.0",
     description="HF-CORTEX (flow=lead_sales) — Cortex-ядро для Rozatti Bitrix Bot Core",
+    lifespan=lifespan,
 )
+# gzip крупных ответов (HF_CORTEX_GZIP_MIN_BYTES, по умолчанию выключен) — см. core/compression.py
+app.add_middleware(GzipMiddleware)
 
 
 def _extract_bearer(authorization: Optional[str]) -> Optional[str]:
@@ -47,12 +80,173 @@ def _check_token(header_token: Optional[str], authorization: Optional[str]) -> N
         raise HTTPException(status_code=401, detail="Invalid or missing HF-CORTEX token")
 
 
+async def _read_cortex_request(request: Request) -> CortexRequest:
+    """Тело запроса -> CortexRequest (ошибки — 422, как у обычного body-параметра FastAPI).
+
+    Тело читаем сами: в режиме HF_CORTEX_ABCP_COMPACT строки injected_abcp ужимаются ещё
+    при разборе JSON (см. core/request_body.py). Content-Type: application/msgpack —
+    тело в MessagePack (core/wire.py; без пакета msgpack — 415).
+    """
+    as_msgpack = is_msgpack_content(request.headers.get("content-type"))
+    if as_msgpack and not msgpack_available():
+        raise HTTPException(status_code=415, detail="MessagePack is not supported by this Cortex")
+    try:
+        if as_msgpack:
+            data = parse_msgpack_body(await request.body(), compact=abcp_compact_enabled())
+        else:
+            data = await read_request_json(request, compact=abcp_compact_enabled())
+    except Exception as e:
+        raise RequestValidationError(
+            [
+                {
+                    "type": "json_invalid",
+                    "loc": ("body",),
+                    "msg": "MessagePack decode error" if as_msgpack else "JSON decode error",
+                    "input": {},
+                    "ctx": {"error": str(e)},
+                }
+            ]
+        )
+    try:
+        return CortexRequest.model_validate(data)
+    except ValidationError as e:
+        errors = e.errors(include_url=False)
+        for err in errors:
+            err["loc"] = ("body",) + tuple(err.get("loc") or ())
+        raise RequestValidationError(errors, body=data)
+
+
+def _lead_sales_payload(req: CortexRequest) -> CortexPayload:
+    if req.flow and req.flow != "lead_sales":
+        raise HTTPException(status_code=400, detail=f"Unsupported flow: {req.flow}")
+    if req.payload is None:
+        raise HTTPException(status_code=400, detail="Missing payload in CortexRequest")
+    return req.payload
+
+
+def _session_versioned(payload: CortexPayload) -> bool:
+    return bool(payload.sessionKey) and payload.sessionVersion is not None
+
+
+def _resolve_session(payload: CortexPayload) -> Dict[str, Any]:
+    """Снимок сессии хода (409, если версия не сошлась)."""
+    session_snapshot = payload.sessionSnapshot or {}
+
+    # Delta-протокол: снимок восстанавливаем из серверного кэша + delta.
+    # Если версия не сошлась — просим Node прислать полный снимок.
+    if _session_versioned(payload):
+        resolved = get_session_cache().resolve(
+            payload.sessionKey,
+            version=payload.sessionVersion,
+            snapshot=payload.sessionSnapshot if payload.sessionDelta is None else None,
+            delta=payload.sessionDelta,
+            base_version=payload.sessionBaseVersion,
+        )
+        if resolved is None:
+            raise HTTPException(status_code=409, detail=SESSION_RESYNC_REQUIRED)
+        session_snapshot = resolved
+    return session_snapshot
+
+
+def _fallback_result() -> CortexResult:
+    """Ответ, если flow упал: клиенту — заглушка, в debug — flow_exception."""
+    return CortexResult(
+        action="reply",
+        stage="NEW",
+        reply="Сервис временно недоступен, менеджер скоро подключится.",
+        need_operator=False,
+        oems=[],
+        update_lead_fields={},
+        client_name=None,
+        product_rows=[],
+        product_picks=[],
+        offers=[],
+        chosen_offer_id=None,
+        contact_update=None,
+        meta={},
+        debug={"flow_exception": True},
+    )
+
+
+def _response_context(payload: CortexPayload) -> Dict[str, Any]:
+    """Эхо context ответа — только из payload запроса (повтор по Idempotency-Key несёт тот же)."""
+    # В context оставляем хотя бы sessionSnapshot + то, что Node может захотеть видеть.
+    # В версионном режиме снимок у Node уже есть — эхо не шлём, только версию.
+    context = {
+        "sessionSnapshot": payload.sessionSnapshot or {},
+        "baseContext": payload.baseContext or {},
+        "injected_abcp": payload.injected_abcp,
+    }
+    if _session_versioned(payload):
+        context.pop("sessionSnapshot")
+        context["sessionVersion"] = payload.sessionVersion
+    return context
+
+
+def _build_response(req: CortexRequest, payload: CortexPayload, result: CortexResult) -> CortexResponse:
+    return CortexResponse(
+        ok=True,
+        app=req.app or "hf-rozatti-py",
+        flow=req.flow or "lead_sales",
+        stage=result.stage,
+        context=_response_context(payload),
+        result=result,
+        error=None,
+    )
+
+
+def _idempotent_entry(resp: CortexResponse) -> Tuple[Dict[str, Any], bool]:
+    """Что хранить по Idempotency-Key: ответ без эха context (его собирает _response_context
+    из повтора — иначе в хранилище лежали бы снимок сессии и injected_abcp, десятки КБ на ключ).
+    Fallback после исключения во flow не сохраняем — ретрай должен попробовать снова."""
+    data = resp.model_dump(mode="json", exclude={"context"})
+    data["context"] = None
+    return data, not bool((resp.result.debug or {}).get("flow_exception"))
+
+
+def _with_context(data: Dict[str, Any], payload: CortexPayload) -> Dict[str, Any]:
+    return {**data, "context": _response_context(payload)}
+
+
+def _run_lead_sales(req: CortexRequest, payload: CortexPayload) -> CortexResponse:
+    """Синхронная часть эндпоинта (сессия + flow + сборка ответа); выполняется в threadpool."""
+    # 3. Сессия хода (delta-протокол), msg / injected_abcp / offers из payload
+    session_snapshot = _resolve_session(payload)
+
+    # 4. Запускаем наш Cortex-поток lead_sales
+    try:
+        result = run_lead_sales_flow(
+            msg=payload.msg or {},
+            session=session_snapshot,
+            injected_abcp=payload.injected_abcp,
+            payload_offers=payload.offers or [],
+            channel=payload.channel,
+        )
+    except Exception:
+        result = _fallback_result()
+
+    # 5. Собираем CortexResponse
+    return _build_response(req, payload, result)
+
+
+async def _run_idempotent(req: CortexRequest, idempotency_key: str, compute: Compute) -> Tuple[Dict[str, Any], bool]:
+    """Ход по Idempotency-Key. Другой воркер всё ещё считает этот ключ — 503 + Retry-After
+    (повтор не пересчитывает ответ заново)."""
+    try:
+        return await get_idempotency_store().run(f"{req.flow or 'lead_sales'}:{idempotency_key}", compute)
+    except IdempotencyInProgress as e:
+        raise HTTPException(
+            status_code=503, detail=IDEMPOTENCY_IN_PROGRESS, headers={"Retry-After": str(e.retry_after_s)}
+        )
+
+
 @app.post("/api/hf-cortex/lead_sales", response_model=CortexResponse)
 async def hf_cortex_lead_sales(
-    req: CortexRequest,
+    request: Request,
     x_hf_cortex_token: Optional[str] = Header(default=None),
     authorization: Optional[str] = Header(default=None),
-) -> CortexResponse:
+    idempotency_key: Optional[str] = Header(default=None),
+) -> Any:
     """
     Главный эндпоинт HF-CORTEX для Rozatti (flow=lead_sales).
 
@@ -60,69 +254,177 @@ async def hf_cortex_lead_sales(
     - принимает стандартный CortexRequest от Node;
     - дергает run_lead_sales_flow(msg, sessionSnapshot, injected_abcp);
     - возвращает CortexResponse с тем же контрактом, который уже понимает Node.
+
+    Idempotency-Key (портал:диалог:сообщение:проход): повтор после таймаута получает
+    сохранённый ответ, параллельный повтор ждёт первый вызов (заголовок Idempotent-Replay: true);
+    не дождался за HF_CORTEX_IDEMPOTENCY_WAIT_S — 503 idempotency_in_progress + Retry-After.
+
+    Accept: application/msgpack — ответ в MessagePack (core/wire.py), схема та же.
     """
-    # 1. Проверяем токен (если включен)
+    # 1. Проверяем токен (если включен) — до чтения тела
     _check_token(x_hf_cortex_token, authorization)
+    req = await _read_cortex_request(request)
 
     # 2. Валидация flow
-    if req.flow and req.flow != "lead_sales":
-        raise HTTPException(status_code=400, detail=f"Unsupported flow: {req.flow}")
+    payload = _lead_sales_payload(req)
 
-    payload = req.payload
-    if payload is None:
-        raise HTTPException(status_code=400, detail="Missing payload in CortexRequest")
+    reply_msgpack = prefers_msgpack(request.headers.get("accept"))
 
-    # 3. Достаём msg / sessionSnapshot / injected_abcp / offers из payload
-    msg = payload.msg or {}
-    session_snapshot = payload.sessionSnapshot or {}
-    injected_abcp = payload.injected_abcp
-    payload_offers = payload.offers or []
+    # Flow синхронный (LLM-вызов) — не блокируем event loop.
+    if not idempotency_key:
+        resp = await run_in_threadpool(_run_lead_sales, req, payload)
+        return MsgpackResponse(resp.model_dump(mode="json")) if reply_msgpack else resp
 
-    # 4. Запускаем наш Cortex-поток lead_sales
+    async def compute() -> Tuple[Dict[str, Any], bool]:
+        return _idempotent_entry(await run_in_threadpool(_run_lead_sales, req, payload))
+
+    data, replay = await _run_idempotent(req, idempotency_key, compute)
+    # data — уже сериализованный CortexResponse: отдаём как есть, без повторной валидации
+    # dict -> CortexResponse через response_model (он нужен только для схемы OpenAPI).
+    data = _with_context(data, payload)
+    headers = {"Idempotent-Replay": "true"} if replay else None
+    return MsgpackResponse(data, headers=headers) if reply_msgpack else JSONResponse(data, headers=headers)
+
+
+def _prepare_and_preview(
+    payload: CortexPayload, session_snapshot: Dict[str, Any]
+) -> Tuple[LeadSalesTurn, Optional[CortexResult]]:
+    """Фазы хода до LLM (одним заходом в threadpool): подготовка и решение без LLM."""
+    turn = prepare_lead_sales(
+        payload.msg or {},
+        session_snapshot,
+        payload.injected_abcp,
+        payload.offers or [],
+        payload.channel,
+    )
     try:
-        result = run_lead_sales_flow(
-            msg=msg,
-            session=session_snapshot,
-            injected_abcp=injected_abcp,
-            payload_offers=payload_offers,
-        )
+        preview: Optional[CortexResult] = preview_lead_sales(turn)
     except Exception:
-        result = CortexResult(
-            action="reply",
-            stage="NEW",
-            reply="Сервис временно недоступен, менеджер скоро подключится.",
-            need_operator=False,
-            oems=[],
-            update_lead_fields={},
-            client_name=None,
-            product_rows=[],
-            product_picks=[],
-            offers=[],
-            chosen_offer_id=None,
-            contact_update=None,
-            meta={},
-            debug={"flow_exception": True},
-        )
+        preview = None  # без решения — сразу итог
+    return turn, preview
 
-    # 5. Собираем CortexResponse.
-    #    В context оставляем хотя бы sessionSnapshot + то, что Node может захотеть видеть.
-    context = {
-        "sessionSnapshot": session_snapshot,
-        "baseContext": payload.baseContext or {},
-        "injected_abcp": injected_abcp,
-    }
 
-    resp = CortexResponse(
-        ok=True,
-        app=req.app or "hf-rozatti-py",
-        flow=req.flow or "lead_sales",
-        stage=result.stage,
-        context=context,
-        result=result,
-        error=None,
+@app.post("/api/hf-cortex/lead_sales/stream")
+async def hf_cortex_lead_sales_stream(
+    request: Request,
+    x_hf_cortex_token: Optional[str] = Header(default=None),
+    authorization: Optional[str] = Header(default=None),
+    idempotency_key: Optional[str] = Header(default=None),
+) -> StreamingResponse:
+    """
+    Потоковый вариант lead_sales: решение Python сразу, ответ LLM — когда будет готов.
+
+    Запрос — тот же CortexRequest. Ответ — NDJSON (Accept: text/event-stream — SSE, см.
+    core/event_stream.py), два события:
+    - decision: {"stage", "final", "decision"} — DECISION_FIELDS результата без LLM
+      (flows/lead_sales/flow.py: preview_lead_sales). final=true — короткий путь, итог
+      совпадёт с решением;
+    - result: полный CortexResponse (как у /lead_sales) + "decision_changed" — поля
+      DECISION_FIELDS, которые LLM изменил относительно decision (Node их доприменяет).
+    Если flow упал до решения — только result с заглушкой (debug.flow_exception).
+
+    Заголовки ответа уходят вместе с первым кадром, поэтому ошибки до него (401/400/409/422/503)
+    — обычным JSON. Idempotency-Key — как у /lead_sales (хранилище общее): повтор получает
+    только result из сохранённого ответа. MessagePack здесь не поддерживается.
+    """
+    _check_token(x_hf_cortex_token, authorization)
+    req = await _read_cortex_request(request)
+    payload = _lead_sales_payload(req)
+    sse = wants_sse(request.headers.get("accept"))
+    decisions: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+
+    async def compute() -> Tuple[Dict[str, Any], bool]:
+        session_snapshot = await run_in_threadpool(_resolve_session, payload)
+        try:
+            turn, preview = await run_in_threadpool(_prepare_and_preview, payload, session_snapshot)
+        except Exception:
+            result = _fallback_result()
+        else:
+            if preview is not None:
+                decisions.put_nowait(
+                    {"stage": preview.stage, "final": turn.short_result is not None, "decision": decision_of(preview)}
+                )
+            try:
+                result = await run_in_threadpool(complete_lead_sales, turn)
+            except Exception:
+                result = _fallback_result()
+        return _idempotent_entry(_build_response(req, payload, result))
+
+    async def compute_once() -> Tuple[Dict[str, Any], bool]:
+        data, _ = await compute()
+        return data, False
+
+    # Ход считается в отдельной задаче (доживёт до конца и сохранится, даже если Node отвалится);
+    # ответ начинаем, когда есть первый кадр: решение или сразу итог (повтор, ошибка до решения).
+    turn_task = asyncio.ensure_future(
+        _run_idempotent(req, idempotency_key, compute)
+        if idempotency_key
+        else compute_once()
     )
+    first_decision = asyncio.ensure_future(decisions.get())
+    await asyncio.wait((turn_task, first_decision), return_when=asyncio.FIRST_COMPLETED)
+    if not first_decision.done():
+        first_decision.cancel()
+    head = first_decision.result() if first_decision.done() and not first_decision.cancelled() else None
+    if head is None:
+        turn_task.result()  # HTTPException (409/503) — обычным ответом, до потока
+
+    async def events() -> AsyncIterator[bytes]:
+        if head is not None:
+            yield frame("decision", head, sse)
+        data, _ = await turn_task
+        data = _with_context(data, payload)
+        if head is not None:
+            decision = head["decision"]
+            changed = [f for f in DECISION_FIELDS if data["result"].get(f) != decision.get(f)]
+            data = {**data, "decision_changed": changed}
+        yield frame("result", data, sse)
+
+    # cloudflared/nginx не должны копить кадры у себя
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if head is None and turn_task.result()[1]:
+        headers["Idempotent-Replay"] = "true"
+    return StreamingResponse(events(), media_type=SSE_MEDIA_TYPE if sse else NDJSON_MEDIA_TYPE, headers=headers)
 
-    return resp
+
+def _price_cache_for(oem: str) -> Tuple[AbcpPriceCache, str]:
+    cache = get_price_cache()
+    if cache is None:
+        raise HTTPException(status_code=404, detail="ABCP price cache is disabled")
+    key = normalize_price_oem(oem)
+    if key is None:
+        raise HTTPException(status_code=400, detail="Empty OEM")
+    return cache, key
+
+
+@app.get("/api/hf-cortex/abcp_cache/{oem}", response_model=AbcpCacheEntry)
+def hf_cortex_abcp_cache_get(
+    oem: str,
+    x_hf_cortex_token: Optional[str] = Header(default=None),
+    authorization: Optional[str] = Header(default=None),
+) -> Any:
+    """
+    Кэш цен ABCP (HF_CORTEX_PRICE_CACHE=1): Node спрашивает его перед запросом в ABCP.
+    fresh — ABCP не нужен; stale — ответ годится, revalidate=true у одного вызова, он
+    обновляет запись в фоне; miss — идём в ABCP и кладём ответ через PUT.
+    """
+    _check_token(x_hf_cortex_token, authorization)
+    cache, key = _price_cache_for(oem)
+    hit = cache.get(key)
+    return AbcpCacheEntry(oem=key, status=hit.status, abcp=hit.abcp, age_s=hit.age_s, revalidate=hit.revalidate)
+
+
+@app.put("/api/hf-cortex/abcp_cache/{oem}", response_model=AbcpCacheEntry)
+def hf_cortex_abcp_cache_put(
+    oem: str,
+    body: AbcpCachePut,
+    x_hf_cortex_token: Optional[str] = Header(default=None),
+    authorization: Optional[str] = Header(default=None),
+) -> Any:
+    _check_token(x_hf_cortex_token, authorization)
+    cache, key = _price_cache_for(oem)
+    fresh_s = cache.put(key, body.abcp)
+    return AbcpCacheEntry(oem=key, status="fresh", fresh_s=fresh_s)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,5 @@
+# benchmarks/ — микробенчмарки HF-CORTEX (не входят в pytest-прогон).
+#
+# Запуск (из hf_cortex_py):
+#   python -m benchmarks.bench_parsers            # отчёт + сверка с baseline
+#   python -m benchmarks.bench_parsers --update   # перезаписать baseline
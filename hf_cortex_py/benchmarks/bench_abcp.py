@@ -0,0 +1,99 @@
+# benchmarks/bench_abcp.py
+# Стоимость разбора injected_abcp (сводка + канонические офферы) на крупных ответах ABCP.
+#
+#   python -m benchmarks.bench_abcp                     # 1k / 5k / 20k офферов
+#   python -m benchmarks.bench_abcp --sizes 1000 --rounds 50
+#   python -m benchmarks.bench_abcp --top-k 5          # размер отбора top-K + Парето
+#
+# Колоночный путь (numpy) меряется отдельной строкой, если numpy установлен.
+# "request pipeline" — всё, что flow делает с офферами за запрос: разбор, канон, payload.offers
+# для промпта и Offer для CortexResult; для него же печатается пик памяти (tracemalloc).
+# "pricing reply" — текст короткого пути PRICING по уже готовому канону.
+
+import argparse
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, List
+
+from flows.lead_sales import abcp_summary
+from flows.lead_sales.abcp_cache import AbcpPackCache
+from flows.lead_sales.abcp_summary import NO_SELECTION, OfferSelection, ingest_abcp
+from flows.lead_sales.offers import build_canonical_offers, render_pricing_reply
+
+from benchmarks.corpus import synthetic_abcp
+
+
+def _timed(label: str, fn: Callable[[], Any], rounds: int, n_offers: int) -> None:
+    fn()  # прогрев
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    dt = (time.perf_counter() - t0) / rounds
+    print(f"{label:<34} {dt * 1000:>9.2f} ms  {dt * 1e6 / n_offers:>7.2f} us/offer")
+
+
+def _request_pipeline(abcp: Any) -> Any:
+    ingest = ingest_abcp(abcp, selection=NO_SELECTION)
+    canonical = build_canonical_offers(None, ingest.rows)
+    return canonical.to_dicts(), canonical.to_offers()
+
+
+def _peak_kib(fn: Callable[[], Any]) -> float:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="HF-CORTEX ABCP ingestion benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--top-k", type=int, default=10, help="отбор top-K + Парето для сравнения")
+    args = parser.parse_args(argv)
+    selection = OfferSelection(top_k=args.top_k)
+
+    for n in args.sizes:
+        abcp = synthetic_abcp(n)
+        kept = len(ingest_abcp(abcp, selection=selection).offers)
+        print(f"offers={n}  kept with top-{args.top_k} + pareto: {kept}")
+        _timed(
+            "  ingest_abcp (summary only)",
+            lambda: ingest_abcp(abcp, build_offers=False, selection=NO_SELECTION, columnar=False),
+            args.rounds,
+            n,
+        )
+        if abcp_summary._np is not None:
+            _timed(
+                "  ingest_abcp (summary only, numpy)",
+                lambda: ingest_abcp(abcp, build_offers=False, selection=NO_SELECTION, columnar=True),
+                args.rounds,
+                n,
+            )
+        _timed("  ingest_abcp (summary + offers)", lambda: ingest_abcp(abcp, selection=NO_SELECTION), args.rounds, n)
+        _timed("  ingest_abcp (top-K + pareto)", lambda: ingest_abcp(abcp, selection=selection), args.rounds, n)
+        cache = AbcpPackCache()
+        _timed(
+            "  ingest_abcp (cache hit)",
+            lambda: ingest_abcp(abcp, selection=NO_SELECTION, cache=cache),
+            args.rounds,
+            n,
+        )
+        _timed("  request pipeline", lambda: _request_pipeline(abcp), args.rounds, n)
+        print(f"  request pipeline peak memory     {_peak_kib(lambda: _request_pipeline(abcp)):>9.0f} KiB")
+        canonical = build_canonical_offers(next(iter(abcp)), ingest_abcp(abcp, selection=NO_SELECTION).rows)
+        _timed("  pricing reply", lambda: render_pricing_reply(canonical.oems[0], canonical), args.rounds, n)
+        _timed(
+            "  pricing reply (telegram)",
+            lambda: render_pricing_reply(canonical.oems[0], canonical, "telegram"),
+            args.rounds,
+            n,
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
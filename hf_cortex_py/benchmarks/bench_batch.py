@@ -0,0 +1,59 @@
+# benchmarks/bench_batch.py
+# Пропускная способность пакетного API парсеров на датасете уровня dialog_turns.jsonl.
+#
+#   python -m benchmarks.bench_batch                                  # синтетика, 14k реплик
+#   python -m benchmarks.bench_batch --turns data/.../dialog_turns.jsonl --workers 4
+
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from flows.lead_sales.parsers.batch import classify_policy_batch, extract_oem_batch, extract_phone_batch
+from flows.lead_sales.parsers.oem import extract_oem_from_text
+from flows.lead_sales.parsers.phone import extract_phone_from_text
+from flows.lead_sales.policy_engine import classify_policy_text
+
+from benchmarks.corpus import load_dialog_turn_texts, synthetic_dialog_texts
+
+
+def _timed(label: str, fn: Callable[[], object], n: int) -> float:
+    t0 = time.perf_counter()
+    fn()
+    dt = time.perf_counter() - t0
+    print(f"{label:<32} {dt * 1000:>9.1f} ms  {n / dt if dt else 0:>10.0f} texts/s")
+    return dt
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="HF-CORTEX batch parser throughput")
+    parser.add_argument("--turns", type=Path, default=None, help="путь к dialog_turns.jsonl")
+    parser.add_argument("--workers", type=int, default=0, help="ProcessPoolExecutor workers (0 — без пула)")
+    args = parser.parse_args(argv)
+
+    texts = load_dialog_turn_texts(args.turns) if args.turns else synthetic_dialog_texts()
+    n = len(texts)
+    print(f"texts: {n} (unique {len(set(texts))})")
+
+    _timed("single-call loop", lambda: [
+        (extract_oem_from_text(t), extract_phone_from_text(t), classify_policy_text(t)) for t in texts
+    ], n)
+
+    def _batch(executor: Optional[ProcessPoolExecutor] = None) -> None:
+        extract_oem_batch(texts, executor=executor)
+        extract_phone_batch(texts, executor=executor)
+        classify_policy_batch(texts, executor=executor)
+
+    _timed("batch", _batch, n)
+
+    if args.workers > 0:
+        with ProcessPoolExecutor(max_workers=args.workers) as ex:
+            _timed(f"batch x{args.workers} processes", lambda: _batch(ex), n)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,111 @@
+# benchmarks/bench_body.py
+# Разбор тела запроса lead_sales с крупным injected_abcp: полный json.loads против компактного
+# режима (core/request_body.py).
+#
+#   python -m benchmarks.bench_body                    # 5k / 20k / 50k строк ABCP
+#   python -m benchmarks.bench_body --sizes 20000 --rounds 3
+#
+# По каждому режиму:
+#   parse    — время разбора тела;
+#   peak     — пик памяти Python при разборе (tracemalloc);
+#   endpoint — весь запрос через ASGI: короткий путь PRICING (стадия NEW, без LLM) + эхо context.
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, List
+
+from fastapi.testclient import TestClient
+
+import app as app_module
+from core import request_body
+from core.request_body import parse_request_body
+
+from benchmarks.corpus import synthetic_abcp
+
+MODES = ("full", "compact-json", "compact-ijson")
+URL = "/api/hf-cortex/lead_sales"
+
+
+def _body(n_offers: int) -> bytes:
+    abcp = synthetic_abcp(n_offers)
+    req = {
+        "app": "bench",
+        "flow": "lead_sales",
+        "payload": {"msg": {"text": next(iter(abcp))}, "sessionSnapshot": {}, "injected_abcp": abcp},
+    }
+    return json.dumps(req, ensure_ascii=False).encode("utf-8")
+
+
+class _Mode:
+    """Включает режим на время замера: env HF_CORTEX_ABCP_COMPACT и (для compact-json) без ijson."""
+
+    def __init__(self, mode: str) -> None:
+        self.mode = mode
+        self._saved: Any = None
+
+    def __enter__(self) -> bool:
+        self._saved = request_body._ijson
+        if self.mode == "compact-json":
+            request_body._ijson = None
+        compact = self.mode != "full"
+        os.environ["HF_CORTEX_ABCP_COMPACT"] = "1" if compact else "0"
+        return compact
+
+    def __exit__(self, *exc: Any) -> None:
+        request_body._ijson = self._saved
+        os.environ.pop("HF_CORTEX_ABCP_COMPACT", None)
+
+
+def _timed_ms(fn: Callable[[], Any], rounds: int) -> float:
+    fn()  # прогрев
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - t0) / rounds * 1000
+
+
+def _bench_size(client: TestClient, n: int, modes: List[str], rounds: int) -> None:
+    body = _body(n)
+    print(f"offers={n} body={len(body) / 1024:.0f} KiB")
+
+    headers = {"content-type": "application/json"}
+    for mode in modes:
+        with _Mode(mode) as compact:
+            parse_ms = _timed_ms(lambda: parse_request_body(body, compact=compact), rounds)
+
+            tracemalloc.start()
+            parse_request_body(body, compact=compact)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            endpoint_ms = _timed_ms(lambda: client.post(URL, content=body, headers=headers).raise_for_status(), rounds)
+
+        print(
+            f"  {mode:<14} parse {parse_ms:>7.1f} ms  peak {peak / 1024:>7.0f} KiB  endpoint {endpoint_ms:>7.1f} ms"
+        )
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="HF-CORTEX request body parsing benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5000, 20000, 50000])
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    modes = [m for m in MODES if m != "compact-ijson" or request_body._ijson is not None]
+    if request_body._ijson is None:
+        print("ijson не установлен — режим compact-ijson пропущен")
+
+    app_module.HF_CORTEX_TOKEN = None
+    client = TestClient(app_module.app)
+
+    for n in args.sizes:
+        _bench_size(client, n, modes, args.rounds)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,79 @@
+# benchmarks/bench_gzip.py
+# gzip ответов Cortex (core/compression.py): CPU на сжатие/распаковку против времени передачи.
+#
+#   python -m benchmarks.bench_gzip                      # trace_2026_01_05 + синтетика, канал 20 Мбит/с
+#   python -m benchmarks.bench_gzip --mbps 5 --levels 1 6
+#
+# Документы: ответы из tests/fixtures/trace_2026_01_05 и ответы эндпоинта на синтетический
+# ход PRICING (injected_abcp на 50 / 1000 / 5000 строк) — с эхом context, как их получает Node.
+# net — сколько мс выигрывает ход: передача несжатого минус (сжатие + передача сжатого +
+# распаковка); отрицательное значение — сжимать этот ответ невыгодно.
+
+import argparse
+import gzip
+import json
+import sys
+import time
+from typing import Any, Callable, List, Tuple
+
+from fastapi.testclient import TestClient
+
+import app as app_module
+
+from benchmarks.corpus import FIXTURES, synthetic_abcp
+
+
+def _timed_ms(fn: Callable[[], Any], rounds: int) -> float:
+    fn()  # прогрев
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - t0) / rounds * 1000
+
+
+def _documents(sizes: List[int]) -> List[Tuple[str, bytes]]:
+    docs: List[Tuple[str, bytes]] = []
+    for path in sorted((FIXTURES / "trace_2026_01_05").glob("*__response.json")):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        docs.append((f"trace {path.name.split('__')[2]}", json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()))
+
+    app_module.HF_CORTEX_TOKEN = None
+    client = TestClient(app_module.app)
+    for n in sizes:
+        abcp = synthetic_abcp(n)
+        req = {
+            "app": "bench",
+            "flow": "lead_sales",
+            "payload": {"msg": {"text": next(iter(abcp))}, "sessionSnapshot": {}, "injected_abcp": abcp},
+        }
+        docs.append((f"pricing {n} rows", client.post("/api/hf-cortex/lead_sales", json=req).content))
+    return docs
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="HF-CORTEX response compression benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 1000, 5000])
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 6, 9])
+    parser.add_argument("--mbps", type=float, default=20.0, help="пропускная способность канала до Node")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args(argv)
+    bytes_per_ms = args.mbps * 1e6 / 8 / 1000
+
+    print(f"link {args.mbps:g} Mbit/s")
+    print(f"{'document':<18} {'bytes':>8} {'lvl':>3} {'gzip B':>8} {'ratio':>6} {'comp ms':>8} {'decomp ms':>9} {'net ms':>8}")
+    for label, body in _documents(args.sizes):
+        for level in args.levels:
+            packed = gzip.compress(body, compresslevel=level, mtime=0)
+            comp = _timed_ms(lambda: gzip.compress(body, compresslevel=level, mtime=0), args.rounds)
+            decomp = _timed_ms(lambda: gzip.decompress(packed), args.rounds)
+            net = len(body) / bytes_per_ms - (comp + len(packed) / bytes_per_ms + decomp)
+            print(
+                f"{label:<18} {len(body):>8} {level:>3} {len(packed):>8} {len(packed) / len(body):>6.2f}"
+                f" {comp:>8.3f} {decomp:>9.3f} {net:>8.2f}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
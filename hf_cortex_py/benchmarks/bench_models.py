@@ -0,0 +1,127 @@
+# benchmarks/bench_models.py
+# Сборка моделей ответа из доверенных данных: валидация pydantic против construct_trusted.
+#
+#   python -m benchmarks.bench_models                    # 10 / 50 / 200 офферов в ответе
+#   python -m benchmarks.bench_models --offers 20 --rounds 5000
+#
+# Строки — то, что делает один ход:
+#   offers           — Offer для CortexResult из канона (OfferRow.to_offer);
+#   short path       — CortexResult короткого пути PRICING вместе с офферами;
+#   contact_update   — hardening: model_dump -> ContactUpdate(**cu) против model_copy(update=...);
+#   idempotent reply — ответ по Idempotency-Key: dict -> CortexResponse -> dict (response_model)
+#                      против готового dict в JSONResponse (эхо context с injected_abcp).
+
+import argparse
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+from fastapi.responses import JSONResponse
+
+from core.models import ContactUpdate, CortexResponse, CortexResult, Offer, construct_trusted
+from flows.lead_sales.abcp_summary import NO_SELECTION, ingest_abcp
+from flows.lead_sales.offers import CanonicalOffers, build_canonical_offers
+
+from benchmarks.corpus import synthetic_abcp
+
+
+def _timed_us(fn: Callable[[], Any], rounds: int) -> float:
+    fn()  # прогрев
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - t0) / rounds * 1e6
+
+
+def _row(label: str, validated_us: float, trusted_us: float) -> None:
+    saved = (1 - trusted_us / validated_us) * 100 if validated_us else 0.0
+    print(f"  {label:<18} validated {validated_us:>9.1f} us  trusted {trusted_us:>9.1f} us  ({saved:>4.0f}% saved)")
+
+
+def _short_path_fields(canonical: CanonicalOffers, offers: List[Offer]) -> Dict[str, Any]:
+    return {
+        "action": "reply",
+        "stage": "PRICING",
+        "reply": "...",
+        "intent": "OEM_QUERY",
+        "confidence": 1.0,
+        "requires_clarification": False,
+        "oems": list(canonical.oems),
+        "offers": offers,
+        "update_lead_fields": {},
+        "meta": {},
+        "debug": {"short_path": "abcp_injected_new"},
+    }
+
+
+def _bench_offers(abcp: Dict[str, Any], n: int, rounds: int) -> None:
+    rows = ingest_abcp(abcp, selection=NO_SELECTION).rows[:n]
+    canonical = build_canonical_offers(None, rows)
+    print(f"offers={len(canonical.offers)}")
+
+    _row(
+        "offers",
+        _timed_us(lambda: [Offer(**off._asdict()) for off in canonical.offers], rounds),
+        _timed_us(canonical.to_offers, rounds),
+    )
+    _row(
+        "short path",
+        _timed_us(
+            lambda: CortexResult(
+                **_short_path_fields(canonical, [Offer(**off._asdict()) for off in canonical.offers])
+            ),
+            rounds,
+        ),
+        _timed_us(
+            lambda: construct_trusted(CortexResult, _short_path_fields(canonical, canonical.to_offers())),
+            rounds,
+        ),
+    )
+
+    result = construct_trusted(CortexResult, _short_path_fields(canonical, canonical.to_offers()))
+    data = CortexResponse(
+        app="bench",
+        stage=result.stage,
+        context={"sessionSnapshot": {}, "baseContext": {}, "injected_abcp": abcp},
+        result=result,
+    ).model_dump(mode="json")
+    _row(
+        "idempotent reply",
+        _timed_us(lambda: JSONResponse(CortexResponse.model_validate(data).model_dump(mode="json")), rounds),
+        _timed_us(lambda: JSONResponse(data), rounds),
+    )
+
+
+def _bench_contact_update(rounds: int) -> None:
+    llm_cu = ContactUpdate(name="Иван", phone="+7 900 000-00-00")
+    confirmed = {"full_name_raw": "Иванов Иван Иванович", "last_name": "Иванов", "name": "Иван", "second_name": "Иванович"}
+
+    def round_trip() -> ContactUpdate:
+        cu = llm_cu.model_dump()
+        cu.update(confirmed)
+        return ContactUpdate(**cu)
+
+    _row(
+        "contact_update",
+        _timed_us(round_trip, rounds),
+        _timed_us(lambda: llm_cu.model_copy(update=confirmed), rounds),
+    )
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="HF-CORTEX trusted model construction benchmark")
+    parser.add_argument("--offers", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--abcp-offers", type=int, default=1000, help="размер injected_abcp в эхе context")
+    args = parser.parse_args(argv)
+
+    abcp = synthetic_abcp(args.abcp_offers)
+    for n in args.offers:
+        _bench_offers(abcp, n, args.rounds)
+    print("per turn")
+    _bench_contact_update(args.rounds * 10)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,134 @@
+# benchmarks/bench_parsers.py
+# Микробенчмарки парсеров lead_sales + policy engine + hardening.
+#
+#   python -m benchmarks.bench_parsers                  # отчёт, exit 1 при регрессии
+#   python -m benchmarks.bench_parsers --update         # перезаписать baseline
+#   python -m benchmarks.bench_parsers --tolerance 0.5  # временно ослабить порог
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from core.models import CortexResult, Offer
+from flows.lead_sales.hardening import apply_strict_funnel
+from flows.lead_sales.parsers.address import extract_address_or_pickup_raw, looks_like_address_text
+from flows.lead_sales.parsers.choice import extract_offer_choice_from_text
+from flows.lead_sales.parsers.common import get_msg_text, normalize_text
+from flows.lead_sales.parsers.fio import extract_full_fio_strict, split_full_name_strict
+from flows.lead_sales.parsers.oem import extract_oem_from_text, looks_like_vin
+from flows.lead_sales.parsers.phone import extract_phone_from_text
+from flows.lead_sales.parsers.quantity import extract_quantity_from_text
+from flows.lead_sales.policy_engine import apply_policy_engine
+
+from benchmarks.corpus import load_corpus
+from benchmarks.harness import (
+    DEFAULT_TOLERANCE,
+    BenchCase,
+    confirm_regressions,
+    format_report,
+    load_baseline,
+    run_cases,
+    save_baseline,
+)
+
+BASELINE_FILE = Path(__file__).with_name("baseline_parsers.json")
+
+_VALID_IDS = [1, 2, 3]
+
+_SESSION: Dict[str, Any] = {
+    "state": {
+        "stage": "CONTACT",
+        "chosen_offer_id": 2,
+        "client_name": "Иванов Иван Иванович",
+        "phone": "+79990001122",
+    },
+    "lead": {"delivery_address": None},
+}
+
+
+def _mk_result() -> CortexResult:
+    return CortexResult(
+        action="reply",
+        stage="CONTACT",
+        reply="",
+        offers=[
+            Offer(id=1, oem="5QM411105R", brand="VAG", price=17700.0, delivery_days=14),
+            Offer(id=2, oem="5QM411105R", brand="VAG", price=19800.0, delivery_days=9),
+            Offer(id=3, oem="5QM411105R", brand="VAG", price=21800.0, delivery_days=7),
+        ],
+        chosen_offer_id=None,
+        update_lead_fields={},
+    )
+
+
+def _text(text: str) -> Tuple[Any, ...]:
+    return (text,)
+
+
+def build_cases() -> List[BenchCase]:
+    return [
+        BenchCase("parsers.common.normalize_text", normalize_text, _text),
+        BenchCase("parsers.common.get_msg_text", get_msg_text, lambda t: ({"message": {"text": t}},)),
+        BenchCase("parsers.address.looks_like_address_text", looks_like_address_text, _text),
+        BenchCase("parsers.address.extract_address_or_pickup_raw", extract_address_or_pickup_raw, _text),
+        BenchCase("parsers.choice.extract_offer_choice_from_text", extract_offer_choice_from_text, lambda t: (t, _VALID_IDS)),
+        BenchCase("parsers.fio.extract_full_fio_strict", extract_full_fio_strict, _text),
+        BenchCase("parsers.fio.split_full_name_strict", split_full_name_strict, _text),
+        BenchCase("parsers.oem.extract_oem_from_text", extract_oem_from_text, _text),
+        BenchCase("parsers.oem.looks_like_vin", looks_like_vin, _text),
+        BenchCase("parsers.phone.extract_phone_from_text", extract_phone_from_text, _text),
+        BenchCase("parsers.quantity.extract_quantity_from_text", extract_quantity_from_text, _text),
+        BenchCase(
+            "policy_engine.apply_policy_engine",
+            apply_policy_engine,
+            lambda t: (_mk_result(),),
+            lambda t: {"msg_text": t, "msg": {"text": t}, "stage_in": "NEW", "session_snapshot": {}},
+        ),
+        BenchCase(
+            "hardening.apply_strict_funnel",
+            apply_strict_funnel,
+            lambda t: (_mk_result(),),
+            lambda t: {"stage_in": "CONTACT", "msg_text": t, "session_snapshot": _SESSION},
+        ),
+    ]
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="HF-CORTEX parser microbenchmarks")
+    parser.add_argument("--update", action="store_true", help="перезаписать baseline текущими цифрами")
+    parser.add_argument("--tolerance", type=float, default=None, help="допустимая деградация (0.35 = +35%%)")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    args = parser.parse_args(argv)
+
+    cases = build_cases()
+    corpus = load_corpus()
+    report = run_cases(cases, corpus, rounds=args.rounds)
+    baseline = load_baseline(args.baseline)
+
+    if args.update:
+        print(format_report(report, baseline))
+        save_baseline(args.baseline, report, args.tolerance if args.tolerance is not None else DEFAULT_TOLERANCE)
+        print(f"\nbaseline updated: {args.baseline}")
+        return 0
+
+    if baseline is None:
+        print(format_report(report, baseline))
+        print(f"\nno baseline at {args.baseline}; run with --update")
+        return 0
+
+    regressions = confirm_regressions(cases, corpus, report, baseline, tolerance=args.tolerance, rounds=args.rounds)
+    print(format_report(report, baseline))
+    if regressions:
+        print("\nREGRESSIONS:")
+        for r in regressions:
+            print(f"  {r}")
+        return 1
+
+    print("\nOK: no regressions vs baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,72 @@
+# benchmarks/bench_state.py
+# Стоимость операций слоя состояния (core/state.py) по бэкендам.
+#
+#   python -m benchmarks.bench_state                          # memory + sqlite (tmp-файл)
+#   python -m benchmarks.bench_state --redis-url redis://127.0.0.1:6379/15 --ops 20000
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+from core.state import MemoryStateBackend, RedisStateBackend, SqliteStateBackend, StateBackend
+
+# Типичное значение: снимок сессии среднего диалога (~2 КБ JSON)
+_VALUE = b'{"v":3,"s":{"state":{"stage":"PRICING","offers":[' + b'{"id":1,"price":1000.0},' * 80 + b"{}]}}}"
+
+
+def _timed(label: str, fn: Callable[[], object], n: int) -> None:
+    t0 = time.perf_counter()
+    fn()
+    dt = time.perf_counter() - t0
+    print(f"{label:<28} {dt * 1e6 / n:>9.1f} us/op  {n / dt if dt else 0:>10.0f} ops/s")
+
+
+def bench_backend(backend: StateBackend, ops: int) -> None:
+    keys = [f"bench:{i % 500}" for i in range(ops)]
+
+    def _set() -> None:
+        for k in keys:
+            backend.set(k, _VALUE, ttl_s=600)
+
+    def _get() -> None:
+        for k in keys:
+            backend.get(k)
+
+    def _cas() -> None:
+        for k in keys:
+            backend.cas(k, _VALUE, _VALUE, ttl_s=600)
+
+    print(f"[{backend.name}] value={len(_VALUE)} bytes, ops={ops}")
+    _timed("set", _set, ops)
+    _timed("get", _get, ops)
+    _timed("cas (hit)", _cas, ops)
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="HF-CORTEX state backend benchmark")
+    parser.add_argument("--ops", type=int, default=5000)
+    parser.add_argument("--redis-url", default=None, help="redis://... (нужен пакет redis)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backends: List[Tuple[str, Callable[[], StateBackend]]] = [
+            ("memory", MemoryStateBackend),
+            ("sqlite", lambda: SqliteStateBackend(str(Path(tmp) / "bench.sqlite3"))),
+        ]
+        if args.redis_url:
+            backends.append(("redis", lambda: RedisStateBackend(args.redis_url)))
+
+        for _name, factory in backends:
+            backend = factory()
+            try:
+                bench_backend(backend, args.ops)
+            finally:
+                backend.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
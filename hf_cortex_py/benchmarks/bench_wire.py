@@ -0,0 +1,92 @@
+# benchmarks/bench_wire.py
+# Формат обмена Node <-> Cortex: JSON против MessagePack (core/wire.py) — байты и время
+# кодирования/декодирования.
+#
+#   python -m benchmarks.bench_wire                         # trace_2026_01_05 + синтетика 1k строк ABCP
+#   python -m benchmarks.bench_wire --abcp-offers 5000 --rounds 200
+#
+# Документы: запросы/ответы из tests/fixtures/trace_2026_01_05 и синтетический ход PRICING
+# (CortexRequest с injected_abcp и ответ эндпоинта на него — с эхом context).
+# JSON кодируется так же, как Node (JSON.stringify) и JSONResponse: компактно, ensure_ascii=False.
+
+import argparse
+import json
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from fastapi.testclient import TestClient
+
+import app as app_module
+from core import wire
+
+from benchmarks.corpus import FIXTURES, synthetic_abcp
+
+
+def _json_encode(data: Any) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _timed_us(fn: Callable[[], Any], rounds: int) -> float:
+    fn()  # прогрев
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - t0) / rounds * 1e6
+
+
+def _documents(abcp_offers: int) -> List[Tuple[str, Dict[str, Any]]]:
+    docs: List[Tuple[str, Dict[str, Any]]] = []
+    for path in sorted((FIXTURES / "trace_2026_01_05").glob("*.json")):
+        kind = "request" if path.name.endswith("__request.json") else "response"
+        with open(path, "r", encoding="utf-8") as f:
+            docs.append((f"trace {path.name.split('__')[2]} {kind}", json.load(f)))
+
+    abcp = synthetic_abcp(abcp_offers)
+    req = {
+        "app": "bench",
+        "flow": "lead_sales",
+        "payload": {"msg": {"text": next(iter(abcp))}, "sessionSnapshot": {}, "injected_abcp": abcp},
+    }
+    app_module.HF_CORTEX_TOKEN = None
+    resp = TestClient(app_module.app).post("/api/hf-cortex/lead_sales", json=req).json()
+    docs.append((f"synthetic {abcp_offers} request", req))
+    docs.append((f"synthetic {abcp_offers} response", resp))
+    return docs
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="HF-CORTEX wire format benchmark")
+    parser.add_argument("--abcp-offers", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    if not wire.msgpack_available():
+        print("msgpack не установлен — сравнивать не с чем")
+        return 1
+
+    print(
+        f"{'document':<30} {'json B':>8} {'msgpack B':>9} {'ratio':>6}"
+        f"  {'enc json':>9} {'enc mp':>8}  {'dec json':>9} {'dec mp':>8}  (us)"
+    )
+    total_json = total_mp = 0
+    for label, doc in _documents(args.abcp_offers):
+        as_json = _json_encode(doc)
+        as_mp = wire.encode_msgpack(doc)
+        assert wire.decode_msgpack(as_mp) == json.loads(as_json)
+        total_json += len(as_json)
+        total_mp += len(as_mp)
+        rounds = max(1, args.rounds * 20_000 // max(len(as_json), 20_000))
+        print(
+            f"{label:<30} {len(as_json):>8} {len(as_mp):>9} {len(as_mp) / len(as_json):>6.2f}"
+            f"  {_timed_us(lambda: _json_encode(doc), rounds):>9.1f}"
+            f" {_timed_us(lambda: wire.encode_msgpack(doc), rounds):>8.1f}"
+            f"  {_timed_us(lambda: json.loads(as_json), rounds):>9.1f}"
+            f" {_timed_us(lambda: wire.decode_msgpack(as_mp), rounds):>8.1f}"
+        )
+    print(f"{'total':<30} {total_json:>8} {total_mp:>9} {total_mp / total_json:>6.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
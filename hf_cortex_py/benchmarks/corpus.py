@@ -0,0 +1,149 @@
+# benchmarks/corpus.py
+# Корпус сообщений для бенчмарков: replay-фикстуры + синтетика (длинные и «злые» тексты).
+
+import json
+import random
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+FIXTURES = ROOT / "tests" / "fixtures"
+
+# Типовые реплики клиентов (добавляют разнообразия к replay-кейсам).
+_TYPICAL = [
+    "добрый день 5QM411105R сможет привезти?",
+    "давайте вариант 3",
+    "первый вариант 2 шт",
+    "Иванов Иван Иванович +79990001122",
+    "Самовывоз",
+    "г.Москва ул.Челюскинцев 15г",
+    "Москва, ул. Пушкина 1, +79889945791",
+    "8 999 000 11 22",
+    "VIN WDB2110421A123456 и номер 5QM411105R",
+    "Нужна запчасть 4N0907998, цена?",
+]
+
+
+def _replay_texts() -> List[str]:
+    out: List[str] = []
+
+    cases_file = FIXTURES / "replay_qualification" / "cases.v1.json"
+    if cases_file.exists():
+        with open(cases_file, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        for case in payload.get("cases") or []:
+            text = (case.get("msg") or {}).get("text")
+            if isinstance(text, str) and text.strip():
+                out.append(text)
+
+    for req_file in sorted((FIXTURES / "trace_2026_01_05").glob("*__request.json")):
+        with open(req_file, "r", encoding="utf-8") as f:
+            req = json.load(f)
+        text = ((req.get("payload") or {}).get("msg") or {}).get("text")
+        if isinstance(text, str) and text.strip():
+            out.append(text)
+
+    return out
+
+
+def _long_texts(base: List[str], rng: random.Random) -> List[str]:
+    """Длинные сообщения (~2-8 КБ): склейки реальных реплик с шумом."""
+    out: List[str] = []
+    for n in (20, 60, 120):
+        parts = [rng.choice(base) for _ in range(n)]
+        out.append(" ".join(parts))
+    return out
+
+
+def _adversarial_texts(rng: random.Random) -> List[str]:
+    """
+    Тексты, на которых регэкспы парсеров работают хуже всего:
+    - длинные цепочки цифр с разделителями без завершающей цифры (бэктрекинг _PHONE_CAND_RE);
+    - длинные alnum-цепочки (токенизация OEM);
+    - много кириллических слов подряд без отчества (перебор окон ФИО);
+    - повторяющиеся порядковые/числа (парсер выбора).
+    """
+    digits = "".join(rng.choice("0123456789") for _ in range(400))
+    return [
+        "1 " * 400 + "x",
+        "(" + "-".join(digits[i:i + 2] for i in range(0, 400, 2)) + ")-",
+        "A1" * 300,
+        " ".join("".join(rng.choice("ABCDEFGHJKLMNPRSTUVWXYZ0123456789") for _ in range(12)) for _ in range(150)),
+        " ".join(rng.choice(["слово", "деталь", "привезти", "быстро", "Москва"]) for _ in range(500)),
+        "вариант " * 200 + "первый второй третий " * 50,
+        "ул " * 300 + "1",
+    ]
+
+
+def load_corpus(seed: int = 26) -> List[str]:
+    rng = random.Random(seed)
+    base = _replay_texts() + list(_TYPICAL)
+    return base + _long_texts(base, rng) + _adversarial_texts(rng)
+
+
+def load_trace_requests() -> List[Dict[str, Any]]:
+    """Полные CortexRequest из trace-фикстур (для бенчмарков уровня flow/transport)."""
+    out: List[Dict[str, Any]] = []
+    for req_file in sorted((FIXTURES / "trace_2026_01_05").glob("*__request.json")):
+        with open(req_file, "r", encoding="utf-8") as f:
+            out.append(json.load(f))
+    return out
+
+
+def load_dialog_turn_texts(path: Path, *, client_only: bool = True) -> List[str]:
+    """Тексты из normalized/dialog_turns.jsonl (формат Node-скриптов дампа диалогов)."""
+    out: List[str] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                turn = json.loads(line)
+            except ValueError:
+                continue
+            if client_only and turn.get("author_type") not in (None, "client"):
+                continue
+            text = turn.get("text")
+            if isinstance(text, str) and text.strip():
+                out.append(text)
+    return out
+
+
+def synthetic_dialog_texts(n: int = 14_000, seed: int = 27) -> List[str]:
+    """Замена dialog_turns.jsonl, когда реального дампа нет под рукой."""
+    rng = random.Random(seed)
+    base = _replay_texts() + list(_TYPICAL) + ["да", "1", "2", "спасибо", "Самовывоз"]
+    return [rng.choice(base) for _ in range(n)]
+
+
+_ABCP_BRANDS = ["VAG", "MERCEDES-BENZ", "BOSCH", "FEBI", "LEMFORDER", "HELLA"]
+
+
+def synthetic_abcp(n_offers: int = 1000, n_oems: int = 5, seed: int = 37) -> Dict[str, Any]:
+    """injected_abcp в формате Node (как в trace-фикстурах), n_offers офферов на n_oems номеров."""
+    rng = random.Random(seed)
+    out: Dict[str, Any] = {}
+    per_oem = max(1, n_offers // max(1, n_oems))
+    for k in range(n_oems):
+        oem = f"5Q{k}411{105 + k}R"
+        offers = []
+        for i in range(per_oem):
+            min_days = rng.randint(1, 40)
+            offers.append(
+                {
+                    "brand": rng.choice(_ABCP_BRANDS),
+                    "supplier": f"S{i % 23}" if i % 4 else None,
+                    "price": rng.randint(500, 60000),
+                    "quantity": rng.randint(1, 100),
+                    "minDays": min_days,
+                    "maxDays": min_days + rng.randint(0, 7),
+                    "availabilityRaw": rng.randint(1, 100),
+                    "deliveryRaw": f"до {min_days} р.дн",
+                    "oem": oem,
+                    "isAnalog": i % 5 == 0,
+                    "isOriginal": None,
+                }
+            )
+        out[oem] = {"offers": offers}
+    return out
@@ -0,0 +1,126 @@
+# benchmarks/eval_oem_separators.py
+# Польза и точность склейки OEM с разделителями ("4N0 907 998") на replay/датасетах.
+#
+#   python -m benchmarks.eval_oem_separators
+#   python -m benchmarks.eval_oem_separators --turns data/.../dialog_turns.jsonl --samples 30
+#   python -m benchmarks.eval_oem_separators --labelled cases.jsonl   # {"text": ..., "oem": ... | null}
+#
+# Три среза:
+#   corpus    — "rescued": реплики, где цельного OEM-токена нет, а склейка нашла кандидата
+#               (раньше такие уходили в LLM / CLARIFY_NUMBER_TYPE); выборка — для ручной проверки;
+#   respaced  — польза: OEM из реплик корпуса переписан группами ("4N0907998" -> "4N0 907 998",
+#               "4N0-907-998"), сколько номеров склейка восстанавливает;
+#   labelled  — точность: размеченные реплики (встроенные LABELLED_CASES + --labelled),
+#               ложные срабатывания (FP) — OEM там, где его нет или он другой, печатаются все.
+
+import argparse
+import json
+import re
+import sys
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from flows.lead_sales.parsers.oem import URL_RE, assemble_separated_oem_candidates, extract_oem_from_text
+
+from benchmarks.corpus import load_corpus, load_dialog_turn_texts
+
+_CONTIGUOUS_RE = re.compile(r"[A-Za-z0-9]{6,25}")
+
+# (реплика, ожидаемый OEM или None)
+LABELLED_CASES: List[Tuple[str, Optional[str]]] = [
+    ("нужен 4N0 907 998", "4N0907998"),
+    ("4N0-907-998", "4N0907998"),
+    ("VAG 4N0.907.998", "4N0907998"),
+    ("A 000 420 17 20 есть?", "A0004201720"),
+    ("Добрый день, нужны колодки, артикул 4N0 907 998", "4N0907998"),
+    ("номер: 1K0 698 151 A", "1K0698151A"),
+    ("Нужны колодки на Audi A6 C7 2012 г", None),
+    ("BMW X5 E70 3.0d 2008 года", None),
+    ("Mercedes W211 E 320 CDI 2005", None),
+    ("Тойота Камри V70 2.5 2019", None),
+    ("Kia Rio 1.6 2015 года, нужен фильтр", None),
+    ("Колодки на W211 E 320 CDI", None),
+    ("8 999 000 11 22", None),
+    ("+7 999 000 11 22", None),
+    ("приеду 05.01.2026", None),
+    ("цена 1.500.000", None),
+    ("номер заказа 102 123 458", None),
+    ("WDB 2110 4 21A12 3456", None),
+]
+
+
+def _has_contiguous_candidate(text: str) -> bool:
+    return any(any(ch.isdigit() for ch in tok) for tok in _CONTIGUOUS_RE.findall(URL_RE.sub(" ", text)))
+
+
+def _grouped(oem: str, sep: str) -> str:
+    return sep.join(oem[i : i + 3] for i in range(0, len(oem), 3))
+
+
+def _load_labelled(path: Path) -> List[Tuple[str, Optional[str]]]:
+    out: List[Tuple[str, Optional[str]]] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                out.append((str(row.get("text") or ""), row.get("oem") or None))
+    return out
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Separator-tolerant OEM hit rate and precision")
+    parser.add_argument("--turns", type=Path, default=None, help="путь к dialog_turns.jsonl")
+    parser.add_argument("--labelled", type=Path, default=None, help="jsonl с полями text / oem (null — OEM нет)")
+    parser.add_argument("--samples", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    texts = load_dialog_turn_texts(args.turns) if args.turns else load_corpus()
+
+    total = len(texts)
+    found = 0
+    rescued: List[str] = []
+    respaced_total = respaced_ok = 0
+    for text in texts:
+        oem = extract_oem_from_text(text)
+        if not oem:
+            continue
+        found += 1
+        if not _has_contiguous_candidate(text) and assemble_separated_oem_candidates(text):
+            rescued.append(f"{oem:<22} <- {text[:80]!r}")
+        elif oem in text.upper() and len(oem) <= 20:
+            for sep in (" ", "-"):
+                respaced_total += 1
+                pattern = re.compile(re.escape(oem), re.IGNORECASE)
+                respaced_ok += extract_oem_from_text(pattern.sub(_grouped(oem, sep), text, count=1)) == oem
+
+    print(f"texts: {total}")
+    print(f"with OEM: {found} ({found / total * 100 if total else 0:.2f}%)")
+    print(f"rescued by separator join: {len(rescued)} ({len(rescued) / total * 100 if total else 0:.2f}%)")
+    for line in rescued[: args.samples]:
+        print(f"  {line}")
+    print(
+        f"respaced OEM recovered: {respaced_ok}/{respaced_total}"
+        f" ({respaced_ok / respaced_total * 100 if respaced_total else 0:.2f}%)"
+    )
+
+    cases = LABELLED_CASES + (_load_labelled(args.labelled) if args.labelled else [])
+    tp = fp = fn = 0
+    false_positives: List[str] = []
+    for text, expected in cases:
+        got = extract_oem_from_text(text)
+        if got and got == expected:
+            tp += 1
+        elif got:
+            fp += 1
+            false_positives.append(f"{got:<22} <- {text[:80]!r} (expected {expected})")
+        elif expected:
+            fn += 1
+    print(f"labelled: {len(cases)}  TP {tp}  FP {fp}  FN {fn}")
+    print(f"precision: {tp / (tp + fp) if tp + fp else 1.0:.3f}  recall: {tp / (tp + fn) if tp + fn else 1.0:.3f}")
+    for line in false_positives:
+        print(f"  FP {line}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
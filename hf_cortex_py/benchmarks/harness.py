@@ -0,0 +1,258 @@
+# benchmarks/harness.py
+# Общий каркас микробенчмарков: ns/op, пиковые аллокации на вызов и сверка с baseline.
+#
+# Baseline хранится в JSON рядом с бенчмарком. Чтобы сравнение не зависело от
+# конкретной машины, вместе с цифрами сохраняется калибровка (время эталонного
+# цикла на чистом Python); при сверке baseline масштабируется на отношение калибровок.
+# Калибровка меряется рядом с каждым кейсом, чтобы гасить дрейф частоты CPU за прогон.
+
+import json
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_TOLERANCE = 0.35
+# Аллокации шумят меньше времени, но мелкие абсолютные колебания (интернирование,
+# кэши re) не должны ронять проверку.
+ALLOC_SLACK_BYTES = 512
+# То же для времени: у функций на ~1 мкс относительный шум таймера больше любого порога.
+TIME_SLACK_NS = 500.0
+
+
+@dataclass
+class BenchCase:
+    """
+    Один бенчмарк: функция + генератор аргументов из элемента корпуса.
+
+    make_args вызывается ДО замера (для мутирующих функций вроде
+    apply_strict_funnel там создаётся свежий CortexResult на каждый вызов).
+    """
+    name: str
+    func: Callable[..., Any]
+    make_args: Callable[[str], Tuple[Any, ...]]
+    make_kwargs: Optional[Callable[[str], Dict[str, Any]]] = None
+
+
+@dataclass
+class BenchStat:
+    name: str
+    ops: int
+    ns_per_op: float
+    peak_bytes_per_op: float
+    calibration_ns: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ops": self.ops,
+            "ns_per_op": round(self.ns_per_op, 1),
+            "peak_bytes_per_op": round(self.peak_bytes_per_op, 1),
+        }
+
+
+@dataclass
+class Regression:
+    name: str
+    metric: str
+    baseline: float
+    allowed: float
+    actual: float
+
+    def __str__(self) -> str:
+        return (
+            f"{self.name}: {self.metric} actual={self.actual:.1f} "
+            f"allowed={self.allowed:.1f} (baseline={self.baseline:.1f})"
+        )
+
+
+@dataclass
+class BenchReport:
+    calibration_ns: float
+    stats: List[BenchStat] = field(default_factory=list)
+
+    def to_baseline(self, tolerance: float = DEFAULT_TOLERANCE) -> Dict[str, Any]:
+        return {
+            "calibration_ns": round(self.calibration_ns, 1),
+            "tolerance": tolerance,
+            "cases": {s.name: s.to_dict() for s in self.stats},
+        }
+
+
+def calibrate(loops: int = 100_000, repeat: int = 5) -> float:
+    """Время эталонного цикла (лучшее из repeat), нс."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter_ns()
+        acc = 0
+        for i in range(loops):
+            acc += i & 7
+        best = min(best, time.perf_counter_ns() - t0)
+    return float(best)
+
+
+def _prepare_calls(case: BenchCase, corpus: Sequence[str]) -> List[Tuple[Tuple[Any, ...], Dict[str, Any]]]:
+    calls: List[Tuple[Tuple[Any, ...], Dict[str, Any]]] = []
+    for text in corpus:
+        args = case.make_args(text)
+        kwargs = case.make_kwargs(text) if case.make_kwargs else {}
+        calls.append((args, kwargs))
+    return calls
+
+
+def measure(case: BenchCase, corpus: Sequence[str], *, rounds: int = 20, warmup: int = 2) -> BenchStat:
+    """
+    ns/op — лучший из rounds проходов по корпусу (минимум устойчивее к шуму).
+    peak_bytes_per_op — средний пик tracemalloc на один вызов.
+    """
+    if not corpus:
+        return BenchStat(case.name, 0, 0.0, 0.0)
+
+    func = case.func
+    for _ in range(warmup):
+        for args, kwargs in _prepare_calls(case, corpus):
+            func(*args, **kwargs)
+
+    best_ns = float("inf")
+    for _ in range(rounds):
+        calls = _prepare_calls(case, corpus)
+        t0 = time.perf_counter_ns()
+        for args, kwargs in calls:
+            func(*args, **kwargs)
+        best_ns = min(best_ns, time.perf_counter_ns() - t0)
+
+    calls = _prepare_calls(case, corpus)
+    peak_total = 0
+    tracemalloc.start()
+    try:
+        for args, kwargs in calls:
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            func(*args, **kwargs)
+            _, peak = tracemalloc.get_traced_memory()
+            peak_total += max(0, peak - base)
+    finally:
+        tracemalloc.stop()
+
+    ops = len(corpus)
+    return BenchStat(case.name, ops, best_ns / ops, peak_total / ops)
+
+
+def run_cases(cases: Sequence[BenchCase], corpus: Sequence[str], *, rounds: int = 20) -> BenchReport:
+    """
+    Прогон кейсов. В отчёт ns/op пишется уже приведённым к общей калибровке
+    прогона (по калибровке, снятой вплотную к кейсу).
+    """
+    report = BenchReport(calibration_ns=calibrate())
+    for case in cases:
+        before = calibrate()
+        stat = measure(case, corpus, rounds=rounds)
+        local = min(before, calibrate())
+        stat.calibration_ns = local
+        if local > 0:
+            stat.ns_per_op *= report.calibration_ns / local
+        report.stats.append(stat)
+    return report
+
+
+def load_baseline(path: Path) -> Optional[Dict[str, Any]]:
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(path: Path, report: BenchReport, tolerance: float = DEFAULT_TOLERANCE) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report.to_baseline(tolerance), f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+def compare_with_baseline(
+    report: BenchReport,
+    baseline: Dict[str, Any],
+    *,
+    tolerance: Optional[float] = None,
+) -> List[Regression]:
+    """
+    Возвращает список регрессий относительно baseline.
+
+    Время сравнивается с поправкой на калибровку машины, аллокации — как есть.
+    Кейсы, которых нет в baseline, не проверяются (новый бенчмарк → --update).
+    """
+    tol = float(tolerance if tolerance is not None else baseline.get("tolerance", DEFAULT_TOLERANCE))
+    base_cal = float(baseline.get("calibration_ns") or 0.0)
+    scale = (report.calibration_ns / base_cal) if base_cal > 0 and report.calibration_ns > 0 else 1.0
+
+    cases = baseline.get("cases") or {}
+    out: List[Regression] = []
+    for stat in report.stats:
+        ref = cases.get(stat.name)
+        if not isinstance(ref, dict):
+            continue
+
+        ref_ns = float(ref.get("ns_per_op") or 0.0)
+        if ref_ns > 0:
+            allowed_ns = max(ref_ns * scale * (1.0 + tol), ref_ns * scale + TIME_SLACK_NS)
+            if stat.ns_per_op > allowed_ns:
+                out.append(Regression(stat.name, "ns_per_op", ref_ns, allowed_ns, stat.ns_per_op))
+
+        ref_peak = float(ref.get("peak_bytes_per_op") or 0.0)
+        allowed_peak = ref_peak * (1.0 + tol) + ALLOC_SLACK_BYTES
+        if stat.peak_bytes_per_op > allowed_peak:
+            out.append(Regression(stat.name, "peak_bytes_per_op", ref_peak, allowed_peak, stat.peak_bytes_per_op))
+
+    return out
+
+
+def confirm_regressions(
+    cases: Sequence[BenchCase],
+    corpus: Sequence[str],
+    report: BenchReport,
+    baseline: Dict[str, Any],
+    *,
+    tolerance: Optional[float] = None,
+    retries: int = 2,
+    rounds: int = 20,
+) -> List[Regression]:
+    """
+    Сверка с baseline с перемером: подозрительные кейсы гоняются ещё retries раз,
+    в отчёте остаётся лучший замер. Регрессией считается только то, что
+    воспроизводится во всех попытках (одиночный всплеск шума — не регрессия).
+    """
+    by_name = {c.name: c for c in cases}
+    regressions = compare_with_baseline(report, baseline, tolerance=tolerance)
+    for _ in range(max(0, retries)):
+        suspects = sorted({r.name for r in regressions})
+        if not suspects:
+            break
+        rerun = run_cases([by_name[n] for n in suspects if n in by_name], corpus, rounds=rounds)
+        scale = report.calibration_ns / rerun.calibration_ns if rerun.calibration_ns > 0 else 1.0
+        fresh = {s.name: s for s in rerun.stats}
+        for i, stat in enumerate(report.stats):
+            new = fresh.get(stat.name)
+            if new is None:
+                continue
+            report.stats[i] = BenchStat(
+                stat.name,
+                stat.ops,
+                min(stat.ns_per_op, new.ns_per_op * scale),
+                min(stat.peak_bytes_per_op, new.peak_bytes_per_op),
+                stat.calibration_ns,
+            )
+        regressions = compare_with_baseline(report, baseline, tolerance=tolerance)
+    return regressions
+
+
+def format_report(report: BenchReport, baseline: Optional[Dict[str, Any]] = None) -> str:
+    cases = (baseline or {}).get("cases") or {}
+    lines = [f"calibration: {report.calibration_ns / 1e6:.2f} ms"]
+    header = f"{'case':<48} {'ns/op':>12} {'peak B/op':>12} {'baseline ns':>12}"
+    lines.append(header)
+    lines.append("-" * len(header))
+    for s in report.stats:
+        ref = cases.get(s.name) or {}
+        ref_ns = ref.get("ns_per_op")
+        ref_txt = f"{ref_ns:>12.1f}" if isinstance(ref_ns, (int, float)) else f"{'-':>12}"
+        lines.append(f"{s.name:<48} {s.ns_per_op:>12.1f} {s.peak_bytes_per_op:>12.1f} {ref_txt}")
+    return "\n".join(lines)
@@ -0,0 +1,105 @@
+# core/compression.py
+# gzip ответов Cortex (опционально, HF_CORTEX_GZIP_MIN_BYTES > 0).
+#
+# Ответ PRICING на несколько OEM — десятки КБ (офферы, debug, эхо context); через туннель
+# (start-tunnel-once.ps1, cloudflared) Node получает их заметно дольше, чем по localhost.
+# - Сжимаем только ответ целиком в одном сообщении ASGI и не меньше порога: мелкие ответы
+#   (ошибки, кэш цен, короткие reply) дешевле отдать как есть.
+# - Потоковые ответы (несколько сообщений тела, text/event-stream, NDJSON) не трогаем:
+#   gzip копил бы куски у себя и Node получал бы их с задержкой.
+# - Клиент должен прислать Accept-Encoding: gzip (fetch в Node шлёт его сам и сам распаковывает).
+# Настройки читаются на каждый запрос, как и остальные флаги Cortex.
+
+import gzip
+import os
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+DEFAULT_LEVEL = 1
+
+STREAMING_MEDIA_TYPES = frozenset(("text/event-stream", "application/x-ndjson"))
+
+
+def gzip_min_bytes() -> int:
+    """Порог сжатия в байтах; 0 (по умолчанию) — сжатие выключено."""
+    try:
+        return max(0, int(os.getenv("HF_CORTEX_GZIP_MIN_BYTES", "0") or 0))
+    except ValueError:
+        return 0
+
+
+def gzip_level() -> int:
+    try:
+        return min(9, max(1, int(os.getenv("HF_CORTEX_GZIP_LEVEL", DEFAULT_LEVEL) or DEFAULT_LEVEL)))
+    except ValueError:
+        return DEFAULT_LEVEL
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    for item in (accept_encoding or "").split(","):
+        coding, *params = item.split(";")
+        if coding.strip().lower() not in ("gzip", "*"):
+            continue
+        q = next((p.split("=", 1)[1] for p in params if p.strip().lower().startswith("q=")), "1")
+        try:
+            return float(q) > 0
+        except ValueError:
+            return False
+    return False
+
+
+class GzipMiddleware:
+    """ASGI-middleware: gzip целых ответов от HF_CORTEX_GZIP_MIN_BYTES байт (см. шапку модуля)."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        min_bytes = gzip_min_bytes()
+        if min_bytes <= 0 or not accepts_gzip(Headers(scope=scope).get("accept-encoding")):
+            await self.app(scope, receive, send)
+            return
+
+        level = gzip_level()
+        start: Optional[Message] = None
+        passthrough = False
+
+        async def send_gzip(message: Message) -> None:
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start = message  # заголовки отправим, когда станет ясно, сжимаем ли тело
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+
+            passthrough = True
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start["headers"])
+            media_type = (headers.get("content-type") or "").split(";", 1)[0].strip().lower()
+            if (
+                message.get("more_body", False)
+                or len(body) < min_bytes
+                or "content-encoding" in headers
+                or media_type in STREAMING_MEDIA_TYPES
+            ):
+                await send(start)
+                await send(message)
+                return
+
+            body = gzip.compress(body, compresslevel=level, mtime=0)
+            headers["Content-Encoding"] = "gzip"
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_gzip)
@@ -0,0 +1,28 @@
+# core/event_stream.py
+# Кадры потокового ответа lead_sales (/api/hf-cortex/lead_sales/stream).
+#
+# По умолчанию — NDJSON (application/x-ndjson): одно JSON-событие на строку, имя события в
+# поле "event". С Accept: text/event-stream — SSE: "event: <имя>\ndata: <json>\n\n".
+# Оба типа gzip-middleware не сжимает (core/compression.py): кадр должен уйти сразу.
+
+import json
+from typing import Any, Dict, Optional
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+SSE_MEDIA_TYPE = "text/event-stream"
+
+
+def wants_sse(accept: Optional[str]) -> bool:
+    """SSE только по явному Accept: text/event-stream, иначе NDJSON."""
+    return any(
+        item.split(";", 1)[0].strip().lower() == SSE_MEDIA_TYPE for item in (accept or "").split(",")
+    )
+
+
+def frame(event: str, data: Dict[str, Any], sse: bool) -> bytes:
+    """Один кадр потока: событие event с телом data (dict, сериализуемый в JSON)."""
+    if sse:
+        body = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+        return f"event: {event}\ndata: {body}\n\n".encode("utf-8")
+    body = json.dumps({"event": event, **data}, ensure_ascii=False, separators=(",", ":"))
+    return (body + "\n").encode("utf-8")
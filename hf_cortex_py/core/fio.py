@@ -0,0 +1,70 @@
+# core/fio.py
+# Разбор окна из трёх слов в ФИО — общий для hardening (flows/lead_sales/parsers/fio.py)
+# и разбора ФИО из ответа LLM (core/llm_client.py: parse_full_name).
+
+import re
+from typing import Optional, Tuple
+
+from core.fio_lexicon import has_strong_patronymic_ending, is_first_name, is_patronymic, looks_like_surname
+
+
+_STOPWORDS_FIO = {
+    "город", "г", "ул", "улица", "проспект", "пр", "пр-т", "дом", "д", "кв", "квартира",
+    "корп", "корпус", "стр", "строение", "офис", "самовывоз", "индекс", "республика",
+    "область", "край", "район", "р-н", "шоссе", "пер", "переулок", "проезд",
+}
+
+_PATRONYMIC_RE = re.compile(
+    r"(ович|евич|ич|овна|евна|ична|инична|вна|на)$",
+    re.IGNORECASE,
+)
+
+
+def _norm_word(w: str) -> str:
+    w = w.strip("-")
+    if not w:
+        return w
+    return w[0].upper() + w[1:].lower()
+
+
+def _is_patronymic_word(word: str, first_name: str) -> bool:
+    """
+    Отчество: подтверждено лексиконом ("Ильич", "Иванович"), либо полное окончание
+    (-ович/-евич/-овна/-евна/-ична), либо слабое окончание (-ич/-на) рядом с известным именем.
+    Слабое окончание без имени ("деталь нужна") отчеством не считаем.
+    """
+    m = _PATRONYMIC_RE.search(word)
+    if not m:
+        return False
+    if is_patronymic(word):
+        return True
+    if m.group(1).lower() in ("ич", "вна", "на"):
+        return is_first_name(first_name)
+    return True
+
+
+def match_fio_words(w1: str, w2: str, w3: str) -> Optional[Tuple[str, str, str]]:
+    """
+    Разбор окна из трёх слов -> (фамилия, имя, отчество) или None.
+
+    Порядки: "Фамилия Имя Отчество" и "Имя Отчество Фамилия" — второй только когда
+    третье слово похоже на фамилию (иначе "Сергей Иванович привезите" дал бы фамилию
+    "Привезите"), а отчество с полным окончанием ("Ахмед Рашидович Алиев") или, при
+    слабом окончании (-ич/-на), имя и отчество есть в лексиконе ("Пётр Ильич Петров").
+    """
+    lw1, lw2, lw3 = w1.lower(), w2.lower(), w3.lower()
+
+    # отсекаем адресные/служебные слова
+    if lw1 in _STOPWORDS_FIO or lw2 in _STOPWORDS_FIO or lw3 in _STOPWORDS_FIO:
+        return None
+
+    # строгая проверка отчества
+    if _is_patronymic_word(w3, w2):
+        return (_norm_word(w1), _norm_word(w2), _norm_word(w3))
+
+    if looks_like_surname(w3) and (
+        has_strong_patronymic_ending(w2) or (is_first_name(w1) and is_patronymic(w2))
+    ):
+        return (_norm_word(w3), _norm_word(w1), _norm_word(w2))
+
+    return None
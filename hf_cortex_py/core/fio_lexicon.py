@@ -0,0 +1,119 @@
+# core/fio_lexicon.py
+# Компактный лексикон русских имён/отчеств/фамильных суффиксов для детерминированного разбора ФИО.
+#
+# Данные лежат строками в модуле и превращаются в frozenset при первом обращении
+# (lru_cache): импорт ничего не стоит, дальше проверка слова — O(1).
+# Все слова приводятся к нижнему регистру, "ё" -> "е".
+
+from functools import lru_cache
+from typing import FrozenSet, Tuple
+
+_MALE_NAMES = """
+абрам август адам адриан азат айдар айрат акакий алан александр алексей альберт альфред амир анатолий
+андрей антон аркадий арсен арсений артем артемий артур архип аскольд афанасий богдан борис бронислав
+вадим валентин валерий василий вениамин викентий виктор виль виталий влад владимир владислав владлен
+всеволод вячеслав гавриил геннадий георгий герман глеб гордей григорий давид дамир даниил данил данила
+демид демьян денис дмитрий добрыня евгений евдоким егор елисей емельян ефим захар зиновий иван игнат
+игнатий игорь илья ильдар ильнур иннокентий иосиф ираклий исаак карен карл ким кирилл клим климент
+константин кузьма лаврентий лев леонид леонтий лука лукьян макар максим марат марк матвей мирон
+мирослав митрофан михаил моисей назар наиль никита никифор николай никон олег осип остап павел петр платон
+прохор радик ратмир ренат ринат роберт родион роман ростислав руслан рустам савва савелий самуил
+святослав семен серафим сергей спартак станислав степан тагир тарас темур тигран тимофей тимур тихон
+трофим федор феликс филипп фома фрол харитон эдгар эдуард эльдар эмиль эрик юлиан юрий яков ян ярослав
+"""
+
+_FEMALE_NAMES = """
+ада аделина агата агния аида алевтина александра алена алина алиса алла альбина анастасия ангелина
+анжела анжелика анна антонина арина белла валентина валерия варвара василиса вера вероника виктория
+виолетта галина гульнара дарья диана дина доминика ева евгения екатерина елена елизавета жанна зарина
+зинаида злата зоя инга инна ирина камилла карина каролина кира клавдия кристина ксения лариса лейла
+лиана лидия лилия любовь людмила майя маргарита марина мария марьям милана мирослава надежда наталья
+наталия нелли ника нина нонна оксана олеся ольга полина раиса регина рената римма роза сабина светлана
+серафима снежана софия софья стефания таисия тамара татьяна ульяна фаина эвелина элеонора элина эльвира
+эльмира юлиана юлия яна ярослава
+"""
+
+# Основы отчеств, которые не выводятся из имени механически
+# (Михаил -> Михайлович, Лев -> Львович, Павел -> Павлович, Пётр -> Петрович, Илья -> Ильич ...).
+_IRREGULAR_PATRONYMIC_STEMS = """
+михайл льв павл петр иль кузьм лук фом никит савв никол яковл
+"""
+
+# Типовые фамильные окончания (мужские и женские формы).
+_SURNAME_SUFFIXES: Tuple[str, ...] = (
+    "ов", "ев", "ёв", "ин", "ын", "ский", "цкий", "ской", "цкой", "ова", "ева", "ёва", "ина", "ына",
+    "ская", "цкая", "енко", "ко", "ук", "юк", "чук", "ых", "их", "ян", "дзе", "швили", "ман", "берг",
+)
+
+# Полные окончания отчеств. Короткие ("ич") сами по себе слабые: "Ильич" — отчество,
+# а "кирпич" — нет; для них основа сверяется со словарём.
+_STRONG_PATRONYMIC_ENDINGS: Tuple[str, ...] = ("ович", "евич", "овна", "евна", "ична", "инична")
+_WEAK_PATRONYMIC_ENDINGS: Tuple[str, ...] = ("ич", "вна", "на")
+
+
+def normalize_word(word: str) -> str:
+    return (word or "").strip("-").lower().replace("ё", "е")
+
+
+@lru_cache(maxsize=None)
+def male_first_names() -> FrozenSet[str]:
+    return frozenset(_MALE_NAMES.split())
+
+
+@lru_cache(maxsize=None)
+def female_first_names() -> FrozenSet[str]:
+    return frozenset(_FEMALE_NAMES.split())
+
+
+@lru_cache(maxsize=None)
+def first_names() -> FrozenSet[str]:
+    return male_first_names() | female_first_names()
+
+
+def _patronymic_stem_of(name: str) -> str:
+    # Сергей -> серге(евич), Игорь -> игор(евич), Никита -> никит(ич), Иван -> иван(ович)
+    if name.endswith(("й", "ь", "а", "я")):
+        return name[:-1]
+    return name
+
+
+@lru_cache(maxsize=None)
+def patronymic_stems() -> FrozenSet[str]:
+    stems = {_patronymic_stem_of(n) for n in male_first_names()}
+    stems.update(_IRREGULAR_PATRONYMIC_STEMS.split())
+    return frozenset(stems)
+
+
+def is_first_name(word: str) -> bool:
+    return normalize_word(word) in first_names()
+
+
+def is_patronymic(word: str) -> bool:
+    """
+    Отчество по словарю: окончание отчества + основа от известного мужского имени
+    ("Иванович", "Сергеевна", "Ильич", "Михайловна").
+    """
+    # все окончания отчеств заканчиваются на "ич"/"на" — дешёвый отсев до нормализации
+    if not word or not word.lower().endswith(("ич", "на")):
+        return False
+    w = normalize_word(word)
+    if len(w) < 4:
+        return False
+    stems = patronymic_stems()
+    for ending in _STRONG_PATRONYMIC_ENDINGS + ("ич",):
+        if w.endswith(ending) and w[: -len(ending)] in stems:
+            return True
+    return False
+
+
+def has_strong_patronymic_ending(word: str) -> bool:
+    return normalize_word(word).endswith(_STRONG_PATRONYMIC_ENDINGS)
+
+
+def has_weak_patronymic_ending(word: str) -> bool:
+    return normalize_word(word).endswith(_WEAK_PATRONYMIC_ENDINGS)
+
+
+def looks_like_surname(word: str) -> bool:
+    w = normalize_word(word)
+    return len(w) >= 4 and w.endswith(_SURNAME_SUFFIXES)
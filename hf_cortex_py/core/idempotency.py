@@ -0,0 +1,175 @@
+# core/idempotency.py
+# Идемпотентные ответы Cortex: повтор запроса с тем же Idempotency-Key (портал + диалог +
+# сообщение + проход) получает сохранённый CortexResponse, а не новый ответ LLM.
+#
+# - Готовый ответ хранится в слое состояния (core/state.py) с TTL — при sqlite/redis
+#   он виден всем воркерам.
+# - Параллельный повтор в том же процессе ждёт future первого вызова.
+# - Повтор в другом воркере видит маркер "pending" (поставлен через CAS) и опрашивает
+#   хранилище, пока ответ не появится. Маркер живёт pending_ttl_s — дольше худшего хода
+#   (таймауты LLM), иначе он истёк бы посреди хода и повтор посчитал бы ответ второй раз.
+#   Не дождался за wait_s — IdempotencyInProgress (эндпоинт отдаёт 503 + Retry-After),
+#   а не повторный расчёт.
+# - Ответы с ошибкой (cacheable=False / исключение) не сохраняются и снимают маркер:
+#   ретрай должен иметь шанс (ждущий повтор перехватывает ход через тот же CAS).
+# - sqlite/redis — блокирующий ввод-вывод: вызовы хранилища уходят в поток
+#   (asyncio.to_thread), event loop не ждёт диск/сеть. memory — напрямую.
+
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from core.state import StateBackend, get_state_backend
+
+DEFAULT_TTL_S = 600.0
+DEFAULT_WAIT_S = 60.0
+DEFAULT_PENDING_TTL_S = 300.0
+POLL_INTERVAL_S = 0.05
+RETRY_AFTER_S = 5
+
+IDEMPOTENCY_IN_PROGRESS = "idempotency_in_progress"
+
+KEY_PREFIX = "idem:"
+_PENDING = b'{"state":"pending"}'
+
+# compute() -> (ответ как dict, можно ли его сохранять)
+Compute = Callable[[], Awaitable[Tuple[Dict[str, Any], bool]]]
+
+
+class IdempotencyInProgress(Exception):
+    """Первый вызов с этим ключом ещё считается (в другом воркере); повторить позже."""
+
+    def __init__(self, key: str, retry_after_s: int = RETRY_AFTER_S) -> None:
+        super().__init__(f"{IDEMPOTENCY_IN_PROGRESS}: {key}")
+        self.key = key
+        self.retry_after_s = retry_after_s
+
+
+def _parse_done(raw: Optional[bytes]) -> Optional[Dict[str, Any]]:
+    if raw is None or raw == _PENDING:
+        return None
+    try:
+        data = json.loads(raw)
+    except Exception:
+        return None
+    if isinstance(data, dict) and data.get("state") == "done" and isinstance(data.get("response"), dict):
+        return data["response"]
+    return None
+
+
+class IdempotencyStore:
+    def __init__(
+        self,
+        backend: StateBackend,
+        *,
+        ttl_s: float = DEFAULT_TTL_S,
+        wait_s: float = DEFAULT_WAIT_S,
+        pending_ttl_s: float = DEFAULT_PENDING_TTL_S,
+    ) -> None:
+        self.backend = backend
+        self.ttl_s = float(ttl_s)
+        self.wait_s = float(wait_s)
+        self.pending_ttl_s = float(pending_ttl_s)
+        self._inline_io = backend.name == "memory"
+        self._inflight: Dict[str, "asyncio.Future[Tuple[Dict[str, Any], bool]]"] = {}
+
+    async def _io(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self._inline_io:
+            return fn(*args)
+        return await asyncio.to_thread(fn, *args)
+
+    async def _claim(self, key: str) -> bool:
+        return bool(await self._io(self.backend.cas, KEY_PREFIX + key, None, _PENDING, self.pending_ttl_s))
+
+    async def _wait_other_worker(self, key: str) -> Optional[Dict[str, Any]]:
+        """Ответ другого воркера; None — он упал и снял маркер, ход перехвачен (считаем сами)."""
+        deadline = time.monotonic() + self.wait_s
+        while time.monotonic() < deadline:
+            await asyncio.sleep(POLL_INTERVAL_S)
+            raw = await self._io(self.backend.get, KEY_PREFIX + key)
+            if raw is None:
+                if await self._claim(key):
+                    return None
+                continue
+            stored = _parse_done(raw)
+            if stored is not None:
+                return stored
+        raise IdempotencyInProgress(key)
+
+    async def _run_once(self, key: str, compute: Compute) -> Tuple[Dict[str, Any], bool]:
+        stored = _parse_done(await self._io(self.backend.get, KEY_PREFIX + key))
+        if stored is not None:
+            return stored, True
+
+        if not await self._claim(key):
+            other = await self._wait_other_worker(key)
+            if other is not None:
+                return other, True
+
+        try:
+            response, cacheable = await compute()
+        except BaseException:
+            await self._io(self.backend.delete, KEY_PREFIX + key)
+            raise
+
+        if cacheable:
+            await self._io(
+                self.backend.set,
+                KEY_PREFIX + key,
+                json.dumps({"state": "done", "response": response}, ensure_ascii=False).encode("utf-8"),
+                self.ttl_s,
+            )
+        else:
+            await self._io(self.backend.delete, KEY_PREFIX + key)
+        return response, False
+
+    async def run(self, key: str, compute: Compute) -> Tuple[Dict[str, Any], bool]:
+        """Возвращает (ответ, replay). replay=True — ответ взят из сохранённого/чужого вызова.
+
+        IdempotencyInProgress — другой воркер считает этот ключ дольше wait_s.
+        """
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return (await asyncio.shield(inflight))[0], True
+
+        # future регистрируется до первого await: параллельный повтор в этом процессе ждёт его
+        fut: "asyncio.Future[Tuple[Dict[str, Any], bool]]" = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            out = await self._run_once(key, compute)
+        except BaseException as e:
+            fut.set_exception(e)
+            fut.exception()  # помечаем как обработанное, если ждущих нет
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        fut.set_result(out)
+        return out
+
+
+_store: Optional[IdempotencyStore] = None
+_store_lock = threading.Lock()
+
+
+def get_idempotency_store() -> IdempotencyStore:
+    """Процессный синглтон; TTL/ожидание/маркер — HF_CORTEX_IDEMPOTENCY_TTL_S / _WAIT_S / _PENDING_TTL_S."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = IdempotencyStore(
+                    get_state_backend(),
+                    ttl_s=float(os.getenv("HF_CORTEX_IDEMPOTENCY_TTL_S", DEFAULT_TTL_S)),
+                    wait_s=float(os.getenv("HF_CORTEX_IDEMPOTENCY_WAIT_S", DEFAULT_WAIT_S)),
+                    pending_ttl_s=float(os.getenv("HF_CORTEX_IDEMPOTENCY_PENDING_TTL_S", DEFAULT_PENDING_TTL_S)),
+                )
+    return _store
+
+
+def reset_idempotency_store() -> None:
+    global _store
+    with _store_lock:
+        _store = None
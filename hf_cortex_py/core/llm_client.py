@@ -12,6 +12,7 @@ from openai import OpenAI
 
 from core.models import CortexResult
 from core.prompt_lead_sales import SYSTEM_PROMPT
+from core.fio import match_fio_words
 
 
 # --------------------------------------------
@@ -257,22 +258,14 @@ def parse_full_name(text: str) -> Dict[str, Optional[str]]:
     if len(words) < 3:
         return {"last": None, "first": None, "middle": None}
 
-    # Берём первое подходящее окно из 3 слов
-    patronymic_re = re.compile(r"(ович|евич|ич|овна|евна|ична|инична|вна|на)$", re.IGNORECASE)
-
-    def norm(w: str) -> str:
-        w = w.strip("-")
-        if not w:
-            return w
-        return w[0].upper() + w[1:].lower()
-
+    # Берём первое подходящее окно из 3 слов.
+    # Варианты: "Фамилия Имя Отчество" или "Имя Отчество Фамилия" — решает
+    # тот же разборщик с лексиконом имён/отчеств, что и hardening.
     for i in range(0, len(words) - 2):
-        w1, w2, w3 = words[i], words[i + 1], words[i + 2]
-        # варианты: Фамилия Имя Отчество  или  Имя Отчество Фамилия
-        if patronymic_re.search(w3):
-            return {"last": norm(w1), "first": norm(w2), "middle": norm(w3)}
-        if patronymic_re.search(w2):
-            return {"last": norm(w3), "first": norm(w1), "middle": norm(w2)}
+        parsed = match_fio_words(words[i], words[i + 1], words[i + 2])
+        if parsed:
+            last, first, middle = parsed
+            return {"last": last, "first": first, "middle": middle}
 
     return {"last": None, "first": None, "middle": None}
 
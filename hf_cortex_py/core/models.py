@@ -1,8 +1,10 @@
+import copy
 from datetime import datetime
-from typing import Any, Dict, Optional, List, Union
+from typing import Any, Callable, Dict, Optional, List, Tuple, Type, TypeVar, Union
 import uuid
 
 from pydantic import BaseModel, Field
+from pydantic_core import PydanticUndefined
 
 
 class CortexPayload(BaseModel):
@@ -12,6 +14,13 @@ class CortexPayload(BaseModel):
     sessionSnapshot — слепок сессии (лид, контакт, стадия, OEM и т.п.).
     baseContext    — дополнительные данные (ABCP_SUMMARY, портал, настройки).
     injected_abcp  — сырой ответ ABCP, который Node может «вкалывать» во второй проход.
+    channel        — канал диалога (telegram / avito / drom) для шаблона ответа PRICING.
+
+    Delta-протокол сессии (опционально, см. core/session_cache.py):
+    sessionKey         — ключ сессии (портал + диалог);
+    sessionVersion     — версия снимка после этого хода;
+    sessionBaseVersion — версия, к которой применяется sessionDelta;
+    sessionDelta       — JSON Merge Patch вместо полного sessionSnapshot.
     """
     msg: Optional[Dict[str, Any]] = None
     sessionSnapshot: Optional[Dict[str, Any]] = None
@@ -19,6 +28,12 @@ class CortexPayload(BaseModel):
     injected_abcp: Optional[Dict[str, Any]] = None
     # Канонические варианты, которые может прислать Node (fallback, когда injected_abcp отсутствует)
     offers: Optional[List[Dict[str, Any]]] = None
+    channel: Optional[str] = None
+
+    sessionKey: Optional[str] = None
+    sessionVersion: Optional[int] = None
+    sessionBaseVersion: Optional[int] = None
+    sessionDelta: Optional[Dict[str, Any]] = None
 
 
 class CortexRequest(BaseModel):
@@ -173,3 +188,113 @@ class CortexResponse(BaseModel):
     error: Optional[str] = None
     request_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     ts: str = Field(default_factory=lambda: datetime.utcnow().isoformat() + "Z")
+
+
+class AbcpCachePut(BaseModel):
+    """
+    Тело PUT /api/hf-cortex/abcp_cache/{oem}: ответ ABCP на запрос этого OEM
+    в формате injected_abcp ({oem: {"offers": [...]}}, запрошенный номер + замены).
+    """
+    abcp: Dict[str, Any]
+
+
+class AbcpCacheEntry(BaseModel):
+    """
+    Ответ эндпоинтов кэша цен ABCP (core/price_cache.py).
+    status: fresh | stale | miss; revalidate=true — именно этот вызов должен сходить в ABCP
+    и положить свежий ответ (PUT); fresh_s — сколько секунд запись считается свежей (PUT).
+    """
+    ok: bool = True
+    oem: str
+    status: str
+    abcp: Optional[Dict[str, Any]] = None
+    age_s: Optional[float] = None
+    revalidate: bool = False
+    fresh_s: Optional[float] = None
+
+
+# ---------------------------------------------------------------------------
+# Сборка моделей из доверенных данных (без повторной валидации).
+#
+# Офферы канона (OfferRow), короткий путь PRICING и contact_update из hardening собираются из
+# значений, которые Python уже нормализовал сам (float-цены, int-сроки, строки или None).
+# Полная валидация нужна только на входе от Node и от LLM (normalize_llm_result).
+#
+# model_construct в pydantic 2 для этого не годится: он медленнее обычной валидации
+# (~6.5 против ~3.5 мкс на Offer), потому что обходит поля с алиасами и умными копиями
+# умолчаний. Здесь объект заполняется так же, как в конце model_construct, но по плану
+# полей, посчитанному один раз на класс. Это слоты BaseModel, а не публичный API: pydantic
+# закреплён в requirements.txt, а tests/test_models.py сверяет слоты с model_construct —
+# при обновлении pydantic тест упадёт раньше, чем ответы Cortex.
+# ---------------------------------------------------------------------------
+
+M = TypeVar("M", bound=BaseModel)
+
+
+class _TrustedPlan:
+    """План сборки класса: имена полей и умолчания; None в _trusted_plans — через model_validate."""
+
+    __slots__ = ("names", "defaults")
+
+    def __init__(self, names: frozenset, defaults: Tuple[Tuple[str, Any, Optional[Callable[[], Any]]], ...]) -> None:
+        self.names = names
+        self.defaults = defaults
+
+
+_trusted_plans: Dict[type, Optional[_TrustedPlan]] = {}
+_set = object.__setattr__
+
+
+def _trusted_plan(cls: Type[BaseModel]) -> Optional[_TrustedPlan]:
+    defaults: List[Tuple[str, Any, Optional[Callable[[], Any]]]] = []
+    ok = not cls.__private_attributes__ and cls.model_config.get("extra") != "allow"
+    for name, field in cls.model_fields.items():
+        factory = field.default_factory
+        if factory is not None and getattr(field, "default_factory_takes_data", False):
+            ok = False
+        elif factory is None and isinstance(field.default, (list, dict, set)):
+            factory = lambda d=field.default: copy.deepcopy(d)  # noqa: E731
+        defaults.append((name, field.default, factory))
+
+    plan = _TrustedPlan(frozenset(cls.model_fields), tuple(defaults)) if ok else None
+    _trusted_plans[cls] = plan
+    return plan
+
+
+def construct_trusted(cls: Type[M], values: Dict[str, Any]) -> M:
+    """Модель из уже проверенных значений полей: без валидации и приведения типов.
+
+    Пропущенные поля получают умолчания (фабрики вызываются на каждый объект), лишние
+    ключи отбрасываются, как при extra="ignore". Без обязательного поля — обычная
+    валидация (ValidationError). values с полным набором полей становится __dict__
+    объекта без копии — вызывающий его больше не трогает.
+    """
+    try:
+        plan = _trusted_plans[cls]
+    except KeyError:
+        plan = _trusted_plan(cls)
+    if plan is None:
+        return cls.model_validate(values)
+
+    if values.keys() == plan.names:
+        data = values
+        fields_set = set(plan.names)
+    else:
+        data = {}
+        for name, default, factory in plan.defaults:
+            if name in values:
+                data[name] = values[name]
+            elif factory is not None:
+                data[name] = factory()
+            elif default is PydanticUndefined:
+                return cls.model_validate(values)
+            else:
+                data[name] = default
+        fields_set = plan.names.intersection(values)
+
+    obj = cls.__new__(cls)
+    _set(obj, "__dict__", data)
+    _set(obj, "__pydantic_fields_set__", fields_set)
+    _set(obj, "__pydantic_extra__", None)
+    _set(obj, "__pydantic_private__", None)
+    return obj
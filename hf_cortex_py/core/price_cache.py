@@ -0,0 +1,161 @@
+# core/price_cache.py
+# Кэш ответов ABCP по OEM в Cortex (опционально, HF_CORTEX_PRICE_CACHE=1).
+#
+# Node перед запросом в ABCP спрашивает Cortex (GET /api/hf-cortex/abcp_cache/{oem}), а после
+# ответа ABCP кладёт его обратно (PUT). Популярные OEM в пределах минут не ходят в ABCP повторно.
+# injected_abcp из lead_sales в кэш НЕ кладём: Node пересылает его из сессии на следующих ходах
+# (и может прислать то, что сам взял из кэша) — старые цены выглядели бы свежими.
+#
+# - Значение — ответ ABCP на запрос одного OEM в формате injected_abcp: {oem: {"offers": [...]}}
+#   (запрошенный номер + пакеты его замен, как их раскладывает searchManyOEMs).
+# - Свежесть — TTL по поставщику (HF_CORTEX_PRICE_CACHE_SUPPLIER_TTL="S1=60,S2=900"), для
+#   ответа — минимум по его строкам; без поставщика — HF_CORTEX_PRICE_CACHE_TTL_S.
+# - stale-while-revalidate: ещё HF_CORTEX_PRICE_CACHE_STALE_S после свежести ответ отдаётся
+#   со status=stale; revalidate=true получает только один запрос (аренда через CAS), он и
+#   обновляет кэш из ABCP — остальные не дёргают ABCP параллельно.
+# - Хранится в слое состояния (core/state.py): при sqlite/redis кэш общий для воркеров.
+#   Время — time.time(), чтобы возраст записи одинаково считали все процессы.
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, NamedTuple, Optional
+
+from core.state import StateBackend, get_state_backend
+
+DEFAULT_TTL_S = 300.0
+DEFAULT_STALE_S = 600.0
+DEFAULT_LEASE_S = 30.0
+
+KEY_PREFIX = "abcp_price:"
+LEASE_PREFIX = "abcp_price_lease:"
+_LEASE = b"1"
+
+FRESH = "fresh"
+STALE = "stale"
+MISS = "miss"
+
+
+def normalize_price_oem(oem: Any) -> Optional[str]:
+    if not isinstance(oem, str):
+        return None
+    key = "".join(ch for ch in oem.upper() if ch.isalnum())
+    return key or None
+
+
+def parse_supplier_ttl(raw: Optional[str]) -> Dict[str, float]:
+    """ "S1=60, S2=900" -> {"S1": 60.0, "S2": 900.0}; мусорные пары пропускаются."""
+    out: Dict[str, float] = {}
+    for part in (raw or "").split(","):
+        name, sep, value = part.partition("=")
+        if not sep or not name.strip():
+            continue
+        try:
+            out[name.strip()] = float(value)
+        except ValueError:
+            continue
+    return out
+
+
+class PriceLookup(NamedTuple):
+    status: str  # fresh | stale | miss
+    abcp: Optional[Dict[str, Any]]
+    age_s: Optional[float]
+    revalidate: bool  # этот вызывающий должен обновить запись из ABCP
+
+
+class AbcpPriceCache:
+    def __init__(
+        self,
+        backend: StateBackend,
+        *,
+        ttl_s: float = DEFAULT_TTL_S,
+        supplier_ttl: Optional[Dict[str, float]] = None,
+        stale_s: float = DEFAULT_STALE_S,
+        lease_s: float = DEFAULT_LEASE_S,
+        clock=time.time,
+    ) -> None:
+        self.backend = backend
+        self.ttl_s = float(ttl_s)
+        self.supplier_ttl = dict(supplier_ttl or {})
+        self.stale_s = float(stale_s)
+        self.lease_s = float(lease_s)
+        self._clock = clock
+
+    def ttl_for(self, abcp: Dict[str, Any]) -> float:
+        """Свежесть ответа: минимальный TTL среди поставщиков его строк."""
+        ttl = self.ttl_s
+        if not self.supplier_ttl:
+            return ttl
+        for pack in abcp.values():
+            rows = pack.get("offers") if isinstance(pack, dict) else None
+            for row in rows if isinstance(rows, list) else ():
+                if not isinstance(row, dict):
+                    continue
+                supplier = row.get("supplier") or row.get("supplierCode")
+                if supplier is not None:
+                    ttl = min(ttl, self.supplier_ttl.get(str(supplier), ttl))
+        return ttl
+
+    def get(self, oem: Any) -> PriceLookup:
+        key = normalize_price_oem(oem)
+        if key is None:
+            return PriceLookup(MISS, None, None, False)
+
+        raw = self.backend.get_json(KEY_PREFIX + key)
+        if not isinstance(raw, dict) or not isinstance(raw.get("abcp"), dict):
+            return PriceLookup(MISS, None, None, True)
+
+        age = max(0.0, self._clock() - float(raw.get("stored_at") or 0.0))
+        if age < float(raw.get("fresh_s") or 0.0):
+            return PriceLookup(FRESH, raw["abcp"], age, False)
+        revalidate = self.backend.cas(LEASE_PREFIX + key, None, _LEASE, self.lease_s)
+        return PriceLookup(STALE, raw["abcp"], age, revalidate)
+
+    def put(self, oem: Any, abcp: Dict[str, Any]) -> Optional[float]:
+        """Кладёт ответ ABCP по OEM; возвращает его свежесть (с) или None, если OEM пустой."""
+        key = normalize_price_oem(oem)
+        if key is None or not isinstance(abcp, dict):
+            return None
+        fresh_s = self.ttl_for(abcp)
+        record = {"abcp": abcp, "stored_at": self._clock(), "fresh_s": fresh_s}
+        self.backend.set(
+            KEY_PREFIX + key,
+            json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+            fresh_s + self.stale_s,
+        )
+        self.backend.delete(LEASE_PREFIX + key)
+        return fresh_s
+
+
+_cache: Optional[AbcpPriceCache] = None
+_cache_lock = threading.Lock()
+
+
+def price_cache_enabled() -> bool:
+    return (os.getenv("HF_CORTEX_PRICE_CACHE", "0") or "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def get_price_cache() -> Optional[AbcpPriceCache]:
+    """Процессный синглтон поверх слоя состояния; None — кэш выключен (HF_CORTEX_PRICE_CACHE)."""
+    global _cache
+    if not price_cache_enabled():
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AbcpPriceCache(
+                    get_state_backend(),
+                    ttl_s=float(os.getenv("HF_CORTEX_PRICE_CACHE_TTL_S", DEFAULT_TTL_S)),
+                    supplier_ttl=parse_supplier_ttl(os.getenv("HF_CORTEX_PRICE_CACHE_SUPPLIER_TTL")),
+                    stale_s=float(os.getenv("HF_CORTEX_PRICE_CACHE_STALE_S", DEFAULT_STALE_S)),
+                    lease_s=float(os.getenv("HF_CORTEX_PRICE_CACHE_LEASE_S", DEFAULT_LEASE_S)),
+                )
+    return _cache
+
+
+def reset_price_cache() -> None:
+    global _cache
+    with _cache_lock:
+        _cache = None
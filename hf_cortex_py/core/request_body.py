@@ -0,0 +1,207 @@
+# core/request_body.py
+# Разбор тела запроса lead_sales с компактным injected_abcp.
+#
+# Ответ ABCP, который Node вкалывает в payload.injected_abcp, бывает на мегабайты: сотни строк
+# на OEM, у каждой — availabilityRaw/deliveryRaw/quantity и прочее, что Cortex не читает.
+# В компактном режиме (HF_CORTEX_ABCP_COMPACT=1) от строки остаются только ABCP_ROW_FIELDS:
+#   - с пакетом ijson — потоково, прямо из чанков тела запроса: полное дерево и даже всё тело
+#     целиком в памяти не собираются, лишние поля пропускаются на уровне событий парсера;
+#   - без ijson — json.loads всего тела и компактизация сразу после (тело уже в памяти, но
+#     лишние поля не доживают до валидации, flow и эха в context).
+# Остальной запрос (msg, sessionSnapshot, ...) разбирается как обычно.
+# Тело в MessagePack (core/wire.py) декодируется целиком и компактизируется так же, как без ijson.
+
+import json
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from core.wire import decode_msgpack
+
+try:  # опциональная зависимость: потоковый JSON-парсер
+    import ijson as _ijson
+except Exception:  # pragma: no cover - зависит от окружения
+    _ijson = None
+
+# Поля строки ABCP, которые читает Cortex: разбор пакета (abcp_summary), индекс OEM (oem_index),
+# граф замен (oem_graph). Плюс ключи заказа, которые читает Node (abcpOrder.js) —
+# injected_abcp уходит обратно в эхе context, и урезанная строка не должна терять заказуемость.
+ABCP_ROW_FIELDS = frozenset(
+    (
+        "itemKey",
+        "supplierCode",
+        "code",
+        "number",
+        "numberFix",
+        "distributorRouteId",
+        "routeId",
+        "description",
+        "price",
+        "minDays",
+        "maxDays",
+        "brand",
+        "name",
+        "article",
+        "supplier",
+        "isOriginal",
+        "isOem",
+        "isAnalog",
+        "oem",
+        "requestedOem",
+    )
+)
+
+
+def abcp_compact_enabled() -> bool:
+    return (os.getenv("HF_CORTEX_ABCP_COMPACT", "0") or "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def compact_abcp(abcp: Any) -> Any:
+    """{oem: {"offers": [row, ...]}} -> те же пакеты, в строках только ABCP_ROW_FIELDS.
+
+    Не-dict строки и пакеты остаются как есть: они участвуют в счётчике offers сводки.
+    """
+    if not isinstance(abcp, dict):
+        return abcp
+    out: Dict[str, Any] = {}
+    for oem, pack in abcp.items():
+        rows = pack.get("offers") if isinstance(pack, dict) else None
+        if not isinstance(rows, list):
+            out[oem] = pack
+            continue
+        out[oem] = {
+            **pack,
+            "offers": [
+                {k: v for k, v in row.items() if k in ABCP_ROW_FIELDS} if isinstance(row, dict) else row
+                for row in rows
+            ],
+        }
+    return out
+
+
+class _CompactBuilder:
+    """Собирает объект из событий ijson.basic_parse, пропуская лишние поля строк injected_abcp.
+
+    Строка ABCP — map на пути payload.injected_abcp.<oem>.offers[i] (глубина стека 6).
+    """
+
+    __slots__ = ("root", "_stack", "_keys", "_skip", "_drop_next")
+
+    def __init__(self) -> None:
+        self.root: Any = None
+        self._stack: List[Any] = []
+        self._keys: List[Optional[str]] = []
+        self._skip = 0  # глубина пропускаемого поддерева
+        self._drop_next = False  # следующее значение — отброшенное поле строки
+
+    def _in_abcp_row(self) -> bool:
+        keys = self._keys
+        return (
+            len(keys) == 6
+            and keys[0] == "payload"
+            and keys[1] == "injected_abcp"
+            and keys[3] == "offers"
+            and isinstance(self._stack[4], list)
+            and isinstance(self._stack[5], dict)
+        )
+
+    def _put(self, value: Any) -> None:
+        if not self._stack:
+            self.root = value
+            return
+        parent = self._stack[-1]
+        if isinstance(parent, list):
+            parent.append(value)
+        else:
+            parent[self._keys[-1]] = value
+
+    def event(self, ev: str, value: Any) -> None:
+        if self._skip:
+            if ev == "start_map" or ev == "start_array":
+                self._skip += 1
+            elif ev == "end_map" or ev == "end_array":
+                self._skip -= 1
+            return
+
+        if ev == "map_key":
+            self._keys[-1] = value
+            self._drop_next = value not in ABCP_ROW_FIELDS and self._in_abcp_row()
+            return
+        if ev == "end_map" or ev == "end_array":
+            self._stack.pop()
+            self._keys.pop()
+            return
+        if self._drop_next:
+            self._drop_next = False
+            if ev == "start_map" or ev == "start_array":
+                self._skip = 1
+            return
+
+        if ev == "start_map":
+            container: Any = {}
+        elif ev == "start_array":
+            container = []
+        else:
+            self._put(value)
+            return
+        self._put(container)
+        self._stack.append(container)
+        self._keys.append(None)
+
+
+class _ChunkReader:
+    """Async file-like поверх request.stream() для ijson.basic_parse_async."""
+
+    def __init__(self, chunks: AsyncIterator[bytes]) -> None:
+        self._chunks = chunks
+        self._buf = b""
+        self._done = False
+
+    async def read(self, size: int = -1) -> bytes:
+        while not self._done and (size < 0 or len(self._buf) < size):
+            try:
+                self._buf += await self._chunks.__anext__()
+            except StopAsyncIteration:
+                self._done = True
+        if size < 0:
+            data, self._buf = self._buf, b""
+        else:
+            data, self._buf = self._buf[:size], self._buf[size:]
+        return data
+
+
+def parse_request_body(body: bytes, *, compact: bool) -> Any:
+    """Тело запроса целиком (bytes) -> JSON; compact — см. шапку модуля."""
+    if not compact:
+        return json.loads(body)
+    if _ijson is not None:
+        builder = _CompactBuilder()
+        for ev, value in _ijson.basic_parse(body, use_float=True):
+            builder.event(ev, value)
+        return builder.root
+    data = json.loads(body)
+    _compact_payload(data)
+    return data
+
+
+def parse_msgpack_body(body: bytes, *, compact: bool) -> Any:
+    """Тело запроса в MessagePack -> те же структуры, что у parse_request_body для JSON."""
+    data = decode_msgpack(body)
+    if compact:
+        _compact_payload(data)
+    return data
+
+
+async def read_request_json(request: Any, *, compact: bool) -> Any:
+    """JSON тела starlette-запроса; в компактном режиме с ijson — потоково из request.stream()."""
+    if compact and _ijson is not None:
+        builder = _CompactBuilder()
+        async for ev, value in _ijson.basic_parse_async(_ChunkReader(request.stream()), use_float=True):
+            builder.event(ev, value)
+        return builder.root
+    return parse_request_body(await request.body(), compact=compact)
+
+
+def _compact_payload(data: Any) -> None:
+    payload = data.get("payload") if isinstance(data, dict) else None
+    if isinstance(payload, dict) and isinstance(payload.get("injected_abcp"), dict):
+        payload["injected_abcp"] = compact_abcp(payload["injected_abcp"])
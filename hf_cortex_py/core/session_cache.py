@@ -0,0 +1,155 @@
+# core/session_cache.py
+# Серверный кэш sessionSnapshot для delta-протокола Node -> Cortex.
+#
+# Node присылает либо полный снимок (+ версию), либо только delta (JSON Merge Patch, RFC 7386)
+# относительно версии, которую Cortex уже видел. Если версии не совпали (рестарт процесса,
+# вытеснение из кэша, другой воркер) — Cortex отвечает session_resync_required и Node
+# переотправляет полный снимок.
+#
+# При общем бэкенде состояния (HF_CORTEX_STATE_BACKEND=sqlite|redis, см. core/state.py) снимки
+# хранятся в нём, и delta может прийти в любой воркер; иначе — LRU в памяти процесса.
+
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from core.state import StateBackend, get_state_backend, is_shared_state_backend
+
+SESSION_RESYNC_REQUIRED = "session_resync_required"
+
+DEFAULT_MAX_ENTRIES = 2000
+DEFAULT_TTL_S = 1800.0
+
+
+def apply_merge_patch(target: Any, patch: Any) -> Any:
+    """JSON Merge Patch (RFC 7386). Исходный target не меняется."""
+    if not isinstance(patch, dict):
+        return copy.deepcopy(patch)
+    out: Dict[str, Any] = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            out.pop(key, None)
+        else:
+            out[key] = apply_merge_patch(out.get(key), value)
+    return out
+
+
+class _Entry(NamedTuple):
+    version: int
+    snapshot: Dict[str, Any]
+    expires_at: float
+
+
+class SessionCache:
+    """Кэш снимков сессий с TTL: LRU в памяти процесса или общий StateBackend."""
+
+    KEY_PREFIX = "session:"
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl_s: float = DEFAULT_TTL_S,
+        clock=time.monotonic,
+        backend: Optional[StateBackend] = None,
+    ) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_s = float(ttl_s)
+        self._clock = clock
+        self._backend = backend
+        self._items: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, dialog_id: str) -> Optional[Tuple[int, Dict[str, Any]]]:
+        if self._backend is not None:
+            raw = self._backend.get_json(self.KEY_PREFIX + dialog_id)
+            if not isinstance(raw, dict) or not isinstance(raw.get("s"), dict):
+                return None
+            return int(raw.get("v") or 0), raw["s"]
+
+        with self._lock:
+            entry = self._items.get(dialog_id)
+            if entry is None:
+                return None
+            if entry.expires_at <= self._clock():
+                del self._items[dialog_id]
+                return None
+            self._items.move_to_end(dialog_id)
+            return entry.version, entry.snapshot
+
+    def put(self, dialog_id: str, version: int, snapshot: Dict[str, Any]) -> None:
+        if self._backend is not None:
+            self._backend.set_json(self.KEY_PREFIX + dialog_id, {"v": int(version), "s": snapshot}, self.ttl_s)
+            return
+
+        with self._lock:
+            self._items[dialog_id] = _Entry(int(version), snapshot, self._clock() + self.ttl_s)
+            self._items.move_to_end(dialog_id)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def resolve(
+        self,
+        dialog_id: str,
+        *,
+        version: int,
+        snapshot: Optional[Dict[str, Any]] = None,
+        delta: Optional[Dict[str, Any]] = None,
+        base_version: Optional[int] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Возвращает актуальный снимок версии `version` и запоминает его.
+
+        - snapshot задан: полный снимок, просто кладём в кэш;
+        - delta задан: применяем к закэшированной base_version;
+          None — кэш пуст/устарел/версия другая (нужен resync).
+        """
+        if snapshot is not None:
+            self.put(dialog_id, version, snapshot)
+            return snapshot
+
+        cached = self.get(dialog_id)
+        if cached is None:
+            return None
+        cached_version, cached_snapshot = cached
+        if base_version is None or cached_version != int(base_version):
+            return None
+
+        merged = apply_merge_patch(cached_snapshot, delta or {})
+        self.put(dialog_id, version, merged)
+        return merged
+
+
+_session_cache: Optional[SessionCache] = None
+_session_cache_lock = threading.Lock()
+
+
+def get_session_cache() -> SessionCache:
+    """Процессный синглтон; размер/TTL из HF_CORTEX_SESSION_CACHE_SIZE / HF_CORTEX_SESSION_CACHE_TTL_S.
+
+    При общем бэкенде состояния кэш живёт в нём (размер тогда ограничивает сам бэкенд).
+    """
+    global _session_cache
+    if _session_cache is None:
+        with _session_cache_lock:
+            if _session_cache is None:
+                _session_cache = SessionCache(
+                    max_entries=int(os.getenv("HF_CORTEX_SESSION_CACHE_SIZE", DEFAULT_MAX_ENTRIES)),
+                    ttl_s=float(os.getenv("HF_CORTEX_SESSION_CACHE_TTL_S", DEFAULT_TTL_S)),
+                    backend=get_state_backend() if is_shared_state_backend() else None,
+                )
+    return _session_cache
+
+
+def reset_session_cache() -> None:
+    global _session_cache
+    with _session_cache_lock:
+        _session_cache = None
@@ -0,0 +1,412 @@
+# core/state.py
+# Слой состояния HF-CORTEX: key/value с TTL и compare-and-set.
+#
+# Бэкенды:
+#   memory — словарь в памяти процесса (по умолчанию, как раньше: состояние per-process);
+#   sqlite — файл на диске (WAL), общий для нескольких воркеров на одной машине;
+#   redis  — Redis-протокол (Redis/KeyDB/Valkey), общий для нескольких машин.
+#            Требует пакет `redis` (опциональная зависимость).
+#
+# Выбор через окружение:
+#   HF_CORTEX_STATE_BACKEND = memory | sqlite | redis
+#   HF_CORTEX_STATE_URL     = путь к sqlite-файлу или redis://host:port/db
+#   HF_CORTEX_STATE_PREFIX  = префикс ключей (по умолчанию "hf_cortex:")
+#   HF_CORTEX_STATE_MEMORY_MAX_BYTES = бюджет memory-бэкенда в байтах ключей+значений
+#                             (по умолчанию 64 МиБ; сверх него вытесняются самые старые ключи)
+#   HF_CORTEX_STATE_SQLITE_PURGE_S = как часто sqlite-бэкенд удаляет все просроченные ключи
+#                             (по умолчанию 60 с)
+#
+# Значения — bytes; для JSON есть get_json/set_json.
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+try:  # опциональная зависимость
+    import redis as _redis
+except Exception:  # pragma: no cover - зависит от окружения
+    _redis = None
+
+DEFAULT_PREFIX = "hf_cortex:"
+DEFAULT_MEMORY_MAX_ENTRIES = 10_000
+DEFAULT_MEMORY_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_SQLITE_PURGE_S = 60.0
+
+
+class StateBackend(ABC):
+    """Минимальный контракт хранилища: get/set/ttl/delete/cas."""
+
+    name = "base"
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl_s: Optional[float] = None) -> None:
+        ...
+
+    @abstractmethod
+    def ttl(self, key: str) -> Optional[float]:
+        """Сколько секунд осталось жить ключу; None — ключа нет или TTL не задан."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def cas(self, key: str, expected: Optional[bytes], value: bytes, ttl_s: Optional[float] = None) -> bool:
+        """Записывает value, только если текущее значение == expected (None — ключа нет)."""
+
+    def close(self) -> None:
+        pass
+
+    def get_json(self, key: str) -> Any:
+        raw = self.get(key)
+        if raw is None:
+            return None
+        try:
+            return json.loads(raw)
+        except Exception:
+            return None
+
+    def set_json(self, key: str, value: Any, ttl_s: Optional[float] = None) -> None:
+        self.set(key, json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), ttl_s)
+
+
+class MemoryStateBackend(StateBackend):
+    """In-process LRU с TTL. Не разделяется между воркерами.
+
+    Ограничен и числом ключей, и суммарным размером ключей+значений (ответы Cortex и пакеты
+    ABCP — десятки КБ): вытесняются самые давно использованные ключи.
+    """
+
+    name = "memory"
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MEMORY_MAX_ENTRIES,
+        clock=time.monotonic,
+        max_bytes: int = DEFAULT_MEMORY_MAX_BYTES,
+    ) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(1, int(max_bytes))
+        self._clock = clock
+        self._items: "OrderedDict[str, Tuple[bytes, Optional[float]]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def _drop(self, key: str) -> None:
+        item = self._items.pop(key, None)
+        if item is not None:
+            self._bytes -= len(key) + len(item[0])
+
+    def _live(self, key: str) -> Optional[Tuple[bytes, Optional[float]]]:
+        item = self._items.get(key)
+        if item is None:
+            return None
+        if item[1] is not None and item[1] <= self._clock():
+            self._drop(key)
+            return None
+        return item
+
+    def _put(self, key: str, value: bytes, ttl_s: Optional[float]) -> None:
+        expires_at = self._clock() + ttl_s if ttl_s is not None else None
+        self._drop(key)
+        self._items[key] = (value, expires_at)
+        self._bytes += len(key) + len(value)
+        while self._items and (len(self._items) > self.max_entries or self._bytes > self.max_bytes):
+            self._drop(next(iter(self._items)))
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._live(key)
+            if item is None:
+                return None
+            self._items.move_to_end(key)
+            return item[0]
+
+    def set(self, key: str, value: bytes, ttl_s: Optional[float] = None) -> None:
+        with self._lock:
+            self._put(key, value, ttl_s)
+
+    def ttl(self, key: str) -> Optional[float]:
+        with self._lock:
+            item = self._live(key)
+            if item is None or item[1] is None:
+                return None
+            return max(0.0, item[1] - self._clock())
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._drop(key)
+
+    def cas(self, key: str, expected: Optional[bytes], value: bytes, ttl_s: Optional[float] = None) -> bool:
+        with self._lock:
+            item = self._live(key)
+            current = item[0] if item is not None else None
+            if current != expected:
+                return False
+            self._put(key, value, ttl_s)
+            return True
+
+
+class SqliteStateBackend(StateBackend):
+    """sqlite-файл в WAL-режиме: общий для воркеров одной машины.
+
+    Соединение — на поток; CAS — в транзакции BEGIN IMMEDIATE (блокировка на запись).
+    Просроченный ключ удаляется при чтении; ключи, которые больше не читают (Idempotency-Key,
+    кэш цен), — амортизированно: не чаще раза в purge_interval_s одна из записей удаляет все
+    просроченные строки (по индексу expires_at).
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, clock=time.time, purge_interval_s: float = DEFAULT_SQLITE_PURGE_S) -> None:
+        self.path = path
+        self._clock = clock
+        self.purge_interval_s = max(0.0, float(purge_interval_s))
+        self._next_purge = self._clock() + self.purge_interval_s
+        self._purge_lock = threading.Lock()
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS kv_expires_at ON kv (expires_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _expires_at(self, ttl_s: Optional[float]) -> Optional[float]:
+        return self._clock() + ttl_s if ttl_s is not None else None
+
+    def purge_expired(self) -> int:
+        """Удаляет все просроченные ключи; возвращает их число."""
+        now = self._clock()
+        with self._purge_lock:
+            self._next_purge = now + self.purge_interval_s
+        return self._conn().execute("DELETE FROM kv WHERE expires_at <= ?", (now,)).rowcount
+
+    def _maybe_purge(self) -> None:
+        if self._clock() < self._next_purge:
+            return
+        with self._purge_lock:
+            if self._clock() < self._next_purge:
+                return
+            self._next_purge = self._clock() + self.purge_interval_s
+        try:
+            self.purge_expired()
+        except sqlite3.OperationalError:
+            pass  # база занята другим воркером — почистим в следующий раз
+
+    def _read(self, conn: sqlite3.Connection, key: str) -> Optional[Tuple[bytes, Optional[float]]]:
+        row = conn.execute("SELECT value, expires_at FROM kv WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] is not None and row[1] <= self._clock():
+            return None
+        return bytes(row[0]), row[1]
+
+    def get(self, key: str) -> Optional[bytes]:
+        item = self._read(self._conn(), key)
+        if item is None:
+            self._conn().execute("DELETE FROM kv WHERE key = ? AND expires_at <= ?", (key, self._clock()))
+            return None
+        return item[0]
+
+    def set(self, key: str, value: bytes, ttl_s: Optional[float] = None) -> None:
+        self._conn().execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, self._expires_at(ttl_s)),
+        )
+        self._maybe_purge()
+
+    def ttl(self, key: str) -> Optional[float]:
+        item = self._read(self._conn(), key)
+        if item is None or item[1] is None:
+            return None
+        return max(0.0, item[1] - self._clock())
+
+    def delete(self, key: str) -> None:
+        self._conn().execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def cas(self, key: str, expected: Optional[bytes], value: bytes, ttl_s: Optional[float] = None) -> bool:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            item = self._read(conn, key)
+            current = item[0] if item is not None else None
+            if current != expected:
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, self._expires_at(ttl_s)),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._maybe_purge()
+        return True
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+# KEYS[1] — ключ; ARGV[1] — ожидаемое значение ("" + ARGV[4]=="1" означает "ключа нет");
+# ARGV[2] — новое значение; ARGV[3] — TTL в мс (0 — без TTL).
+_REDIS_CAS_SCRIPT = """
+local cur = redis.call('GET', KEYS[1])
+if ARGV[4] == '1' then
+  if cur then return 0 end
+elseif cur ~= ARGV[1] then
+  return 0
+end
+if tonumber(ARGV[3]) > 0 then
+  redis.call('SET', KEYS[1], ARGV[2], 'PX', ARGV[3])
+else
+  redis.call('SET', KEYS[1], ARGV[2])
+end
+return 1
+"""
+
+
+class RedisStateBackend(StateBackend):
+    """Redis-протокол. CAS — атомарный Lua-скрипт на стороне сервера."""
+
+    name = "redis"
+
+    def __init__(self, url: str, client: Any = None) -> None:
+        if client is None:
+            if _redis is None:
+                raise RuntimeError("HF_CORTEX_STATE_BACKEND=redis requires the 'redis' package")
+            client = _redis.Redis.from_url(url)
+        self._client = client
+        self._cas = client.register_script(_REDIS_CAS_SCRIPT)
+
+    @staticmethod
+    def _px(ttl_s: Optional[float]) -> Optional[int]:
+        return max(1, int(ttl_s * 1000)) if ttl_s is not None else None
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(key)
+
+    def set(self, key: str, value: bytes, ttl_s: Optional[float] = None) -> None:
+        self._client.set(key, value, px=self._px(ttl_s))
+
+    def ttl(self, key: str) -> Optional[float]:
+        ms = self._client.pttl(key)
+        if ms is None or ms < 0:
+            return None
+        return ms / 1000.0
+
+    def delete(self, key: str) -> None:
+        self._client.delete(key)
+
+    def cas(self, key: str, expected: Optional[bytes], value: bytes, ttl_s: Optional[float] = None) -> bool:
+        args = [expected or b"", value, self._px(ttl_s) or 0, "1" if expected is None else "0"]
+        return bool(self._cas(keys=[key], args=args))
+
+    def close(self) -> None:
+        try:
+            self._client.close()
+        except Exception:
+            pass
+
+
+class PrefixedStateBackend(StateBackend):
+    """Обёртка, добавляющая префикс к ключам (изоляция сервисов в общем Redis/sqlite)."""
+
+    def __init__(self, inner: StateBackend, prefix: str) -> None:
+        self.inner = inner
+        self.prefix = prefix
+        self.name = inner.name
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.inner.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes, ttl_s: Optional[float] = None) -> None:
+        self.inner.set(self.prefix + key, value, ttl_s)
+
+    def ttl(self, key: str) -> Optional[float]:
+        return self.inner.ttl(self.prefix + key)
+
+    def delete(self, key: str) -> None:
+        self.inner.delete(self.prefix + key)
+
+    def cas(self, key: str, expected: Optional[bytes], value: bytes, ttl_s: Optional[float] = None) -> bool:
+        return self.inner.cas(self.prefix + key, expected, value, ttl_s)
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+def create_state_backend(kind: str, url: Optional[str] = None) -> StateBackend:
+    kind = (kind or "memory").strip().lower()
+    if kind == "memory":
+        try:
+            max_bytes = int(os.getenv("HF_CORTEX_STATE_MEMORY_MAX_BYTES", DEFAULT_MEMORY_MAX_BYTES))
+        except ValueError:
+            max_bytes = DEFAULT_MEMORY_MAX_BYTES
+        return MemoryStateBackend(max_bytes=max_bytes)
+    if kind == "sqlite":
+        try:
+            purge_s = float(os.getenv("HF_CORTEX_STATE_SQLITE_PURGE_S", DEFAULT_SQLITE_PURGE_S))
+        except ValueError:
+            purge_s = DEFAULT_SQLITE_PURGE_S
+        return SqliteStateBackend(url or "hf_cortex_state.sqlite3", purge_interval_s=purge_s)
+    if kind == "redis":
+        return RedisStateBackend(url or "redis://127.0.0.1:6379/0")
+    raise ValueError(f"Unknown HF_CORTEX_STATE_BACKEND: {kind}")
+
+
+_state_backend: Optional[StateBackend] = None
+_state_backend_lock = threading.Lock()
+
+
+def get_state_backend() -> StateBackend:
+    """Процессный синглтон по переменным окружения (см. шапку модуля)."""
+    global _state_backend
+    if _state_backend is None:
+        with _state_backend_lock:
+            if _state_backend is None:
+                inner = create_state_backend(
+                    os.getenv("HF_CORTEX_STATE_BACKEND", "memory"),
+                    os.getenv("HF_CORTEX_STATE_URL") or None,
+                )
+                _state_backend = PrefixedStateBackend(inner, os.getenv("HF_CORTEX_STATE_PREFIX", DEFAULT_PREFIX))
+    return _state_backend
+
+
+def is_shared_state_backend() -> bool:
+    """True, если состояние видно другим воркерам (sqlite/redis)."""
+    return get_state_backend().name != "memory"
+
+
+def reset_state_backend() -> None:
+    global _state_backend
+    with _state_backend_lock:
+        if _state_backend is not None:
+            _state_backend.close()
+        _state_backend = None
+
@@ -0,0 +1,80 @@
+# core/wire.py
+# Формат обмена Node <-> Cortex на эндпоинте lead_sales: JSON (по умолчанию) или MessagePack.
+#
+# MessagePack — опциональный пакет msgpack. Согласование:
+#   - тело запроса с Content-Type: application/msgpack (или application/x-msgpack) разбирается
+#     msgpack'ом; без пакета — 415;
+#   - ответ в MessagePack, если Accept ставит msgpack не ниже application/json (q); без пакета
+#     или без msgpack в Accept — JSON. Ошибки (401/409/422 ...) всегда JSON.
+# Семантика та же, что у JSON: ответ кодируется из model_dump(mode="json") — только
+# str/int/float/bool/None/list/dict, схема CortexRequest/CortexResponse не меняется.
+
+from typing import Any, Optional
+
+from starlette.responses import Response
+
+try:  # опциональная зависимость: бинарный формат обмена
+    import msgpack as _msgpack
+except Exception:  # pragma: no cover - зависит от окружения
+    _msgpack = None
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+_MSGPACK_TYPES = frozenset((MSGPACK_MEDIA_TYPE, "application/x-msgpack"))
+_JSON_TYPES = frozenset(("application/json", "application/*", "*/*"))
+
+
+def msgpack_available() -> bool:
+    return _msgpack is not None
+
+
+def _media_type(value: str) -> str:
+    return value.split(";", 1)[0].strip().lower()
+
+
+def is_msgpack_content(content_type: Optional[str]) -> bool:
+    return bool(content_type) and _media_type(content_type) in _MSGPACK_TYPES  # type: ignore[arg-type]
+
+
+def _quality(item: str) -> float:
+    for param in item.split(";")[1:]:
+        name, _, value = param.partition("=")
+        if name.strip().lower() == "q":
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def prefers_msgpack(accept: Optional[str]) -> bool:
+    """Отвечать ли MessagePack: msgpack есть в Accept с q > 0 и не ниже JSON (и пакет установлен)."""
+    if _msgpack is None or not accept:
+        return False
+    best_msgpack = best_json = 0.0
+    for item in accept.split(","):
+        media = _media_type(item)
+        if media in _MSGPACK_TYPES:
+            best_msgpack = max(best_msgpack, _quality(item))
+        elif media in _JSON_TYPES:
+            best_json = max(best_json, _quality(item))
+    return best_msgpack > 0 and best_msgpack >= best_json
+
+
+def decode_msgpack(body: bytes) -> Any:
+    """bytes -> те же структуры, что дал бы json.loads (ключи map — только строки)."""
+    if _msgpack is None:
+        raise RuntimeError("msgpack is not installed")
+    return _msgpack.unpackb(body, raw=False, strict_map_key=True)
+
+
+def encode_msgpack(data: Any) -> bytes:
+    if _msgpack is None:
+        raise RuntimeError("msgpack is not installed")
+    return _msgpack.packb(data, use_bin_type=True)
+
+
+class MsgpackResponse(Response):
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        return encode_msgpack(content)
@@ -0,0 +1,121 @@
+# flows/lead_sales/abcp_cache.py
+# Кэш разбора пакетов ABCP между ходами диалога.
+#
+# На PRICING -> CONTACT -> ADDRESS Node часто присылает тот же injected_abcp несколько ходов
+# подряд. Результат разбора пакета одного OEM (сводка + канонические офферы) кладём сюда по
+# дайджесту пакета (abcp_summary._pack_key: blake2b-128), чтобы не считать его заново.
+#
+# - LRU ограниченного размера + TTL (цены ABCP устаревают);
+# - значения неизменяемые (кортежи/строки): кэш отдаёт их как есть, а изменяемые копии
+#   (dict сводки, Offer) собирает вызывающий код;
+# - счётчики hits/misses/evictions/expired — атрибуты (тесты, бенчмарки); в ответ хода
+#   попадает debug.abcp_cached_packs.
+#
+# Кэш процессный: объекты хранятся без сериализации, поэтому общий StateBackend тут не используется.
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, NamedTuple, Optional
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL_S = 600.0
+
+
+class _Entry(NamedTuple):
+    value: Any
+    expires_at: float
+
+
+class AbcpPackCache:
+    """LRU с TTL для неизменяемых результатов разбора пакетов ABCP."""
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl_s: float = DEFAULT_TTL_S,
+        clock=time.monotonic,
+    ) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_s = float(ttl_s)
+        self._clock = clock
+        self._items: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at <= self._clock():
+                del self._items[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._items[key] = _Entry(value, self._clock() + self.ttl_s)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+_abcp_cache: Optional[AbcpPackCache] = None
+_abcp_cache_lock = threading.Lock()
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default) or 0)
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def get_abcp_cache() -> Optional[AbcpPackCache]:
+    """Процессный синглтон; размер/TTL из HF_CORTEX_ABCP_CACHE_SIZE / HF_CORTEX_ABCP_CACHE_TTL_S.
+
+    HF_CORTEX_ABCP_CACHE_SIZE=0 выключает кэш (None); нечисловое значение — значение по умолчанию.
+    """
+    global _abcp_cache
+    size = _env_int("HF_CORTEX_ABCP_CACHE_SIZE", DEFAULT_MAX_ENTRIES)
+    if size <= 0:
+        return None
+    if _abcp_cache is None:
+        with _abcp_cache_lock:
+            if _abcp_cache is None:
+                _abcp_cache = AbcpPackCache(
+                    max_entries=size,
+                    ttl_s=_env_float("HF_CORTEX_ABCP_CACHE_TTL_S", DEFAULT_TTL_S),
+                )
+    return _abcp_cache
+
+
+def reset_abcp_cache() -> None:
+    global _abcp_cache
+    with _abcp_cache_lock:
+        _abcp_cache = None
@@ -1,6 +1,23 @@
-from typing import Any, Dict, Optional, List
+import hashlib
+import heapq
+import json
+import marshal
+import os
+from bisect import bisect_left
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 
 from core.models import Offer
+from flows.lead_sales.abcp_cache import AbcpPackCache
+from flows.lead_sales.offers import OfferRow, to_offers
+
+try:  # опциональная зависимость: колоночный путь для крупных ответов ABCP
+    import numpy as _np
+except Exception:  # pragma: no cover - зависит от окружения
+    _np = None
+
+# С какого размера пакета одного OEM считать через numpy (на маленьких дороже накладные расходы).
+# 0 — колоночный путь выключен.
+COLUMNAR_MIN_OFFERS = int(os.getenv("HF_CORTEX_ABCP_COLUMNAR_MIN", "256") or 0)
 
 
 def _get_price(off: Dict[str, Any]) -> Optional[float]:
@@ -26,54 +43,6 @@ def _get_min_days(off: Dict[str, Any]) -> Optional[int]:
     return None
 
 
-def _pick_fastest(offers: list[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
-    """
-    Вариант 1 — самый быстрый:
-      - сортируем по min_days (возрастание)
-      - при равенстве по price (возрастание)
-    """
-    scored = []
-    for off in offers:
-        if not isinstance(off, dict):
-            continue
-        price = _get_price(off)
-        days = _get_min_days(off)
-        if days is None:
-            continue
-        scored.append((days, price if price is not None else float("inf"), off))
-
-    if not scored:
-        return None
-
-    scored.sort(key=lambda x: (x[0], x[1]))
-    _, _, best = scored[0]
-    return _compact_offer(best)
-
-
-def _pick_cheapest(offers: list[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
-    """
-    Вариант 2 — самый дешёвый:
-      - сортируем по price (возрастание)
-      - при равенстве по min_days (возрастание)
-    """
-    scored = []
-    for off in offers:
-        if not isinstance(off, dict):
-            continue
-        price = _get_price(off)
-        if price is None:
-            continue
-        days = _get_min_days(off)
-        scored.append((price, days if days is not None else 10**9, off))
-
-    if not scored:
-        return None
-
-    scored.sort(key=lambda x: (x[0], x[1]))
-    _, _, best = scored[0]
-    return _compact_offer(best)
-
-
 def _compact_offer(off: Dict[str, Any]) -> Dict[str, Any]:
     """
     Компактное представление одного оффера:
@@ -102,134 +71,485 @@ def _compact_offer(off: Dict[str, Any]) -> Dict[str, Any]:
     return result
 
 
-def summarize_abcp(abcp: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+class AbcpIngest(NamedTuple):
+    """Результат разбора injected_abcp за один проход.
+
+    rows — канонические офферы во внутреннем виде (OfferRow); offers — они же как Offer.
+    selected_abcp — injected_abcp, в котором у каждого OEM оставлены только отобранные
+    строки (см. OfferSelection); без отбора это исходный объект.
     """
-    Сводка по ABCP-ответу для каждого OEM.
+
+    summary_by_oem: Dict[str, Dict[str, Any]]
+    rows: List[OfferRow]
+    has_any: bool
+    selected_abcp: Dict[str, Any]
+    cached_packs: int = 0
+
+    @property
+    def offers(self) -> List[Offer]:
+        return to_offers(self.rows)
+
+
+class OfferSelection(NamedTuple):
+    """Какие офферы OEM доходят до канона: top_k самых дешёвых (+ фронт Парето цена/срок).
+
+    top_k <= 0 — отбора нет, берём все офферы с ценой (поведение по умолчанию).
     """
-    summary: Dict[str, Dict[str, Any]] = {}
 
-    for oem, data in (abcp or {}).items():
-        if not isinstance(data, dict):
-            continue
+    top_k: int = 0
+    pareto: bool = True
+
+    @property
+    def enabled(self) -> bool:
+        return self.top_k > 0
+
 
-        offers = data.get("offers") or []
-        if not isinstance(offers, list):
-            offers = []
+NO_SELECTION = OfferSelection()
 
-        prices: list[float] = []
-        days: list[int] = []
 
-        for off in offers:
-            if not isinstance(off, dict):
+def offer_selection_from_env() -> OfferSelection:
+    """HF_CORTEX_OFFERS_TOP_K (0 — без отбора), HF_CORTEX_OFFERS_PARETO (1/0, по умолчанию 1)."""
+    try:
+        top_k = int(os.getenv("HF_CORTEX_OFFERS_TOP_K", "0") or 0)
+    except ValueError:
+        top_k = 0
+    pareto = (os.getenv("HF_CORTEX_OFFERS_PARETO", "1") or "1").strip().lower() not in ("0", "false", "no", "off")
+    return OfferSelection(max(0, top_k), pareto)
+
+
+_NO_DAYS = 10**9
+_INF = float("inf")
+
+# (цена, срок или _NO_DAYS, позиция в ABCP, исходная строка)
+Scored = Tuple[float, int, int, Dict[str, Any]]
+
+
+def _pareto_front(scored: List[Scored]) -> List[Scored]:
+    """Фронт Парето по (цена, срок) за один проход, O(n log h), h — размер фронта.
+
+    Фронт держим отсортированным по цене (сроки при этом строго убывают). Точка отбрасывается,
+    если есть не хуже по обоим параметрам; из равных остаётся первая по порядку ABCP.
+    """
+    prices: List[float] = []
+    front: List[Scored] = []
+    for item in scored:
+        price, days = item[0], item[1]
+        pos = bisect_left(prices, price)
+        if pos and front[pos - 1][1] <= days:
+            continue  # есть дешевле и не дольше
+        if pos < len(front) and prices[pos] == price and front[pos][1] <= days:
+            continue  # та же цена и не дольше — остаётся первый
+        # вытесняем точки не дешевле и не быстрее новой
+        end = pos
+        while end < len(front) and front[end][1] >= days:
+            end += 1
+        prices[pos:end] = [price]
+        front[pos:end] = [item]
+    return front
+
+
+def _select(scored: List[Scored], selection: OfferSelection) -> List[Scored]:
+    """Канонический порядок (цена, срок, позиция в ABCP) с учётом отбора.
+
+    С отбором полной сортировки нет: top-K через heapq.nsmallest (O(n log k)), фронт Парето
+    через _pareto_front, сортируется только их объединение.
+    """
+    # Позиция в ABCP уникальна, поэтому кортежи сравниваются без key и до строки дело не доходит.
+    if not selection.enabled or len(scored) <= selection.top_k:
+        scored.sort()
+        return scored
+    picked = heapq.nsmallest(selection.top_k, scored)
+    if selection.pareto:
+        seen = {item[2] for item in picked}
+        picked.extend(item for item in _pareto_front(scored) if item[2] not in seen)
+        picked.sort()
+    return picked
+
+
+def _pack_summary(
+    n_offers: int,
+    price_range: Tuple[Optional[float], Optional[float]],
+    days_range: Tuple[Optional[int], Optional[int]],
+    fastest: Optional[Dict[str, Any]],
+    scored: List[Scored],
+) -> Dict[str, Any]:
+    return {
+        "offers": n_offers,
+        "min_price": price_range[0],
+        "max_price": price_range[1],
+        "min_days": days_range[0],
+        "max_days": days_range[1],
+        "variant_1": _compact_offer(fastest) if fastest is not None else None,
+        "variant_2": _compact_offer(scored[0][3]) if scored else None,
+    }
+
+
+def _ingest_pack_py(offers: List[Any], selection: OfferSelection) -> Tuple[Dict[str, Any], List[Scored]]:
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    min_days: Optional[int] = None
+    max_days: Optional[int] = None
+
+    fastest: Optional[Dict[str, Any]] = None
+    fastest_key: Optional[Tuple[int, float]] = None
+    scored: List[Scored] = []
+
+    for idx, off in enumerate(offers):
+        if not isinstance(off, dict):
+            continue
+
+        price = _get_price(off)
+        md = off.get("minDays")
+        xd = off.get("maxDays")
+        md_i = int(md) if isinstance(md, (int, float)) else None
+        xd_i = int(xd) if isinstance(xd, (int, float)) else None
+
+        if price is not None:
+            if min_price is None or price < min_price:
+                min_price = price
+            if max_price is None or price > max_price:
+                max_price = price
+
+        for d in (md_i, xd_i):
+            if d is None:
                 continue
+            if min_days is None or d < min_days:
+                min_days = d
+            if max_days is None or d > max_days:
+                max_days = d
+
+        days = md_i if md_i is not None else xd_i
+        if days is not None:
+            key = (days, price if price is not None else _INF)
+            if fastest_key is None or key < fastest_key:
+                fastest_key = key
+                fastest = off
 
-            price_val = _get_price(off)
-            if price_val is not None:
-                prices.append(price_val)
+        if price is not None:
+            scored.append((price, days if days is not None else _NO_DAYS, idx, off))
 
-            md = off.get("minDays")
-            xd = off.get("maxDays")
-            if isinstance(md, (int, float)):
-                days.append(int(md))
-            if isinstance(xd, (int, float)):
-                days.append(int(xd))
+    # Каноничный порядок внутри OEM: сначала дешевле, при равенстве — быстрее, затем порядок ABCP.
+    # Самый дешёвый всегда входит и в top-K, и во фронт — variant_2 от отбора не зависит.
+    scored = _select(scored, selection)
+    return _pack_summary(len(offers), (min_price, max_price), (min_days, max_days), fastest, scored), scored
 
-        min_price = min(prices) if prices else None
-        max_price = max(prices) if prices else None
 
-        min_days = min(days) if days else None
-        max_days = max(days) if days else None
+_NONE_TYPE = type(None)
+_NUM_TYPES = {int, float}
+_INT64_SAFE = float(2**62)
 
-        variant_1 = _pick_fastest(offers) if offers else None
-        variant_2 = _pick_cheapest(offers) if offers else None
 
-        summary[oem] = {
-            "offers": len(offers),
-            "min_price": min_price,
-            "max_price": max_price,
-            "min_days": min_days,
-            "max_days": max_days,
-            "variant_1": variant_1,
-            "variant_2": variant_2,
-        }
+def _np_column(values: List[Any], integer: bool) -> Optional[Tuple[Any, Any]]:
+    """Колонка значений -> (массив, маска "значение есть"); None — не чистые числа (считает Python).
 
-    return summary
+    Для сроков float усекается к нулю, как int() в Python-пути.
+    """
+    np = _np
+    types = set(map(type, values))
+    has_missing = _NONE_TYPE in types
+    types.discard(_NONE_TYPE)
+    if not types <= _NUM_TYPES:
+        return None  # bool/строки/прочее — редкость, точную семантику держит Python-путь
+
+    if has_missing:
+        present = np.array([v is not None for v in values], dtype=bool)
+        values = [0 if v is None else v for v in values]
+    else:
+        present = np.ones(len(values), dtype=bool)
+
+    try:
+        if integer and float not in types:
+            return np.array(values, dtype=np.int64), present
+        arr = np.array(values, dtype=np.float64)
+    except OverflowError:
+        return None
+    if not np.isfinite(arr).all():
+        return None
+    if integer:
+        if arr.size and np.abs(arr).max() >= _INT64_SAFE:
+            return None
+        arr = arr.astype(np.int64)
+    return arr, present
 
 
-def build_offers_from_abcp(abcp: Dict[str, Any]) -> List[Offer]:
+def _ingest_pack_np(
+    offers: List[Any], selection: OfferSelection
+) -> Optional[Tuple[Dict[str, Any], List[Scored]]]:
+    """Колоночный вариант _ingest_pack_py: цены и сроки вынимаются в массивы один раз
+    (без поштучных проверок типов), сводка, варианты и порядок считаются numpy.
+
+    Результат тот же до бита (ключи и tie-break совпадают, np.lexsort стабилен).
+    None — данные, которые колонками не выразить (не числа, NaN/inf, срок вне int64): считает Python.
+    """
+    np = _np
+    rows = [off for off in offers if isinstance(off, dict)]
+    if not rows:
+        return None
+    rows_idx = list(range(len(rows))) if len(rows) == len(offers) else [
+        i for i, off in enumerate(offers) if isinstance(off, dict)
+    ]
+
+    cols = (
+        _np_column([off.get("price") for off in rows], integer=False),
+        _np_column([off.get("minDays") for off in rows], integer=True),
+        _np_column([off.get("maxDays") for off in rows], integer=True),
+    )
+    if cols[0] is None or cols[1] is None or cols[2] is None:
+        return None
+    (P, HP), (MD, HMD), (XD, HXD) = cols
+
+    HD = HMD | HXD
+    D = np.where(HMD, MD, np.where(HXD, XD, _NO_DAYS))
+    AD = np.concatenate((MD[HMD], XD[HXD]))
+
+    price_range: Tuple[Optional[float], Optional[float]] = (None, None)
+    if HP.any():
+        price_range = (float(P[HP].min()), float(P[HP].max()))
+    days_range: Tuple[Optional[int], Optional[int]] = (None, None)
+    if AD.size:
+        days_range = (int(AD.min()), int(AD.max()))
+
+    # variant_1: min по (срок, цена или inf); argmin берёт первое вхождение — как строгое "<".
+    fastest: Optional[Dict[str, Any]] = None
+    cand = np.flatnonzero(HD)
+    if cand.size:
+        cand = cand[D[cand] == D[cand].min()]
+        pf = np.where(HP[cand], P[cand], np.inf)
+        fastest = rows[int(cand[int(np.argmin(pf))])]
+
+    # Канонический порядок: (цена, срок); стабильная сортировка сохраняет порядок ABCP при равенстве.
+    sc = np.flatnonzero(HP)
+    order = sc[np.lexsort((D[sc], P[sc]))]
+    if selection.enabled and order.size > selection.top_k:
+        keep = np.zeros(order.size, dtype=bool)
+        keep[: selection.top_k] = True
+        if selection.pareto:
+            # Фронт Парето: срок строго меньше, чем у всех, кто раньше в каноническом порядке.
+            d_sorted = D[order]
+            prev_min = np.minimum.accumulate(d_sorted)
+            keep[1:] |= d_sorted[1:] < prev_min[:-1]
+        order = order[keep]
+
+    picked = order.tolist()
+    scored: List[Scored] = list(
+        zip(P[order].tolist(), D[order].tolist(), [rows_idx[i] for i in picked], [rows[i] for i in picked])
+    )
+    return _pack_summary(len(offers), price_range, days_range, fastest, scored), scored
+
+
+def _ingest_pack(
+    offers: List[Any], selection: OfferSelection = NO_SELECTION, columnar: Optional[bool] = None
+) -> Tuple[Dict[str, Any], List[Scored]]:
+    """Один проход по офферам одного OEM: сводка + отобранные офферы с ценой в каноническом порядке.
+
+    - variant_1 (самый быстрый): min по (min_days, price), офферы без срока не участвуют;
+    - variant_2 (самый дешёвый): первый в каноническом порядке (price, min_days) —
+      ровно тот же min, поэтому отдельного прохода не нужно.
+    При равных ключах побеждает первый по порядку ABCP (как у стабильной сортировки).
+
+    columnar: None — numpy для пакетов от COLUMNAR_MIN_OFFERS строк (если numpy установлен),
+    True/False — принудительно (True без numpy всё равно считает Python).
+    """
+    if columnar is None:
+        columnar = COLUMNAR_MIN_OFFERS > 0 and len(offers) >= COLUMNAR_MIN_OFFERS
+    if columnar and _np is not None:
+        out = _ingest_pack_np(offers, selection)
+        if out is not None:
+            return out
+    return _ingest_pack_py(offers, selection)
+
+
+def _offer_from_abcp(offer_id: int, oem: str, price: float, days: int, off: Dict[str, Any]) -> OfferRow:
+    # OEM оффера — собственный номер строки (Node: offerOem), а не ключ пакета: в пакете
+    # могут лежать замены/аналоги (и склеенные collapse_equivalent_oems пакеты), а abcpOrder.js
+    # ищет и заказывает позицию по offer.oem.
+    own = off.get("oem")
+    if isinstance(own, str) and own.strip():
+        oem = own.strip()
+    brand = off.get("brand")
+    name = off.get("name")
+    if not isinstance(name, str) or not name.strip():
+        if isinstance(brand, str) and brand.strip():
+            name = f"{brand} {oem}"
+        else:
+            name = oem
+
+    supplier = off.get("supplier")
+    return OfferRow(
+        offer_id,
+        oem,
+        brand if isinstance(brand, str) else None,
+        name,
+        float(price),
+        "RUB",
+        1,
+        days if days != _NO_DAYS else None,
+        str(supplier) if supplier is not None else None,
+        None,
+    )
+
+
+class _Pack(NamedTuple):
+    """Разобранный пакет одного OEM в неизменяемом виде (то, что лежит в AbcpPackCache).
+
+    summary_json — сводка (на каждое чтение — свежий dict),
+    rows — канонические офферы с id 1..m внутри пакета (глобальные id проставляет ingest_abcp),
+    kept — позиции отобранных строк в пакете ABCP (только при отборе).
     """
-    Строит КАНОНИЧЕСКИЙ список Offer из нормализованного ABCP-ответа.
 
-    ВАЖНО:
-      - id тут задаём как детерминированный глобальный счётчик,
-        но окончательную нумерацию (requested first) делаем в flow.py.
-      - порядок детерминированный внутри OEM: сначала дешевле, потом дороже,
-        при равенстве — быстрее.
+    summary_json: str
+    rows: Tuple[OfferRow, ...]
+    kept: Tuple[int, ...]
+
+
+# Поля строки ABCP, от которых зависит разбор пакета (сводка, варианты, OfferRow).
+_PACK_KEY_FIELDS = ("price", "minDays", "maxDays", "brand", "name", "article", "supplier", "isOriginal", "isOem", "oem")
+_ABSENT_ROW = (...,) * len(_PACK_KEY_FIELDS)  # отсутствие поля != None
+_PACK_KEY_CHUNK = 128
+
+
+def _pack_key(oem: str, raw_offers: List[Any], selection: OfferSelection) -> Optional[bytes]:
+    """Ключ пакета для AbcpPackCache: blake2b-128 по значимым полям всех строк.
+
+    Строки кодируются marshal (C, без ссылок на повторные объекты — версия 2, так что байты
+    зависят только от значений) пачками по _PACK_KEY_CHUNK: в памяти не держится копия пакета,
+    а ключ в кэше — 16 байт вместо кортежа размером с payload.
+    None — в значимых полях есть значения, которые marshal не кодирует: такой пакет не кэшируем.
     """
-    result: List[Offer] = []
-    if not isinstance(abcp, dict):
-        return result
+    try:
+        h = hashlib.blake2b(marshal.dumps((oem, tuple(selection)), 2), digest_size=16)
+        for i in range(0, len(raw_offers), _PACK_KEY_CHUNK):
+            h.update(
+                marshal.dumps(
+                    [
+                        tuple(map(off.get, _PACK_KEY_FIELDS, _ABSENT_ROW)) if isinstance(off, dict) else (off,)
+                        for off in raw_offers[i : i + _PACK_KEY_CHUNK]
+                    ],
+                    2,
+                )
+            )
+    except ValueError:
+        return None
+    return h.digest()
+
+
+def _build_pack(
+    oem: str, raw_offers: List[Any], selection: OfferSelection, columnar: Optional[bool]
+) -> Tuple[Dict[str, Any], _Pack]:
+    summary, scored = _ingest_pack(raw_offers, selection, columnar)
+    pack = _Pack(
+        json.dumps(summary, ensure_ascii=False),
+        tuple(_offer_from_abcp(i, oem, price, days, off) for i, (price, days, _, off) in enumerate(scored, 1)),
+        tuple(sorted(item[2] for item in scored)) if selection.enabled else (),
+    )
+    return summary, pack
+
+
+def ingest_abcp(
+    abcp: Dict[str, Any],
+    *,
+    build_offers: bool = True,
+    selection: Optional[OfferSelection] = None,
+    columnar: Optional[bool] = None,
+    cache: Optional[AbcpPackCache] = None,
+) -> AbcpIngest:
+    """
+    Разбор injected_abcp за один проход по офферам каждого OEM:
+      - summary_by_oem (как summarize_abcp) — всегда по всем строкам;
+      - канонические офферы (rows, как build_offers_from_abcp): OEM по алфавиту, внутри OEM —
+        дешевле/быстрее, id — глобальный счётчик (окончательную нумерацию делает flow.py);
+      - has_any — есть ли хоть один OEM с непустым списком offers.
+
+    selection=None — из окружения (offer_selection_from_env); columnar — см. _ingest_pack.
+    cache — AbcpPackCache: пакеты, уже разобранные на прошлых ходах, берутся из него
+    (только вместе с build_offers); cached_packs — сколько пакетов пришло из кэша.
+    """
+    if selection is None:
+        selection = offer_selection_from_env()
+    if not build_offers:
+        cache = None
+
+    summary: Dict[str, Dict[str, Any]] = {}
+    packs: Dict[str, _Pack] = {}
+    scored_by_oem: Dict[str, List[Scored]] = {}
+    has_any = False
+    cached_packs = 0
 
-    global_id = 1
+    if not isinstance(abcp, dict):
+        return AbcpIngest(summary, [], False, abcp)
 
-    # Базовый детерминированный порядок OEM (алфавитный).
-    # В flow.py мы переупорядочим requested-first и переназначим id ещё раз.
-    for oem in sorted(abcp.keys()):
-        data = abcp[oem]
+    for oem, data in abcp.items():
         if not isinstance(data, dict):
             continue
 
         raw_offers = data.get("offers") or []
         if not isinstance(raw_offers, list):
+            raw_offers = []
+        if raw_offers:
+            has_any = True
+
+        key = _pack_key(oem, raw_offers, selection) if cache is not None else None
+        if key is None:
+            summary[oem], scored = _ingest_pack(raw_offers, selection, columnar)
+            if scored:
+                scored_by_oem[oem] = scored
             continue
 
-        scored: list[tuple[float, int, Dict[str, Any]]] = []
-
-        for off in raw_offers:
-            if not isinstance(off, dict):
-                continue
+        pack = cache.get(key)
+        if pack is None:
+            summary[oem], pack = _build_pack(oem, raw_offers, selection, columnar)
+            cache.put(key, pack)
+        else:
+            summary[oem] = json.loads(pack.summary_json)
+            cached_packs += 1
+        if pack.rows:
+            packs[oem] = pack
+
+    rows: List[OfferRow] = []
+    if build_offers:
+        for oem in sorted(packs.keys() | scored_by_oem.keys()):
+            offset = len(rows)
+            pack = packs.get(oem)
+            if pack is None:
+                for i, (price, days, _, off) in enumerate(scored_by_oem[oem], offset + 1):
+                    rows.append(_offer_from_abcp(i, oem, price, days, off))
+            elif offset == 0:
+                rows.extend(pack.rows)
+            else:
+                rows.extend(OfferRow._make((offset + row[0],) + row[1:]) for row in pack.rows)
+
+    selected_abcp = abcp
+    if selection.enabled:
+        # В LLM уходят только отобранные строки, в исходном порядке ABCP.
+        kept_by_oem = {oem: pack.kept for oem, pack in packs.items()}
+        for oem, scored in scored_by_oem.items():
+            kept_by_oem[oem] = tuple(sorted(item[2] for item in scored))
+        selected_abcp = {}
+        for oem, data in abcp.items():
+            if oem in kept_by_oem:
+                raw_offers = data["offers"]
+                selected_abcp[oem] = {**data, "offers": [raw_offers[i] for i in kept_by_oem[oem]]}
+            else:
+                selected_abcp[oem] = data
+
+    return AbcpIngest(summary, rows, has_any, selected_abcp, cached_packs)
 
-            price = _get_price(off)
-            if price is None:
-                continue
 
-            days = _get_min_days(off)
-            days_for_sort = days if days is not None else 10**9
+def summarize_abcp(abcp: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Сводка по ABCP-ответу для каждого OEM (обёртка над ingest_abcp).
+    """
+    return ingest_abcp(abcp, build_offers=False).summary_by_oem
 
-            # Ключ сортировки: цена, затем срок
-            scored.append((price, days_for_sort, off))
 
-        if not scored:
-            continue
-
-        scored.sort(key=lambda x: (x[0], x[1]))
-
-        for price, _days_for_sort, off in scored:
-            brand = off.get("brand")
-            name = off.get("name")
-            if not isinstance(name, str) or not name.strip():
-                if isinstance(brand, str) and brand.strip():
-                    name = f"{brand} {oem}"
-                else:
-                    name = oem
-
-            delivery_days = _get_min_days(off)
-            supplier = off.get("supplier")
-            source = str(supplier) if supplier is not None else None
-
-            offer = Offer(
-                id=global_id,
-                oem=oem,
-                brand=brand if isinstance(brand, str) else None,
-                name=name,
-                price=float(price),
-                currency="RUB",
-                quantity=1,
-                delivery_days=delivery_days,
-                source=source,
-                comment=None,
-            )
-            result.append(offer)
-            global_id += 1
+def build_offers_from_abcp(abcp: Dict[str, Any]) -> List[Offer]:
+    """
+    Строит КАНОНИЧЕСКИЙ список Offer из нормализованного ABCP-ответа (обёртка над ingest_abcp).
 
-    return result
+    ВАЖНО:
+      - id тут задаём как детерминированный глобальный счётчик,
+        но окончательную нумерацию (requested first) делаем в flow.py.
+      - порядок детерминированный внутри OEM: сначала дешевле, потом дороже,
+        при равенстве — быстрее.
+    """
+    return ingest_abcp(abcp).offers
@@ -0,0 +1,126 @@
+# flows/lead_sales/facts.py
+# Версионированный блок "фактов" по диалогу: то, что Cortex уже разобрал на прошлых ходах.
+#
+# Cortex кладёт блок в CortexResult.meta["facts"], Node сохраняет его в session.state.cortex_facts
+# и присылает обратно в sessionSnapshot. На следующих ходах hardening берёт из блока уже
+# разобранное ФИО (без split_full_name_strict по client_name).
+#
+# Источник правды — живые поля сессии: Node не чистит cortex_facts при сбросе сессии, новом лиде
+# и правке менеджером. Поэтому факт действует, только пока совпадает с полем сессии
+# (reconcile_facts): иначе он устарел и отбрасывается.
+#
+# Формат (v=1):
+#   {"v": 1, "fio": [last, first, middle, raw] | null, "phone": str | null,
+#    "address": str | null, "chosen_offer_id": int | [int] | null, "quantity": int | null}
+
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+
+FACTS_VERSION = 1
+FACTS_META_KEY = "facts"
+SESSION_FACTS_KEY = "cortex_facts"
+
+FioTuple = Tuple[str, str, str, str]
+Choice = Union[int, List[int]]
+
+
+class SessionFacts(NamedTuple):
+    fio: Optional[FioTuple] = None
+    phone: Optional[str] = None
+    address: Optional[str] = None
+    chosen_offer_id: Optional[Choice] = None
+    quantity: Optional[int] = None
+
+
+def _clean_str(v: Any) -> Optional[str]:
+    if isinstance(v, str) and v.strip():
+        return v.strip()
+    return None
+
+
+def _clean_fio(v: Any) -> Optional[FioTuple]:
+    if not isinstance(v, (list, tuple)) or len(v) != 4:
+        return None
+    parts = [_clean_str(x) for x in v]
+    if not all(parts):
+        return None
+    return (parts[0], parts[1], parts[2], parts[3])  # type: ignore[return-value]
+
+
+def _clean_choice(v: Any) -> Optional[Choice]:
+    if isinstance(v, bool):
+        return None
+    if isinstance(v, int):
+        return v if v > 0 else None
+    if isinstance(v, list):
+        out = sorted({x for x in v if isinstance(x, int) and not isinstance(x, bool) and x > 0})
+        return out or None
+    return None
+
+
+def _clean_qty(v: Any) -> Optional[int]:
+    if isinstance(v, int) and not isinstance(v, bool) and v > 0:
+        return v
+    return None
+
+
+def parse_facts(raw: Any) -> Optional[SessionFacts]:
+    """Разбирает блок фактов. Чужая/старая версия или мусор -> None (fallback на полный разбор)."""
+    if not isinstance(raw, dict) or raw.get("v") != FACTS_VERSION:
+        return None
+    return SessionFacts(
+        fio=_clean_fio(raw.get("fio")),
+        phone=_clean_str(raw.get("phone")),
+        address=_clean_str(raw.get("address")),
+        chosen_offer_id=_clean_choice(raw.get("chosen_offer_id")),
+        quantity=_clean_qty(raw.get("quantity")),
+    )
+
+
+def read_session_facts(session_snapshot: Dict[str, Any]) -> Optional[SessionFacts]:
+    """Ищет блок в state.cortex_facts (так сохраняет Node), затем на верхнем уровне."""
+    if not session_snapshot:
+        return None
+    state = session_snapshot.get("state")
+    if isinstance(state, dict):
+        facts = parse_facts(state.get(SESSION_FACTS_KEY))
+        if facts is not None:
+            return facts
+    return parse_facts(session_snapshot.get(SESSION_FACTS_KEY))
+
+
+def reconcile_facts(
+    facts: Optional[SessionFacts],
+    *,
+    client_name: Optional[str],
+    phone: Optional[str],
+    address: Optional[str],
+    chosen_offer_id: Any,
+) -> Optional[SessionFacts]:
+    """Оставляет только факты, совпадающие с живыми полями сессии (поля сессии уже strip).
+
+    Пустое поле сессии — тоже расхождение (сессию сбросили или менеджер стёр значение).
+    quantity относится к выбранному офферу и живёт, пока совпадает chosen_offer_id.
+    """
+    if facts is None:
+        return None
+    chosen = _clean_choice(chosen_offer_id)
+    chosen_ok = facts.chosen_offer_id is not None and facts.chosen_offer_id == chosen
+    out = SessionFacts(
+        fio=facts.fio if facts.fio and facts.fio[3] == client_name else None,
+        phone=facts.phone if facts.phone == phone else None,
+        address=facts.address if facts.address == address else None,
+        chosen_offer_id=facts.chosen_offer_id if chosen_ok else None,
+        quantity=facts.quantity if chosen_ok else None,
+    )
+    return out if any(v is not None for v in out) else None
+
+
+def facts_to_dict(facts: SessionFacts) -> Dict[str, Any]:
+    return {
+        "v": FACTS_VERSION,
+        "fio": list(facts.fio) if facts.fio else None,
+        "phone": facts.phone,
+        "address": facts.address,
+        "chosen_offer_id": facts.chosen_offer_id,
+        "quantity": facts.quantity,
+    }
@@ -6,26 +6,37 @@
 #
 # REFAC: файл разрезан на модули (parsers/offers/session_utils/hardening/utils).
 # В этом файле осталась только оркестрация и сборка контекста.
+#
+# Ход разбит на фазы (для потокового эндпоинта, см. app.py):
+#   prepare_lead_sales  — всё до LLM: ABCP, канон, короткий путь PRICING, запрос к LLM;
+#   preview_lead_sales  — решение, которое Python принимает без LLM (канон + policy + hardening);
+#   complete_lead_sales — вызов LLM и та же постобработка поверх его черновика.
+# run_lead_sales_flow = prepare + (короткий путь | complete).
 
-from typing import Any, Dict, Optional, List
+from typing import Any, Dict, NamedTuple, Optional, List
 
-from core.models import CortexResult, Offer
+from core.models import CortexResult, construct_trusted
 from core.llm_client import call_llm_with_cortex_request
 
-from flows.lead_sales.abcp_summary import summarize_abcp, build_offers_from_abcp
+from flows.lead_sales.abcp_cache import get_abcp_cache
+from flows.lead_sales.abcp_summary import ingest_abcp
 from flows.lead_sales.hardening import apply_strict_funnel
+from flows.lead_sales.oem_graph import collapse_equivalent_oems, get_oem_graph, oem_collapse_enabled
 from flows.lead_sales.policy_engine import apply_policy_engine
 from flows.lead_sales.offers import (
-    build_pricing_reply,
-    group_offers_by_oem,
-    order_oems,
-    reassign_ids_in_order,
+    EMPTY_CANONICAL,
+    CanonicalOffers,
+    OfferRow,
+    build_canonical_offers,
+    canonical_from_ordered,
+    render_pricing_reply,
     valid_offer_ids,
     sanitize_chosen_offer_id,
 )
 from flows.lead_sales.parsers.common import get_msg_text
 from flows.lead_sales.parsers.oem import extract_oem_from_text, looks_like_vin
-from flows.lead_sales.session_utils import get_stage
+from flows.lead_sales.parsers.oem_index import get_oem_index, persist_oem_index
+from flows.lead_sales.session_utils import SessionView
 from flows.lead_sales.utils import to_dict
 
 
@@ -54,8 +65,8 @@ def _to_delivery_days(row: Dict[str, Any]) -> Optional[int]:
     return None
 
 
-def _build_offers_from_payload(payload_offers: Any) -> List[Offer]:
-    out: List[Offer] = []
+def _build_offers_from_payload(payload_offers: Any) -> List[OfferRow]:
+    out: List[OfferRow] = []
     if not isinstance(payload_offers, list):
         return out
 
@@ -83,7 +94,7 @@ def _build_offers_from_payload(payload_offers: Any) -> List[Offer]:
         comment = row.get("comment")
 
         out.append(
-            Offer(
+            OfferRow(
                 id=offer_id,
                 oem=str(oem).strip().upper() if isinstance(oem, str) and oem.strip() else None,
                 brand=str(brand).strip() if isinstance(brand, str) and brand.strip() else None,
@@ -100,28 +111,60 @@ def _build_offers_from_payload(payload_offers: Any) -> List[Offer]:
     return out
 
 
-def _extract_ordered_oems_from_offers(offers: List[Offer]) -> List[str]:
-    seen = set()
-    out: List[str] = []
-    for off in offers:
-        oem = (off.oem or "").strip().upper()
-        if not oem or oem in seen:
-            continue
-        seen.add(oem)
-        out.append(oem)
-    return out
+# Поля результата, которые Node применяет к CRM (стадия, офферы, выбор, поля лида/контакта).
+DECISION_FIELDS = (
+    "action",
+    "stage",
+    "intent",
+    "requires_clarification",
+    "need_operator",
+    "oems",
+    "offers",
+    "chosen_offer_id",
+    "update_lead_fields",
+    "contact_update",
+)
 
 
-def run_lead_sales_flow(
+class LeadSalesTurn(NamedTuple):
+    """Ход lead_sales, подготовленный до LLM (prepare_lead_sales).
+
+    short_result — готовый ответ короткого пути (LLM не нужен), иначе cortex_request — запрос к LLM.
+    """
+
+    msg_dict: Dict[str, Any]
+    msg_text: str
+    session_snapshot: Dict[str, Any]
+    view: SessionView
+    stage: Optional[str]
+    requested_oem: Optional[str]
+    canonical: CanonicalOffers
+    canonical_source: Optional[str]
+    injected_block: Dict[str, Any]
+    abcp_cached_packs: Optional[int]
+    oems_collapsed: Dict[str, str]
+    short_result: Optional[CortexResult]
+    cortex_request: Optional[Dict[str, Any]]
+
+
+def decision_of(result: CortexResult) -> Dict[str, Any]:
+    """DECISION_FIELDS результата в JSON-виде (как в ответе эндпоинта)."""
+    return result.model_dump(mode="json", include=set(DECISION_FIELDS))
+
+
+def prepare_lead_sales(
     msg: Any,
     session: Optional[Any] = None,
     injected_abcp: Optional[Dict[str, Any]] = None,
     payload_offers: Optional[List[Dict[str, Any]]] = None,
-) -> CortexResult:
+    channel: Optional[str] = None,
+) -> LeadSalesTurn:
     msg_dict = to_dict(msg)
     session_snapshot = to_dict(session)
 
-    stage = get_stage(session_snapshot)
+    # Сессию разбираем один раз; дальше flow/policy/hardening читают SessionView.
+    view = SessionView(session_snapshot)
+    stage = view.stage
 
     injected_block: Dict[str, Any] = {
         "has_abcp": False,
@@ -129,34 +172,60 @@ def run_lead_sales_flow(
         "offers_by_oem": {},
     }
 
-    if isinstance(injected_abcp, dict) and injected_abcp:
-        offers_by_oem = injected_abcp
-        summary_by_oem = summarize_abcp(offers_by_oem)
+    # Внутри flow офферы — OfferRow; в Offer превращаются только при сборке CortexResult.
+    canonical_offers: List[OfferRow] = []
+    canonical_source: Optional[str] = None
+    abcp_cached_packs: Optional[int] = None
 
-        has_any = False
+    has_injected_abcp = isinstance(injected_abcp, dict) and bool(injected_abcp)
+    oems_collapsed: Dict[str, str] = {}
+
+    if has_injected_abcp:
+        # Дообучаем индекс форматов OEM и граф замен на реальных ответах ABCP.
+        try:
+            if get_oem_index().observe_abcp(injected_abcp):
+                persist_oem_index()  # с HF_CORTEX_OEM_INDEX_FILE, не чаще HF_CORTEX_OEM_INDEX_SAVE_S
+        except Exception:
+            pass
         try:
-            for _oem, pack in offers_by_oem.items():
-                if (
-                    isinstance(pack, dict)
-                    and isinstance(pack.get("offers"), list)
-                    and len(pack.get("offers")) > 0
-                ):
-                    has_any = True
-                    break
+            get_oem_graph().observe_abcp(injected_abcp)
         except Exception:
-            has_any = True
+            pass
+
+    # msg_text (канонический)
+    msg_text = get_msg_text(msg_dict)
+    if msg_text:
+        msg_dict["text"] = msg_text  # для промпта/LLM всегда кладём text
+
+    # requested_oem
+    requested_oem: Optional[str] = None
+    if stage == "NEW":
+        requested_oem = extract_oem_from_text(msg_text)
+
+    # fallback (и основной источник вне NEW): OEM, который Node сохранил в session.state.oems.
+    # На всякий: если в state почему-то VIN — игнор.
+    if not requested_oem and view.state_oem and not looks_like_vin(view.state_oem):
+        requested_oem = view.state_oem
+
+    if has_injected_abcp:
+        offers_by_oem = injected_abcp
+        # Старый и новый номер одной детали — один пакет (requested OEM остаётся ключом).
+        if oem_collapse_enabled():
+            offers_by_oem, oems_collapsed = collapse_equivalent_oems(offers_by_oem, get_oem_graph(), requested_oem)
+
+        # Один проход: сводка, has_any и канонические офферы (с отбором top-K/Парето, если включён).
+        # Тот же injected_abcp на следующих ходах диалога берётся из кэша разбора.
+        ingest = ingest_abcp(offers_by_oem, cache=get_abcp_cache())
+        abcp_cached_packs = ingest.cached_packs
 
         injected_block = {
-            "has_abcp": bool(has_any),
-            "summary_by_oem": summary_by_oem,
-            "offers_by_oem": offers_by_oem,
+            "has_abcp": ingest.has_any,
+            "summary_by_oem": ingest.summary_by_oem,
+            "offers_by_oem": ingest.selected_abcp,
         }
 
-    canonical_offers: List[Offer] = []
-    canonical_source: Optional[str] = None
-    if injected_block["has_abcp"]:
-        canonical_offers = build_offers_from_abcp(injected_block["offers_by_oem"])
-        if canonical_offers:
+        if ingest.has_any and ingest.rows:
+            canonical_offers = ingest.rows
             canonical_source = "abcp"
 
     # Fallback: если ABCP не пришёл, но Node прислал offers — используем их как канон.
@@ -166,115 +235,93 @@ def run_lead_sales_flow(
             canonical_offers = canonical_from_payload
             canonical_source = "payload"
 
-    # msg_text (канонический)
-    msg_text = get_msg_text(msg_dict)
-    if msg_text:
-        msg_dict["text"] = msg_text  # для промпта/LLM всегда кладём text
-
-    # requested_oem
-    requested_oem: Optional[str] = None
-    if stage == "NEW":
-        requested_oem = extract_oem_from_text(msg_text)
-
-        # fallback: если Node уже сохранил OEM в session.state.oems, а текст почему-то пустой
-        if not requested_oem:
-            state = session_snapshot.get("state")
-            if isinstance(state, dict):
-                oems = state.get("oems")
-                if isinstance(oems, list) and oems:
-                    first = oems[0]
-                    if isinstance(first, str) and first.strip():
-                        cand = first.strip().upper()
-                        if not looks_like_vin(cand):
-                            requested_oem = cand
-    else:
-        state = session_snapshot.get("state")
-        if isinstance(state, dict):
-            oems = state.get("oems")
-            if isinstance(oems, list) and oems:
-                first = oems[0]
-                if isinstance(first, str) and first.strip():
-                    # на всякий: если в state почему-то VIN — игнор
-                    cand = first.strip().upper()
-                    if not looks_like_vin(cand):
-                        requested_oem = cand
+    # Канон строим один раз (порядок OEM requested-first + итоговые id) и используем
+    # и для короткого пути, и для промпта, и после LLM.
+    canonical = EMPTY_CANONICAL
+    if canonical_source == "abcp":
+        canonical = build_canonical_offers(requested_oem, canonical_offers)
+    elif canonical_source == "payload":
+        canonical = canonical_from_ordered(requested_oem, canonical_offers)
 
     # Если ABCP injected и мы на NEW — не вызываем LLM, сразу отдаём PRICING
+    short_result: Optional[CortexResult] = None
     if canonical_source == "abcp" and injected_block["has_abcp"] and canonical_offers and stage == "NEW":
-        reply, ordered_oems, ordered_offers = build_pricing_reply(requested_oem, canonical_offers)
-        return CortexResult(
-            action="reply",
-            stage="PRICING",
-            reply=reply,
-            intent="OEM_QUERY",
-            confidence=1.0,
-            ambiguity_reason=None,
-            requires_clarification=False,
-            oems=ordered_oems,
-            offers=ordered_offers,
-            chosen_offer_id=None,
-            update_lead_fields={},
-            product_rows=[],
-            product_picks=[],
-            client_name=None,
-            need_operator=False,
-            contact_update=None,
-            meta={},
-            debug={
-                "short_path": "abcp_injected_new",
-                "requested_oem": requested_oem,
-                "offers_source": canonical_source,
+        # Всё ниже посчитано самим flow (канон уже нормализован) — собираем без валидации pydantic.
+        short_result = construct_trusted(
+            CortexResult,
+            {
+                "action": "reply",
+                "stage": "PRICING",
+                "reply": render_pricing_reply(requested_oem, canonical, channel),
+                "intent": "OEM_QUERY",
+                "confidence": 1.0,
+                "ambiguity_reason": None,
+                "requires_clarification": False,
+                "oems": list(canonical.oems),
+                "offers": canonical.to_offers(),
+                "chosen_offer_id": None,
+                "update_lead_fields": {},
+                "product_rows": [],
+                "product_picks": [],
+                "client_name": None,
+                "need_operator": False,
+                "contact_update": None,
+                "meta": {},
+                "debug": {
+                    "short_path": "abcp_injected_new",
+                    "requested_oem": requested_oem,
+                    "offers_source": canonical_source,
+                    "abcp_cached_packs": abcp_cached_packs,
+                    **({"oems_collapsed": oems_collapsed} if oems_collapsed else {}),
+                },
             },
         )
 
-    base_context: Dict[str, Any] = {
-        "injected_abcp": injected_block,
-    }
+    cortex_request: Optional[Dict[str, Any]] = None
+    if short_result is None:
+        base_context: Dict[str, Any] = {
+            "injected_abcp": injected_block,
+        }
 
-    cortex_request: Dict[str, Any] = {
-        "app": "hf-rozatti-py",
-        "flow": "lead_sales",
-        "payload": {
-            "msg": msg_dict,
-            "sessionSnapshot": session_snapshot,
-            "baseContext": base_context,
-        },
-    }
+        cortex_request = {
+            "app": "hf-rozatti-py",
+            "flow": "lead_sales",
+            "payload": {
+                "msg": msg_dict,
+                "sessionSnapshot": session_snapshot,
+                "baseContext": base_context,
+            },
+        }
+
+        # Если есть офферы — даём LLM уже готовые варианты (канон)
+        cortex_request["payload"]["offers"] = canonical.to_dicts()
+
+    return LeadSalesTurn(
+        msg_dict=msg_dict,
+        msg_text=msg_text,
+        session_snapshot=session_snapshot,
+        view=view,
+        stage=stage,
+        requested_oem=requested_oem,
+        canonical=canonical,
+        canonical_source=canonical_source,
+        injected_block=injected_block,
+        abcp_cached_packs=abcp_cached_packs,
+        oems_collapsed=oems_collapsed,
+        short_result=short_result,
+        cortex_request=cortex_request,
+    )
 
-    ordered_offers: List[Offer] = []
-    ordered_oems: List[str] = []
-
-    # Если есть офферы — даём LLM уже готовые варианты (канон)
-    if canonical_offers:
-        if canonical_source == "payload":
-            ordered_offers = canonical_offers
-            ordered_oems = _extract_ordered_oems_from_offers(ordered_offers)
-            req = (requested_oem or "").strip().upper()
-            if req and req in ordered_oems:
-                ordered_oems = [req] + [x for x in ordered_oems if x != req]
-        else:
-            grouped = group_offers_by_oem(canonical_offers)
-            ordered_oems = order_oems(requested_oem, list(grouped.keys()))
-            ordered_offers = reassign_ids_in_order(grouped, ordered_oems)
-        cortex_request["payload"]["offers"] = [o.model_dump() for o in ordered_offers]
-    else:
-        cortex_request["payload"]["offers"] = []
-
-    result: CortexResult = call_llm_with_cortex_request(cortex_request)
-
-    # Истина по офферам — всегда Python canonical (ordered_offers)
-    if canonical_offers:
-        if canonical_source != "payload":
-            # на всякий случай пересоберём, чтобы не зависеть от возможных изменений объектов
-            grouped = group_offers_by_oem(canonical_offers)
-            ordered_oems = order_oems(requested_oem, list(grouped.keys()))
-            ordered_offers = reassign_ids_in_order(grouped, ordered_oems)
-        else:
-            if not ordered_oems:
-                ordered_oems = _extract_ordered_oems_from_offers(ordered_offers)
-
-        result.offers = ordered_offers
-        result.oems = ordered_oems
+
+def _finish_lead_sales(turn: LeadSalesTurn, result: CortexResult) -> CortexResult:
+    """Постобработка черновика (LLM или пустого): канон офферов, policy, hardening, debug."""
+    canonical = turn.canonical
+    msg_text, stage, view = turn.msg_text, turn.stage, turn.view
+
+    # Истина по офферам — всегда Python canonical (LLM не может их "сломать")
+    if canonical.offers:
+        result.offers = canonical.to_offers()
+        result.oems = list(canonical.oems)
 
         # Валидируем chosen_offer_id
         valid_ids = valid_offer_ids(result.offers)
@@ -294,9 +341,9 @@ def run_lead_sales_flow(
     result = apply_policy_engine(
         result,
         msg_text=msg_text,
-        msg=msg_dict,
+        msg=turn.msg_dict,
         stage_in=stage,
-        session_snapshot=session_snapshot,
+        session_snapshot=turn.session_snapshot,
     )
 
     # ------------------------------------------------
@@ -306,18 +353,52 @@ def run_lead_sales_flow(
         result,
         stage_in=stage,
         msg_text=msg_text,
-        session_snapshot=session_snapshot,
+        session_snapshot=turn.session_snapshot,
+        session_view=view,
     )
 
     # Добавим немного тех. debug (не для клиента)
     try:
         if not isinstance(result.debug, dict):
             result.debug = {}
-        result.debug.setdefault("requested_oem", requested_oem)
-        result.debug.setdefault("has_abcp", bool(injected_block.get("has_abcp")))
-        result.debug.setdefault("offers_source", canonical_source)
+        result.debug.setdefault("requested_oem", turn.requested_oem)
+        result.debug.setdefault("has_abcp", bool(turn.injected_block.get("has_abcp")))
+        result.debug.setdefault("offers_source", turn.canonical_source)
+        if turn.abcp_cached_packs is not None:
+            result.debug.setdefault("abcp_cached_packs", turn.abcp_cached_packs)
+        if turn.oems_collapsed:
+            result.debug.setdefault("oems_collapsed", turn.oems_collapsed)
         result.debug.setdefault("stage_in", stage)
     except Exception:
         pass
 
     return result
+
+
+def preview_lead_sales(turn: LeadSalesTurn) -> CortexResult:
+    """Решение без LLM: короткий путь как есть, иначе постобработка пустого черновика.
+
+    Стадия остаётся входной, выбор/количество/ФИО/телефон/адрес — то, что Python сам нашёл
+    в сообщении и сессии. LLM может его уточнить: сравнивайте DECISION_FIELDS с итогом.
+    """
+    if turn.short_result is not None:
+        return turn.short_result
+    draft = construct_trusted(CortexResult, {"stage": turn.stage, "reply": None})
+    return _finish_lead_sales(turn, draft)
+
+
+def complete_lead_sales(turn: LeadSalesTurn) -> CortexResult:
+    """Итог хода: короткий путь или LLM + постобработка."""
+    if turn.short_result is not None:
+        return turn.short_result
+    return _finish_lead_sales(turn, call_llm_with_cortex_request(turn.cortex_request))
+
+
+def run_lead_sales_flow(
+    msg: Any,
+    session: Optional[Any] = None,
+    injected_abcp: Optional[Dict[str, Any]] = None,
+    payload_offers: Optional[List[Dict[str, Any]]] = None,
+    channel: Optional[str] = None,
+) -> CortexResult:
+    return complete_lead_sales(prepare_lead_sales(msg, session, injected_abcp, payload_offers, channel))
@@ -1,11 +1,12 @@
 from typing import Any, Dict, Optional
 
-from core.models import CortexResult, ContactUpdate
+from core.models import CortexResult, ContactUpdate, construct_trusted
 
 from flows.lead_sales.parsers.fio import extract_full_fio_strict, split_full_name_strict
 from flows.lead_sales.parsers.phone import extract_phone_from_text
 from flows.lead_sales.parsers.address import extract_address_or_pickup_raw
-from flows.lead_sales.session_utils import get_session_str, get_session_int, get_session_choice
+from flows.lead_sales.session_utils import SessionView, as_session_view
+from flows.lead_sales.facts import FACTS_META_KEY, SessionFacts, facts_to_dict
 from flows.lead_sales.parsers.choice import extract_offer_choice_from_text
 from flows.lead_sales.parsers.quantity import extract_quantity_from_text
 
@@ -16,11 +17,13 @@ def apply_strict_funnel(
     stage_in: str,
     msg_text: str,
     session_snapshot: Dict[str, Any],
+    session_view: Optional[SessionView] = None,
 ) -> CortexResult:
     """HARDENING: строгая воронка CONTACT -> ADDRESS -> FINAL.
 
     ВАЖНО: поведение должно оставаться прежним. Эта функция —
     вынесенная из flow.py логика без изменения семантики.
+    session_view — уже разобранный session_snapshot (flow строит его один раз).
     """
     try:
         current_stage = str(result.stage or "").upper()
@@ -38,6 +41,11 @@ def apply_strict_funnel(
         ):
             return result
 
+        # Факты прошлых ходов (meta.facts -> session.state.cortex_facts), уже сверенные с живыми
+        # полями сессии (SessionView): устаревшие отброшены. Нет блока — разбираем сессию.
+        view = session_view if session_view is not None else as_session_view(session_snapshot)
+        facts = view.facts
+
         # -------------------------
         # sticky / deterministic chosen_offer_id
         # -------------------------
@@ -50,7 +58,7 @@ def apply_strict_funnel(
             result.chosen_offer_id = det_choice
         else:
             # 1) sticky chosen_offer_id из сессии (если модель "потеряла" выбор)
-            sess_chosen = get_session_choice(session_snapshot, "chosen_offer_id")
+            sess_chosen = view.chosen_offer_id
             if sess_chosen and not result.chosen_offer_id:
                 result.chosen_offer_id = sess_chosen
 
@@ -60,36 +68,34 @@ def apply_strict_funnel(
         if qty and result.chosen_offer_id and isinstance(result.offers, list) and len(result.offers) > 0:
             ids = result.chosen_offer_id
             ids_list = ids if isinstance(ids, list) else [ids]
+            # Канонические Offer общие с flow — меняем количество на копиях.
+            updated = []
             for off in result.offers:
                 try:
                     if int(off.id) in [int(x) for x in ids_list]:
-                        off.quantity = int(qty)
+                        off = off.model_copy(update={"quantity": int(qty)})
                 except Exception:
-                    continue
+                    pass
+                updated.append(off)
+            result.offers = updated
             # для логов/диагностики
             try:
                 result.meta["requested_qty"] = int(qty)
             except Exception:
                 pass
 
-        # Truth sources из сессии
-        sess_client_name = get_session_str(session_snapshot, "client_name")
-        sess_phone = get_session_str(session_snapshot, "phone")
-        sess_address = (
-            get_session_str(session_snapshot, "address")
-            or get_session_str(session_snapshot, "client_address")
-            or get_session_str(session_snapshot, "CLIENT_ADDRESS")
-            or get_session_str(session_snapshot, "DELIVERY_ADDRESS")
-            or get_session_str(session_snapshot, "delivery_address")
-        )
+        # Truth sources из сессии — живые поля; факты только избавляют от повторного разбора ФИО
+        fio_sess = facts.fio if facts else None
+        if fio_sess is None:
+            fio_sess = split_full_name_strict(view.client_name) if view.client_name else None
+        sess_phone = view.phone
+        sess_address = view.address
 
         # Truth из текущего сообщения
         fio_msg = extract_full_fio_strict(msg_text)
         phone_msg = extract_phone_from_text(msg_text)
         addr_msg = extract_address_or_pickup_raw(msg_text)
 
-        fio_sess = split_full_name_strict(sess_client_name) if sess_client_name else None
-
         has_full_fio = bool(fio_msg or fio_sess)
         has_phone = bool(phone_msg or (sess_phone and sess_phone.strip()))
         has_address = bool(addr_msg or (sess_address and sess_address.strip()))
@@ -111,13 +117,8 @@ def apply_strict_funnel(
             result.update_lead_fields.pop("CLIENT_ADDRESS", None)
             result.update_lead_fields.pop("DELIVERY_ADDRESS", None)
 
-        # Сбор contact_update как "истины"
+        # Сбор contact_update как "истины": cu — только подтверждённые поля поверх того, что дала LLM
         cu: Dict[str, Any] = {}
-        if result.contact_update is not None:
-            try:
-                cu = result.contact_update.model_dump()
-            except Exception:
-                cu = {}
 
         if effective_fio:
             last_name, first_name, second_name, full_raw = effective_fio
@@ -139,7 +140,24 @@ def apply_strict_funnel(
             # Новый ключ для Node: DELIVERY_ADDRESS (legacy CLIENT_ADDRESS не используем).
             result.update_lead_fields["DELIVERY_ADDRESS"] = effective_address
 
-        result.contact_update = ContactUpdate(**cu) if cu else None
+        # contact_update от LLM уже провалидирован в normalize_llm_result, а cu — строки наших
+        # парсеров/сессии: ни model_dump -> ContactUpdate(**cu), ни повторной валидации не нужно.
+        if cu:
+            if result.contact_update is not None:
+                result.contact_update = result.contact_update.model_copy(update=cu)
+            else:
+                result.contact_update = construct_trusted(ContactUpdate, cu)
+
+        # Факты для следующих ходов (Node сохраняет их в session.state.cortex_facts)
+        result.meta[FACTS_META_KEY] = facts_to_dict(
+            SessionFacts(
+                fio=tuple(effective_fio) if effective_fio else None,
+                phone=effective_phone,
+                address=effective_address,
+                chosen_offer_id=result.chosen_offer_id or None,
+                quantity=int(qty) if qty else (facts.quantity if facts else None),
+            )
+        )
 
         # Строгое управление стадиями: после выбора варианта
         chosen = result.chosen_offer_id
@@ -0,0 +1,230 @@
+# flows/lead_sales/oem_graph.py
+# Граф замен OEM (supersession), собранный из уже виденных ответов ABCP.
+#
+# Зачем: клиент часто присылает сразу старый и новый номер одной детали (или ABCP отдаёт
+# цепочку замен), и в payload для LLM уходили дубли одних и тех же строк под разными номерами.
+# Эквивалентные номера склеиваем в один пакет ДО разбора офферов, дубли строк отбрасываем.
+# Каждая строка при этом сохраняет собственный OEM (abcp_summary._offer_from_abcp): его видит
+# клиент в ответе и по нему abcpOrder.js заказывает позицию.
+#
+# Откуда рёбра — только строки, ЯВНО помеченные оригиналом (isOriginal=true или
+# isAnalog=false, и ни одного флага «аналог»). Node отдаёт isAnalog/isOriginal = null, когда
+# ABCP флаг не прислал: такие строки могут быть аналогами, в граф они не попадают.
+#   - Node раскладывает ответ ABCP по реальному номеру строки и помечает, по какому номеру
+#     её нашёл: строка пакета injected_abcp[X] с requestedOem=Y — X заменяет Y;
+#   - строка пакета injected_abcp[Y] с собственным oem=X (Node без раскладки) — то же самое.
+#
+# Устройство:
+#   - прямые рёбра (старый, новый) — множество пар: is_supersession — O(1);
+#   - классы эквивалентности — union-find со сжатием путей: equivalent/representative —
+#     амортизированно O(1), цепочки A -> B -> C схлопываются в один класс.
+# Граф процессный и дообучается на каждом injected_abcp (как индекс форматов OEM).
+
+import os
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from flows.lead_sales.parsers.oem_index import _normalize_oem
+
+DEFAULT_MAX_NODES = 100_000
+
+# Поля строки, по которым одинаковые строки двух схлопнутых пакетов считаются дублем.
+_ROW_KEY_FIELDS = ("price", "minDays", "maxDays", "brand", "name", "article", "supplier", "isOriginal", "isOem", "oem")
+
+
+def _is_marked_original(row: Any) -> bool:
+    """Строка явно помечена оригиналом; неизвестные флаги (None) — не оригинал."""
+    if not isinstance(row, dict) or row.get("isAnalog") is True or row.get("isOriginal") is False:
+        return False
+    return row.get("isOriginal") is True or row.get("isAnalog") is False
+
+
+class OemReplacementGraph:
+    """Потокобезопасный инкрементальный граф замен OEM."""
+
+    def __init__(self, max_nodes: int = DEFAULT_MAX_NODES) -> None:
+        self.max_nodes = max(1, int(max_nodes))
+        self._lock = threading.Lock()
+        self._parent: Dict[str, str] = {}
+        self._edges: Set[Tuple[str, str]] = set()  # (старый, новый)
+
+    def __len__(self) -> int:
+        return len(self._parent)
+
+    def _find(self, oem: str) -> str:
+        parent = self._parent
+        root = parent.get(oem)
+        if root is None:
+            return oem
+        while parent[root] != root:
+            parent[root] = parent[parent[root]]  # сжатие путей (halving)
+            root = parent[root]
+        parent[oem] = root
+        return root
+
+    def add_replacement(self, old: Any, new: Any) -> bool:
+        """new заменяет old. False — номер не похож на OEM, ребро уже есть или граф заполнен."""
+        a, b = _normalize_oem(old), _normalize_oem(new)
+        if a is None or b is None or a == b or (a, b) in self._edges:
+            return False
+        with self._lock:
+            fresh = (a not in self._parent) + (b not in self._parent)
+            if len(self._parent) + fresh > self.max_nodes:
+                return False
+            for oem in (a, b):
+                self._parent.setdefault(oem, oem)
+            self._edges.add((a, b))
+            ra, rb = self._find(a), self._find(b)
+            if ra != rb:
+                self._parent[ra] = rb
+        return True
+
+    def observe_abcp(self, abcp: Any) -> int:
+        """Дообучаемся на injected_abcp ({oem: {"offers": [...]}}); возвращает число новых рёбер."""
+        if not isinstance(abcp, dict):
+            return 0
+        added = 0
+        for oem, pack in abcp.items():
+            rows = pack.get("offers") if isinstance(pack, dict) else None
+            if not isinstance(rows, list):
+                continue
+            key = _normalize_oem(oem)
+            if key is None:
+                continue
+            seen: Set[Tuple[str, str]] = set()
+            for row in rows:
+                if not _is_marked_original(row):
+                    continue
+                for link in (("oem", row.get("oem")), ("req", row.get("requestedOem"))):
+                    if not isinstance(link[1], str) or link in seen:
+                        continue
+                    seen.add(link)
+                    old_oem, new_oem = (key, link[1]) if link[0] == "oem" else (link[1], key)
+                    if self.add_replacement(old_oem, new_oem):
+                        added += 1
+        return added
+
+    def is_supersession(self, new: Any, old: Any) -> bool:
+        """Известно ли из ABCP, что new — прямая замена old (O(1))."""
+        a, b = _normalize_oem(old), _normalize_oem(new)
+        return a is not None and b is not None and (a, b) in self._edges
+
+    def representative(self, oem: Any) -> Optional[str]:
+        """Корень класса эквивалентности (для неизвестного номера — сам номер)."""
+        key = _normalize_oem(oem)
+        if key is None:
+            return None
+        if key not in self._parent:
+            return key
+        with self._lock:
+            return self._find(key)
+
+    def equivalent(self, a: Any, b: Any) -> bool:
+        """Номера одной детали (одна цепочка замен)."""
+        ra = self.representative(a)
+        return ra is not None and ra == self.representative(b)
+
+
+def _row_key(row: Any) -> Any:
+    if not isinstance(row, dict):
+        return None
+    try:
+        key = tuple(row.get(f) for f in _ROW_KEY_FIELDS)
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def collapse_equivalent_oems(
+    abcp: Any,
+    graph: OemReplacementGraph,
+    prefer: Optional[str] = None,
+) -> Tuple[Any, Dict[str, str]]:
+    """Склеивает пакеты injected_abcp эквивалентных OEM в один.
+
+    Ключ склеенного пакета — prefer (запрошенный OEM), если он в классе, иначе первый
+    пакет класса в порядке ABCP. Строки идут пакет за пакетом, точные дубли отбрасываются;
+    строке чужого пакета без собственного oem проставляется номер её пакета, чтобы оффер
+    не получил номер ключа склеенного пакета.
+    Возвращает (abcp, {склеенный OEM: ключ пакета}); без эквивалентных пакетов — исходный
+    объект как есть (кэш разбора пакетов и отбор строк работают с ним без копий).
+    """
+    if not isinstance(abcp, dict) or len(abcp) < 2 or not len(graph):
+        return abcp, {}
+
+    classes: Dict[str, List[str]] = {}
+    for oem in abcp:
+        rep = graph.representative(oem)
+        classes.setdefault(rep if rep is not None else oem, []).append(oem)
+    if len(classes) == len(abcp):
+        return abcp, {}
+
+    prefer_key = _normalize_oem(prefer)
+    target: Dict[str, str] = {}
+    aliases: Dict[str, str] = {}
+    for members in classes.values():
+        if len(members) < 2:
+            continue
+        head = members[0]
+        for oem in members:
+            if prefer_key is not None and _normalize_oem(oem) == prefer_key:
+                head = oem
+                break
+        for oem in members:
+            target[oem] = head
+            if oem != head:
+                aliases[oem] = head
+
+    out: Dict[str, Any] = {}
+    seen_rows: Dict[str, Set[Any]] = {}
+    for oem, pack in abcp.items():
+        head = target.get(oem)
+        if head is None:
+            out[oem] = pack
+            continue
+        if head not in out:
+            base = abcp[head] if isinstance(abcp[head], dict) else {}
+            out[head] = {**base, "offers": []}
+            seen_rows[head] = set()
+        rows = pack.get("offers") if isinstance(pack, dict) else None
+        if not isinstance(rows, list):
+            continue
+        merged, seen = out[head]["offers"], seen_rows[head]
+        for row in rows:
+            if oem != head and isinstance(row, dict) and not isinstance(row.get("oem"), str):
+                row = {**row, "oem": oem}
+            key = _row_key(row)
+            if key is not None:
+                if key in seen:
+                    continue
+                seen.add(key)
+            merged.append(row)
+    return out, aliases
+
+
+_graph: Optional[OemReplacementGraph] = None
+_graph_lock = threading.Lock()
+
+
+def oem_collapse_enabled() -> bool:
+    """HF_CORTEX_OEM_COLLAPSE — по умолчанию выключено."""
+    return (os.getenv("HF_CORTEX_OEM_COLLAPSE") or "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def get_oem_graph() -> OemReplacementGraph:
+    """Процессный синглтон; предел узлов — HF_CORTEX_OEM_GRAPH_MAX_NODES."""
+    global _graph
+    if _graph is None:
+        with _graph_lock:
+            if _graph is None:
+                _graph = OemReplacementGraph(
+                    max_nodes=int(os.getenv("HF_CORTEX_OEM_GRAPH_MAX_NODES", DEFAULT_MAX_NODES)),
+                )
+    return _graph
+
+
+def reset_oem_graph() -> None:
+    global _graph
+    with _graph_lock:
+        _graph = None
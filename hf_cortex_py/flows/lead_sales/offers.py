@@ -1,6 +1,60 @@
-from typing import List, Dict, Optional, Tuple, Set, Any
+from functools import lru_cache
+from string import Formatter
+from typing import List, Dict, NamedTuple, Optional, Sequence, Tuple, Set, Any, Union, Callable
 
-from core.models import Offer
+from core.models import Offer, construct_trusted
+
+
+class OfferRow(NamedTuple):
+    """Внутренняя запись оффера: те же поля, что у core.models.Offer, но кортеж.
+
+    Внутри flow (разбор ABCP, канон, промпт) офферы живут в таком виде — без валидации
+    pydantic на каждую строку и без model_copy при перенумерации; в Offer превращаются
+    один раз, когда кладутся в CortexResult (to_offer / to_offers). Поля уже нормализованы
+    при разборе (ABCP / payload.offers), поэтому Offer собирается без повторной валидации.
+    """
+
+    id: int
+    oem: Optional[str]
+    brand: Optional[str]
+    name: Optional[str]
+    price: float
+    currency: str = "RUB"
+    quantity: int = 1
+    delivery_days: Optional[int] = None
+    source: Optional[str] = None
+    comment: Optional[str] = None
+
+    def to_offer(self) -> Offer:
+        return construct_trusted(Offer, self._asdict())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Как Offer.model_dump() (для payload.offers в промпте)."""
+        return self._asdict()
+
+
+AnyOffer = Union[Offer, OfferRow]
+
+
+def as_offer_row(off: AnyOffer) -> OfferRow:
+    if isinstance(off, OfferRow):
+        return off
+    return OfferRow(
+        off.id,
+        off.oem,
+        off.brand,
+        off.name,
+        off.price,
+        off.currency,
+        off.quantity,
+        off.delivery_days,
+        off.source,
+        off.comment,
+    )
+
+
+def to_offers(offers: Sequence[AnyOffer]) -> List[Offer]:
+    return [off.to_offer() if isinstance(off, OfferRow) else off for off in offers]
 
 
 def format_price_rub(price: float) -> str:
@@ -11,8 +65,14 @@ def format_price_rub(price: float) -> str:
         return str(price)
 
 
-def group_offers_by_oem(offers: List[Offer]) -> Dict[str, List[Offer]]:
-    grouped: Dict[str, List[Offer]] = {}
+@lru_cache(maxsize=4096)
+def _price_text(price: float) -> str:
+    # цены повторяются от хода к ходу и между поставщиками — форматируем каждую один раз
+    return format_price_rub(price)
+
+
+def group_offers_by_oem(offers: Sequence[AnyOffer]) -> Dict[str, List[AnyOffer]]:
+    grouped: Dict[str, List[AnyOffer]] = {}
     for off in offers:
         key = (off.oem or "").strip() or "UNKNOWN_OEM"
         grouped.setdefault(key, []).append(off)
@@ -33,61 +93,238 @@ def order_oems(requested_oem: Optional[str], available_oems: List[str]) -> List[
     return rest
 
 
-def reassign_ids_in_order(grouped: Dict[str, List[Offer]], ordered_oems: List[str]) -> List[Offer]:
+def _with_id(off: AnyOffer, gid: int) -> AnyOffer:
+    if off.id == gid:
+        return off
+    if isinstance(off, OfferRow):
+        return off._replace(id=gid)
+    return off.model_copy(update={"id": gid})
+
+
+def reassign_ids_in_order(grouped: Dict[str, List[AnyOffer]], ordered_oems: List[str]) -> List[AnyOffer]:
     """
     Перенумеровывает варианты глобально: 1..N в порядке:
       requested OEM офферы, затем replacements офферы.
+    Исходные офферы не меняются — возвращаются копии с новыми id (того же типа, что на входе).
     """
-    new_list: List[Offer] = []
+    new_list: List[AnyOffer] = []
     gid = 1
     for oem in ordered_oems:
         for off in grouped.get(oem, []):
-            off.id = gid
+            new_list.append(_with_id(off, gid))
             gid += 1
-            new_list.append(off)
     return new_list
 
 
-def build_pricing_reply(
-    requested_oem: Optional[str],
-    canonical_offers: List[Offer],
-) -> Tuple[str, List[str], List[Offer]]:
-    grouped = group_offers_by_oem(canonical_offers)
-    available_oems = list(grouped.keys())
+class CanonicalOffers(NamedTuple):
+    """Канонические варианты хода: порядок OEM (requested first) и офферы с итоговыми id 1..N.
 
-    ordered_oems = order_oems(requested_oem, available_oems)
-    ordered_offers = reassign_ids_in_order(grouped, ordered_oems)
+    Строится один раз до LLM и переиспользуется после неё; всё неизменяемое (кортежи OfferRow) —
+    чтобы ни LLM-ветка, ни hardening не могли поменять канон задним числом.
+    """
 
-    lines: List[str] = []
+    oems: Tuple[str, ...]
+    offers: Tuple[OfferRow, ...]
 
-    for oem in ordered_oems:
-        offers = grouped.get(oem) or []
-        if not offers:
-            continue
+    def grouped(self) -> Dict[str, List[OfferRow]]:
+        out: Dict[str, List[OfferRow]] = {}
+        for off in self.offers:
+            out.setdefault((off.oem or "").strip() or "UNKNOWN_OEM", []).append(off)
+        return out
 
-        if requested_oem and oem == requested_oem:
-            lines.append(f"Добрый день! По номеру {oem} есть варианты:")
-        else:
-            lines.append(f"Есть оригинальная замена {oem}:")
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return [off.to_dict() for off in self.offers]
+
+    def to_offers(self) -> List[Offer]:
+        """Новые Offer на каждый вызов — граница с CortexResult."""
+        return [off.to_offer() for off in self.offers]
+
+
+EMPTY_CANONICAL = CanonicalOffers((), ())
+
+
+def build_canonical_offers(requested_oem: Optional[str], offers: Sequence[AnyOffer]) -> CanonicalOffers:
+    """Группировка по OEM + requested first + перенумерация (офферы ABCP)."""
+    grouped = group_offers_by_oem([as_offer_row(off) for off in offers])
+    ordered_oems = order_oems(requested_oem, list(grouped.keys()))
+    rows = reassign_ids_in_order(grouped, ordered_oems)
+    return CanonicalOffers(tuple(ordered_oems), tuple(rows))  # type: ignore[arg-type]
+
+
+def canonical_from_ordered(requested_oem: Optional[str], offers: Sequence[AnyOffer]) -> CanonicalOffers:
+    """Офферы уже в каноническом порядке с id (прислал Node): только requested OEM вперёд в списке OEM."""
+    seen: Set[str] = set()
+    oems: List[str] = []
+    for off in offers:
+        oem = (off.oem or "").strip().upper()
+        if oem and oem not in seen:
+            seen.add(oem)
+            oems.append(oem)
+    req = (requested_oem or "").strip().upper()
+    if req and req in seen:
+        oems = [req] + [x for x in oems if x != req]
+    return CanonicalOffers(tuple(oems), tuple(as_offer_row(off) for off in offers))
 
+
+class PricingTemplate(NamedTuple):
+    """Шаблон ответа PRICING для канала: строки str.format.
+
+    requested / replacement — заголовок группы ({oem}): запрошенный номер / замена;
+    line — вариант ({id}, {brand}, {oem}, {price}, {delivery});
+    days / no_days — срок ({days}) / срок неизвестен; footer — последняя строка.
+    """
+
+    requested: str
+    replacement: str
+    line: str
+    days: str
+    no_days: str
+    footer: str
+
+
+DEFAULT_PRICING_CHANNEL = "default"
+
+# Шаблоны собраны один раз при импорте; выбор канала на запросе — один lookup в dict.
+PRICING_TEMPLATES: Dict[str, PricingTemplate] = {
+    DEFAULT_PRICING_CHANNEL: PricingTemplate(
+        requested="Добрый день! По номеру {oem} есть варианты:",
+        replacement="Есть оригинальная замена {oem}:",
+        line="Вариант {id} — {brand} {oem} за {price} ₽, {delivery}.",
+        days="срок до {days} раб. дней",
+        no_days="срок уточним",
+        footer="Выберите, пожалуйста, подходящий вариант (можно несколько).",
+    ),
+    # Telegram: короткие нумерованные строки, выбор — номером в ответ.
+    "telegram": PricingTemplate(
+        requested="Добрый день! По номеру {oem} есть варианты:",
+        replacement="Оригинальная замена {oem}:",
+        line="{id}. {brand} {oem} — {price} ₽, {delivery}",
+        days="до {days} раб. дн.",
+        no_days="срок уточним",
+        footer="Напишите номер подходящего варианта (можно несколько).",
+    ),
+    # Avito: без спецсимволов-разделителей, вежливая форма как в объявлениях.
+    "avito": PricingTemplate(
+        requested="Здравствуйте! По номеру {oem} есть варианты:",
+        replacement="Есть оригинальная замена {oem}:",
+        line="Вариант {id}: {brand} {oem}, {price} руб., {delivery}.",
+        days="срок до {days} раб. дней",
+        no_days="срок уточним",
+        footer="Напишите, пожалуйста, номер подходящего варианта (можно несколько).",
+    ),
+    # Drom: цена в «руб.», как в карточках на сайте.
+    "drom": PricingTemplate(
+        requested="Здравствуйте! По номеру {oem} есть варианты:",
+        replacement="Оригинальная замена {oem}:",
+        line="Вариант {id} — {brand} {oem}, {price} руб., {delivery}.",
+        days="срок до {days} раб. дней",
+        no_days="срок уточним",
+        footer="Выберите, пожалуйста, подходящий вариант (можно несколько).",
+    ),
+}
+
+
+def pricing_template(channel: Optional[str] = None) -> PricingTemplate:
+    """Шаблон канала; неизвестный/пустой канал — шаблон по умолчанию."""
+    tpl = PRICING_TEMPLATES.get((channel or "").strip().lower())
+    return tpl if tpl is not None else PRICING_TEMPLATES[DEFAULT_PRICING_CHANNEL]
+
+
+_LINE_FIELDS = ("id", "brand", "oem", "price", "delivery")
+
+
+def _positional(template: str, fields: Tuple[str, ...]) -> str:
+    """"{oem} за {price}" -> "{2} за {3}": позиционный str.format в разы быстрее именованного."""
+    out: List[str] = []
+    for literal, name, spec, conv in Formatter().parse(template):
+        out.append(literal.replace("{", "{{").replace("}", "}}"))
+        if name is not None:
+            out.append("{%d%s%s}" % (fields.index(name), "!" + conv if conv else "", ":" + spec if spec else ""))
+    return "".join(out)
+
+
+class _CompiledTemplate(NamedTuple):
+    requested: Callable[..., str]
+    replacement: Callable[..., str]
+    line: Callable[..., str]
+    days: Callable[..., str]
+    no_days: str
+    footer: str
+
+
+@lru_cache(maxsize=64)
+def _compile(tpl: PricingTemplate) -> _CompiledTemplate:
+    return _CompiledTemplate(
+        requested=_positional(tpl.requested, ("oem",)).format,
+        replacement=_positional(tpl.replacement, ("oem",)).format,
+        line=_positional(tpl.line, _LINE_FIELDS).format,
+        days=_positional(tpl.days, ("days",)).format,
+        no_days=tpl.no_days,
+        footer=tpl.footer,
+    )
+
+
+def _oem_groups(canonical: CanonicalOffers) -> List[Tuple[str, Sequence[OfferRow]]]:
+    """(oem, офферы) в порядке canonical.oems.
+
+    Канон из build_canonical_offers уже лежит группами в этом порядке — режем срезами без
+    перегруппировки; иначе (офферы Node вперемешку) — через grouped().
+    """
+    offers = canonical.offers
+    n = len(offers)
+    out: List[Tuple[str, Sequence[OfferRow]]] = []
+    i = 0
+    for oem in canonical.oems:
+        j = i
+        while j < n and (offers[j].oem or "").strip() == oem:
+            j += 1
+        out.append((oem, offers[i:j]))
+        i = j
+    if i == n:
+        return out
+    grouped = canonical.grouped()
+    return [(oem, grouped.get(oem) or []) for oem in canonical.oems]
+
+
+def render_pricing_reply(
+    requested_oem: Optional[str],
+    canonical: CanonicalOffers,
+    channel: Optional[str] = None,
+) -> str:
+    """Ответ PRICING по канону: один проход по офферам, один join."""
+    tpl = _compile(pricing_template(channel))
+    line = tpl.line
+    days = tpl.days
+    no_days = tpl.no_days
+    parts: List[str] = []
+
+    for oem, offers in _oem_groups(canonical):
+        if not offers:
+            continue
+        header = tpl.requested if requested_oem and oem == requested_oem else tpl.replacement
+        parts.append(header(oem))
         for off in offers:
-            brand = off.brand or "OEM"
-            price = format_price_rub(off.price)
-            if off.delivery_days and off.delivery_days > 0:
-                delivery = f"срок до {off.delivery_days} раб. дней"
-            else:
-                delivery = "срок уточним"
-            lines.append(f"Вариант {off.id} — {brand} {oem} за {price} ₽, {delivery}.")
+            d = off.delivery_days
+            parts.append(
+                line(off.id, off.brand or "OEM", off.oem or oem, _price_text(off.price), days(d) if d and d > 0 else no_days)
+            )
+        parts.append("")
 
-        lines.append("")
+    parts.append(tpl.footer)
+    return "\n".join(parts).strip()
 
-    lines.append("Выберите, пожалуйста, подходящий вариант (можно несколько).")
-    reply = "\n".join([l for l in lines if l is not None]).strip()
 
-    return reply, ordered_oems, ordered_offers
+def build_pricing_reply(
+    requested_oem: Optional[str],
+    canonical_offers: Sequence[AnyOffer],
+    channel: Optional[str] = None,
+) -> Tuple[str, List[str], List[Offer]]:
+    canonical = build_canonical_offers(requested_oem, canonical_offers)
+    reply = render_pricing_reply(requested_oem, canonical, channel)
+    return reply, list(canonical.oems), canonical.to_offers()
 
 
-def valid_offer_ids(offers: List[Offer]) -> Set[int]:
+def valid_offer_ids(offers: Sequence[AnyOffer]) -> Set[int]:
     ids: Set[int] = set()
     for o in offers:
         try:
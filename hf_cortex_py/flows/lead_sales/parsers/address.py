@@ -2,6 +2,7 @@ import re
 from typing import Optional
 
 from flows.lead_sales.parsers.common import normalize_text
+from flows.lead_sales.parsers.gazetteer import address_hints
 from flows.lead_sales.parsers.phone import extract_phone_from_text
 
 ADDRESS_WORDS_RE = re.compile(
@@ -19,13 +20,19 @@ def looks_like_address_text(text: str) -> bool:
     if "самовывоз" in t:
         return True
 
+    # минимальный признак адреса: есть цифры (без них дальше разбирать нечего)
+    if not re.search(r"\d", t):
+        return False
+
     # P0: не принимаем "ФИО + телефон" за адрес.
     # Частый кейс: клиент пишет "Иванов Иван Иванович +7...".
     # В таком сообщении есть цифры, много слов, но нет адресных маркеров.
     phone = extract_phone_from_text(text)
-    has_addr_words = bool(ADDRESS_WORDS_RE.search(t))
+    hints = address_hints(t)
+    has_addr_words = bool(ADDRESS_WORDS_RE.search(t)) or hints.has_street_type
+    # "Казань Баумана 15": город из газеттира + номер дома после названия улицы
+    has_city_street = hints.has_city and hints.has_street_number
     has_commas = "," in t
-    has_digits = bool(re.search(r"\d", t))
 
     # P0.1: не принимаем "товарные" запросы за адрес даже при наличии цифр.
     if NON_ADDRESS_INTENT_RE.search(t) and not has_addr_words:
@@ -35,12 +42,9 @@ def looks_like_address_text(text: str) -> bool:
     if "?" in t and not has_addr_words:
         return False
 
-    if phone and not has_addr_words and not has_commas:
-        return False
-    # минимальные признаки адреса: есть цифры и адресные слова
-    if not has_digits:
+    if phone and not has_addr_words and not has_commas and not has_city_street:
         return False
-    if has_addr_words:
+    if has_addr_words or has_city_street:
         return True
     # fallback без явных маркеров: допускаем только "город, улица, 10"
     # (должны быть запятые, чтобы не ловить фразы вида "нужна запчасть 12345")
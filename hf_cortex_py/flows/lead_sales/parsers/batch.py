@@ -0,0 +1,132 @@
+# flows/lead_sales/parsers/batch.py
+# Пакетные версии парсеров для оффлайн-обработки датасетов (dialog_turns.jsonl и т.п.).
+#
+# Что экономим по сравнению с вызовом парсера на каждый текст:
+#   - дубли: в диалоговых датасетах много одинаковых реплик ("1", "Самовывоз", "да"),
+#     каждый уникальный текст разбирается один раз;
+#   - дешёвый префильтр на C-уровне (str.translate): тексты, в которых физически
+#     не может быть телефона/OEM, отсекаются без запуска регэкспов.
+#
+# GIL: модуль re держит GIL всё время матчинга, поэтому потоки тут не помогают.
+# Для параллелизма передайте ProcessPoolExecutor — тексты режутся на чанки
+# и разбираются в воркерах.
+
+from concurrent.futures import Executor
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, TypeVar
+
+from flows.lead_sales.parsers.oem import extract_oem_from_text
+from flows.lead_sales.parsers.phone import extract_phone_from_text
+from flows.lead_sales.policy_engine import classify_policy_text
+
+T = TypeVar("T")
+
+DEFAULT_CHUNK_SIZE = 2000
+
+_DROP_DIGITS = str.maketrans("", "", "0123456789")
+# Телефон: минимум 10 цифр (10 без кода страны, 11 с 7/8).
+_PHONE_MIN_DIGITS = 10
+
+
+def _digit_count(text: str) -> int:
+    return len(text) - len(text.translate(_DROP_DIGITS))
+
+
+def _oem_one(text: Optional[str]) -> Optional[str]:
+    if not isinstance(text, str) or not _digit_count(text):
+        return None
+    return extract_oem_from_text(text)
+
+
+def _phone_one(text: Optional[str]) -> Optional[str]:
+    if not isinstance(text, str) or _digit_count(text) < _PHONE_MIN_DIGITS:
+        return None
+    return extract_phone_from_text(text)
+
+
+def _policy_one(text: Optional[str]) -> Optional[str]:
+    if not isinstance(text, str):
+        return None
+    return classify_policy_text(text)
+
+
+def _map_unique(func: Callable[[Optional[str]], T], texts: Sequence[Optional[str]]) -> List[T]:
+    memo: Dict[Optional[str], T] = {}
+    out: List[T] = []
+    append = out.append
+    for text in texts:
+        try:
+            append(memo[text])
+        except KeyError:
+            val = func(text)
+            memo[text] = val
+            append(val)
+        except TypeError:
+            # нехешируемый мусор во входе
+            append(func(text))
+    return out
+
+
+def _oem_chunk(texts: Sequence[Optional[str]]) -> List[Optional[str]]:
+    return _map_unique(_oem_one, texts)
+
+
+def _phone_chunk(texts: Sequence[Optional[str]]) -> List[Optional[str]]:
+    return _map_unique(_phone_one, texts)
+
+
+def _policy_chunk(texts: Sequence[Optional[str]]) -> List[Optional[str]]:
+    return _map_unique(_policy_one, texts)
+
+
+def _chunks(items: Sequence[T], size: int) -> Iterable[Sequence[T]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _run_batch(
+    chunk_func: Callable[[Sequence[Optional[str]]], List[T]],
+    texts: Iterable[Optional[str]],
+    executor: Optional[Executor],
+    chunk_size: int,
+) -> List[T]:
+    items = texts if isinstance(texts, (list, tuple)) else list(texts)
+    if executor is None or len(items) <= chunk_size:
+        return chunk_func(items)
+
+    out: List[T] = []
+    for part in executor.map(chunk_func, _chunks(items, max(1, int(chunk_size)))):
+        out.extend(part)
+    return out
+
+
+def extract_oem_batch(
+    texts: Iterable[Optional[str]],
+    *,
+    executor: Optional[Executor] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> List[Optional[str]]:
+    """extract_oem_from_text для последовательности текстов (порядок сохраняется)."""
+    return _run_batch(_oem_chunk, texts, executor, chunk_size)
+
+
+def extract_phone_batch(
+    texts: Iterable[Optional[str]],
+    *,
+    executor: Optional[Executor] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> List[Optional[str]]:
+    """extract_phone_from_text для последовательности текстов (порядок сохраняется)."""
+    return _run_batch(_phone_chunk, texts, executor, chunk_size)
+
+
+def classify_policy_batch(
+    texts: Iterable[Optional[str]],
+    *,
+    executor: Optional[Executor] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> List[Optional[str]]:
+    """
+    Детерминированный intent policy engine для каждого текста
+    (None — правило не сработало, решение осталось бы за LLM).
+    """
+    return _run_batch(_policy_chunk, texts, executor, chunk_size)
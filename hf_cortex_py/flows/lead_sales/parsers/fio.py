@@ -1,19 +1,13 @@
 import re
 from typing import Optional, Tuple
 
+from core.fio import match_fio_words
 from flows.lead_sales.parsers.common import normalize_text
 
 
-_STOPWORDS_FIO = {
-    "город", "г", "ул", "улица", "проспект", "пр", "пр-т", "дом", "д", "кв", "квартира",
-    "корп", "корпус", "стр", "строение", "офис", "самовывоз", "индекс", "республика",
-    "область", "край", "район", "р-н", "шоссе", "пер", "переулок", "проезд",
-}
-
-_PATRONYMIC_RE = re.compile(
-    r"(ович|евич|ич|овна|евна|ична|инична|вна|на)$",
-    re.IGNORECASE,
-)
+_CYR_WORD_RE = re.compile(r"[А-ЯЁа-яё][А-ЯЁа-яё\-]{1,}")
+# Любое отчество оканчивается на "ич"/"на"; без такого слова в тексте ФИО нет.
+_PATRONYMIC_TAIL_RE = re.compile(r"(?:ич|на)(?![А-ЯЁа-яё])", re.IGNORECASE)
 
 
 def extract_full_fio_strict(text: str) -> Optional[Tuple[str, str, str, str]]:
@@ -25,30 +19,31 @@ def extract_full_fio_strict(text: str) -> Optional[Tuple[str, str, str, str]]:
     if not t:
         return None
 
-    # Пытаемся найти три подряд идущих слова на кириллице
-    fio_re = re.compile(r"([А-ЯЁа-яё][А-ЯЁа-яё\-]{1,})\s+([А-ЯЁа-яё][А-ЯЁа-яё\-]{1,})\s+([А-ЯЁа-яё][А-ЯЁа-яё\-]{1,})")
-    for m in fio_re.finditer(t):
-        w1, w2, w3 = m.group(1), m.group(2), m.group(3)
-        lw1, lw2, lw3 = w1.lower(), w2.lower(), w3.lower()
+    # Скользящее окно по трём подряд идущим (через пробел) словам на кириллице.
+    # После normalize_text между словами ровно один пробел.
+    if not _PATRONYMIC_TAIL_RE.search(t):
+        return None
 
-        # отсекаем адресные/служебные слова
-        if lw1 in _STOPWORDS_FIO or lw2 in _STOPWORDS_FIO or lw3 in _STOPWORDS_FIO:
-            continue
+    words = list(_CYR_WORD_RE.finditer(t))
+    n = len(words)
+    if n < 3:
+        return None
 
-        # строгая проверка отчества
-        if not _PATRONYMIC_RE.search(w3):
+    # Отчество (любой из порядков) оканчивается на "ич"/"на": окна без такого слова
+    # на 2-й или 3-й позиции не проверяем вовсе.
+    tails = [m.group(0)[-2:].lower() in ("ич", "на") for m in words]
+    for i in range(n - 2):
+        if not (tails[i + 2] or tails[i + 1]):
+            continue
+        m1, m2, m3 = words[i], words[i + 1], words[i + 2]
+        if t[m1.end():m2.start()] != " " or t[m2.end():m3.start()] != " ":
             continue
 
-        # финальная сборка
-        def norm_word(w: str) -> str:
-            w = w.strip("-")
-            if not w:
-                return w
-            return w[0].upper() + w[1:].lower()
+        parsed = match_fio_words(m1.group(0), m2.group(0), m3.group(0))
+        if parsed is None:
+            continue
 
-        last_name = norm_word(w1)
-        first_name = norm_word(w2)
-        second_name = norm_word(w3)
+        last_name, first_name, second_name = parsed
         full = f"{last_name} {first_name} {second_name}"
         return (last_name, first_name, second_name, full)
 
@@ -0,0 +1,124 @@
+# flows/lead_sales/parsers/gazetteer.py
+# Газеттир для детекта адреса: крупные города РФ + типы улиц.
+#
+# Бюджет: оба множества — frozenset строк, собираются лениво при первом обращении;
+# вместе < 64 КБ (см. gazetteer_memory_bytes). Разбор сообщения — один проход по токенам
+# с O(1)-проверкой каждого токена (плюс биграмма для составных названий городов).
+
+import re
+import sys
+from functools import lru_cache
+from typing import FrozenSet, NamedTuple
+
+MEMORY_BUDGET_BYTES = 64 * 1024
+
+# Города без "г." (население ~100k+ и частые в заказах). Намеренно не включены
+# названия, совпадающие с распространёнными фамилиями (Королёв, Пушкин, Жуковский),
+# чтобы "Королёв Иван Иванович" не превращалось в адрес.
+_CITIES = """
+москва санкт-петербург питер спб новосибирск екатеринбург казань нижний-новгород челябинск самара омск
+ростов-на-дону уфа красноярск воронеж пермь волгоград краснодар саратов тюмень тольятти ижевск барнаул
+ульяновск иркутск хабаровск ярославль владивосток махачкала томск оренбург кемерово новокузнецк рязань
+астрахань набережные-челны пенза киров липецк чебоксары калининград тула ставрополь курск улан-удэ сочи
+тверь магнитогорск иваново брянск белгород сургут владимир чита архангельск нижний-тагил калуга смоленск
+волжский курган череповец орел вологда саранск владикавказ якутск мурманск подольск тамбов грозный
+стерлитамак петрозаводск кострома нижневартовск новороссийск йошкар-ола химки таганрог комсомольск-на-амуре
+сыктывкар нальчик шахты дзержинск орск братск благовещенск энгельс ангарск великий-новгород старый-оскол
+мытищи псков люберцы балашиха армавир южно-сахалинск северодвинск абакан петропавловск-камчатский
+норильск сызрань волгодонск новочеркасск каменск-уральский златоуст электросталь керчь симферополь
+севастополь миасс салават находка альметьевск рубцовск березники коломна майкоп хасавюрт одинцово
+ковров красногорск нефтекамск нефтеюганск серпухов новочебоксарск новый-уренгой щелково домодедово
+черкесск первоуральск дербент орехово-зуево раменское ноябрьск реутов пятигорск кисловодск невинномысск
+обнинск димитровград октябрьский камышин муром ессентуки новомосковск евпатория ялта
+"""
+
+_MULTIWORD_CITIES = """
+нижний новгород|набережные челны|нижний тагил|великий новгород|старый оскол|новый уренгой
+"""
+
+# Типы улиц/адресные маркеры (в т.ч. те, что не покрывает ADDRESS_WORDS_RE).
+_STREET_TYPES = """
+ул улица пр пр-т пр-кт проспект пер переулок ш шоссе б-р бульвар наб набережная пл площадь проезд туп
+тупик аллея мкр мкрн микрорайон кв-л квартал тракт линия просек д дом кв квартира корп корпус стр
+строение подъезд под этаж эт снт пос поселок пгт село деревня станица
+"""
+
+_TOKEN_RE = re.compile(r"[а-яёa-z0-9]+(?:-[а-яёa-z0-9]+)*", re.IGNORECASE)
+_HOUSE_NUMBER_RE = re.compile(r"^\d{1,4}[а-я]?$")
+# Год ("Лада Веста 2019", "Камри 40 2008") — описание машины: номеру дома рядом не верим.
+_YEAR_RE = re.compile(r"^(?:19|20)\d\d$")
+_QTY_WORDS = frozenset({"шт", "штук", "штуки", "pcs", "pc"})
+
+
+def _norm(token: str) -> str:
+    return token.lower().replace("ё", "е")
+
+
+@lru_cache(maxsize=None)
+def cities() -> FrozenSet[str]:
+    return frozenset(_CITIES.split()) | frozenset(c.replace(" ", "-") for c in _MULTIWORD_CITIES.strip().split("|"))
+
+
+@lru_cache(maxsize=None)
+def street_types() -> FrozenSet[str]:
+    return frozenset(_STREET_TYPES.split())
+
+
+def gazetteer_memory_bytes() -> int:
+    """Оценка памяти газеттира (контейнеры + строки)."""
+    total = 0
+    for s in (cities(), street_types()):
+        total += sys.getsizeof(s) + sum(sys.getsizeof(x) for x in s)
+    return total
+
+
+class AddressHints(NamedTuple):
+    has_city: bool
+    has_street_type: bool
+    # номер дома сразу после названия улицы, которое идёт сразу после города ("Казань Баумана 15")
+    # или отделено от него запятой ("Москва, Яна Райниса 7"); в сообщении нет года
+    has_street_number: bool
+
+
+def address_hints(text: str) -> AddressHints:
+    """Один проход по токенам сообщения."""
+    city_set = cities()
+    street_set = street_types()
+
+    has_city = False
+    has_street_type = False
+    has_street_number = False
+    has_year = False
+
+    text = text or ""
+    prev = ""
+    prev_is_word = False
+    city_at = -1  # индекс токена, которым закончился последний город
+    city_end = 0  # позиция в тексте после него
+    matches = list(_TOKEN_RE.finditer(text))
+    tokens = [_norm(m.group(0)) for m in matches]
+    for i, tok in enumerate(tokens):
+        if tok in city_set or (prev and f"{prev}-{tok}" in city_set):
+            has_city = True
+            city_at, city_end = i, matches[i].end()
+            prev, prev_is_word = tok, False
+            continue
+
+        if tok in street_set:
+            has_street_type = True
+            prev, prev_is_word = tok, False
+            continue
+
+        if _YEAR_RE.match(tok):
+            has_year = True
+        elif _HOUSE_NUMBER_RE.match(tok):
+            nxt = tokens[i + 1] if i + 1 < len(tokens) else ""
+            after_city = city_at >= 0 and (city_at == i - 2 or "," in text[city_end : matches[i].start()])
+            if prev_is_word and after_city and nxt not in _QTY_WORDS:
+                has_street_number = True
+            prev, prev_is_word = tok, False
+            continue
+
+        prev, prev_is_word = tok, tok.isalpha() and len(tok) >= 3
+
+    return AddressHints(has_city, has_street_type, has_street_number and not has_year)
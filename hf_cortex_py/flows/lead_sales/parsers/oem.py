@@ -1,6 +1,8 @@
 import re
 from typing import Optional, List, Tuple
 
+from flows.lead_sales.parsers.oem_index import get_oem_index
+
 URL_RE = re.compile(r"https?://\S+", re.IGNORECASE)
 ORDER_NUMBER_CONTEXT_RE = re.compile(
     r"(номер\s+заказа|заказ\s*№|order\s*#|order\s+number)",
@@ -45,6 +47,163 @@ def _has_digit(token: str) -> bool:
     return any(ch.isdigit() for ch in str(token or ""))
 
 
+# --------------------------------------------
+# OEM, записанный группами через разделители: "4N0 907 998", "A 000 420 17 20", "4N0-907-998"
+# --------------------------------------------
+
+_ALNUM_GROUP_RE = re.compile(r"[A-Za-z0-9]+")
+# Цепочка alnum-групп, разделённых ровно одним пробелом/точкой/дефисом.
+_SEPARATED_CHAIN_RE = re.compile(r"[A-Za-z0-9]+(?:[ .\-][A-Za-z0-9]+)+")
+_SEP_GROUP_MAX_LEN = 5
+_SEP_OEM_MIN_LEN = 8
+_SEP_OEM_MAX_LEN = 20
+# Год выпуска и объём двигателя в описании машины ("A6 C7 2012", "E70 3.0d 2008") — не OEM.
+_YEAR_GROUP_RE = re.compile(r"(?:19|20)\d\d")
+_ENGINE_VOLUME_RE = re.compile(r"(?<![A-Za-z0-9.])\d\.\d[A-Za-z]{0,4}(?![A-Za-z0-9.])")
+# Подсказка перед номером: "артикул 4N0 907 998", "OEM: A 000 420 17 20", "по номеру ..."
+_SEP_OEM_CUE_RE = re.compile(
+    r"(?:артикул\w*|арт\.?|oem|оем|номер\w*|каталожн\w*|p/?n|part\s*(?:no|number))\s*[:№#\-]?\s*$",
+    re.IGNORECASE,
+)
+_WORD_RE = re.compile(r"[0-9A-Za-zА-Яа-яЁё]+")
+# Сколько слов (без цифр) может окружать номер, чтобы реплика была "просто номером":
+# "нужна запчасть ..., цена?"; приветствия не считаются.
+_SEP_OEM_MAX_CONTEXT_WORDS = 3
+_SEP_OEM_FILLER_WORDS = frozenset(
+    ("добрый", "доброе", "день", "утро", "вечер", "здравствуйте", "привет", "пожалуйста", "подскажите")
+)
+# Обозначения двигателя рядом с группами: "E 320 CDI", "2.0 TDI" — это модель, не номер.
+_ENGINE_CODE_WORDS = frozenset(("CDI", "TDI", "TSI", "TFSI", "FSI", "HDI", "DCI", "CRDI", "GDI", "MPI", "VVT", "VTEC"))
+
+
+def _is_phone_like_digits(digits: str) -> bool:
+    if len(digits) == 11 and digits[0] in ("7", "8"):
+        return True
+    return len(digits) == 10
+
+
+def _accept_separated_run(groups: List[str], seps: List[str]) -> Optional[str]:
+    if len(groups) < 2:
+        return None
+    joined = "".join(groups).upper()
+    if not (_SEP_OEM_MIN_LEN <= len(joined) <= _SEP_OEM_MAX_LEN):
+        return None
+    if not _has_digit(joined):
+        return None
+    if any(_YEAR_GROUP_RE.fullmatch(g) for g in groups):
+        return None
+    if joined.isdigit():
+        # Чисто цифровые группы — чаще телефон, дата ("05.01.2026") или цена ("1.500").
+        # Принимаем только пробельные группы (3+), которые не похожи на телефон.
+        if len(groups) < 3 or any(sep != " " for sep in seps):
+            return None
+        if _is_phone_like_digits(joined):
+            return None
+    return joined
+
+
+def _separated_context_ok(text: str, start: int, end: int) -> bool:
+    """Склейку text[start:end] берём, только если реплика — по сути один номер или номер после подсказки."""
+    run_text = text[start:end]
+    if _ENGINE_VOLUME_RE.search(run_text):
+        return False
+    before = _WORD_RE.findall(text[:start])
+    after = _WORD_RE.findall(text[end:])
+    if (before and before[-1].upper() in _ENGINE_CODE_WORDS) or (after and after[0].upper() in _ENGINE_CODE_WORDS):
+        return False
+    if _SEP_OEM_CUE_RE.search(text[:start]):
+        return True
+    rest = [w for w in before + after if w.lower() not in _SEP_OEM_FILLER_WORDS]
+    return len(rest) <= _SEP_OEM_MAX_CONTEXT_WORDS and not any(_has_digit(w) for w in rest)
+
+
+def assemble_separated_oem_candidates(text: str) -> List[str]:
+    """
+    Склеивает OEM, записанный группами через одиночный пробел/точку/дефис.
+
+    Линейный проход: цепочки групп ищутся одним регэкспом, внутри цепочки группы
+    перебираются один раз. Безопасные правила:
+      - цепочка, которая целиком складывается в VIN ("WDB 2110 4 21A12 3456"), пропускается;
+      - группа не длиннее 5 символов (цельные токены ловит основной регэксп,
+        "5QM411105R 2 шт" не должен превратиться в "5QM411105R2");
+      - буквенная группа допускается только из одной буквы ("A 000 420 17 20"),
+        слова вроде "VAG"/"OEM" разрывают склейку;
+      - итог 8..20 символов и содержит цифру;
+      - чисто цифровые склейки — только через пробелы, 3+ группы и не телефон;
+      - группа-год (19xx/20xx) или объём двигателя ("3.0d") — это описание машины, не OEM;
+      - рядом обозначение двигателя ("E 320 CDI") — тоже описание машины;
+      - вокруг номера — не больше трёх слов без цифр, не считая приветствий ("нужна запчасть
+        4N0 907 998, цена?"), либо перед ним подсказка "артикул"/"OEM"/"номер":
+        "колодки на Audi A6 C7 2012" не склеиваются.
+    Служебные токены и номера заказов отсекает вызывающий код (как и для цельных токенов).
+    """
+    if not isinstance(text, str) or not text:
+        return []
+
+    out: List[str] = []
+    for chain in _SEPARATED_CHAIN_RE.finditer(text):
+        chain_text = chain.group(0)
+        # разделители в цепочке одиночные, поэтому длина без них считается без склейки
+        compact_len = len(chain_text) - chain_text.count(" ") - chain_text.count(".") - chain_text.count("-")
+        if compact_len < _SEP_OEM_MIN_LEN:
+            continue
+        if compact_len == 17 and looks_like_vin("".join(_ALNUM_GROUP_RE.findall(chain_text))):
+            continue
+
+        groups: List[str] = []
+        seps: List[str] = []
+        run_start = run_end = 0
+        run_len = 0
+        overflow = False
+        prev_end = 0
+
+        def flush() -> None:
+            if overflow:
+                return
+            cand = _accept_separated_run(groups, seps)
+            if cand and cand not in out and _separated_context_ok(text, run_start, run_end):
+                out.append(cand)
+
+        for m in _ALNUM_GROUP_RE.finditer(chain_text):
+            g = m.group(0)
+            joinable = len(g) <= _SEP_GROUP_MAX_LEN and (len(g) == 1 or _has_digit(g))
+            if not joinable:
+                flush()
+                groups, seps = [], []
+                run_len = 0
+                overflow = False
+            elif not overflow:
+                run_len += len(g)
+                if run_len > _SEP_OEM_MAX_LEN:
+                    # Слишком длинная склейка — это не OEM; группы дальше не копим.
+                    overflow = True
+                    groups, seps = [], []
+                else:
+                    if groups:
+                        seps.append(chain_text[prev_end:m.start()])
+                    else:
+                        run_start = chain.start() + m.start()
+                    groups.append(g)
+                    run_end = chain.start() + m.end()
+            prev_end = m.end()
+
+        flush()
+
+    return out
+
+
+def _oem_candidate_ok(tok: str, full_text: str) -> bool:
+    if looks_like_vin(tok):
+        return False
+    if not _has_digit(tok):
+        return False
+    if _is_service_token(tok):
+        return False
+    if _is_order_number_token(tok, full_text):
+        return False
+    return True
+
+
 def extract_oem_from_text(text: str) -> Optional[str]:
     """
     Детектор requested_oem на стадии NEW.
@@ -52,38 +211,37 @@ def extract_oem_from_text(text: str) -> Optional[str]:
     Стратегия:
       - соберём токены [A-Za-z0-9]{6,25}
       - выкинем VIN (17 без I/O/Q)
+      - если цельных кандидатов нет — склеим OEM, записанный группами
+        ("4N0 907 998"), по правилам assemble_separated_oem_candidates
       - выберем "наиболее похожий на OEM":
           1) предпочтение длине 6..20
-          2) затем по длине (длиннее обычно ближе к OEM)
+          2) затем формат, известный по ABCP (oem_index: сигнатура + префикс)
+          3) затем по длине (длиннее обычно ближе к OEM)
     """
     if not isinstance(text, str) or not text.strip():
         return None
 
     no_urls = URL_RE.sub(" ", text)
     raw_tokens = re.findall(r"[A-Za-z0-9]{6,25}", no_urls.upper())
-    if not raw_tokens:
-        return None
 
-    tokens: List[str] = []
-    for tok in raw_tokens:
-        if looks_like_vin(tok):
-            continue
-        if not _has_digit(tok):
-            continue
-        if _is_service_token(tok):
-            continue
-        if _is_order_number_token(tok, no_urls):
-            continue
-        tokens.append(tok)
+    tokens: List[str] = [tok for tok in raw_tokens if _oem_candidate_ok(tok, no_urls)]
+
+    if not tokens:
+        tokens = [
+            tok for tok in assemble_separated_oem_candidates(no_urls)
+            if _oem_candidate_ok(tok, no_urls)
+        ]
 
     if not tokens:
         return None
 
+    index = get_oem_index()
+
     # OEM обычно 6..20, поэтому ограничим предпочтения
-    def score(tok: str) -> Tuple[int, int, str]:
+    def score(tok: str) -> Tuple[int, int, int, str]:
         # 0 лучше, чем 1
         in_oem_len = 0 if 6 <= len(tok) <= 20 else 1
-        return (in_oem_len, -len(tok), tok)
+        return (in_oem_len, -index.score(tok), -len(tok), tok)
 
     tokens.sort(key=score)
     return tokens[0]
@@ -0,0 +1,287 @@
+# flows/lead_sales/parsers/oem_index.py
+# Индекс известных форматов OEM-номеров (по брендам), собранный из уже виденных ABCP-офферов.
+#
+# Зачем: extract_oem_from_text выбирает кандидата по длине. Если в сообщении несколько
+# alnum-токенов, индекс позволяет предпочесть тот, что похож на реальные OEM
+# (формат VAG "9AA999999A", MB "A999999999" и т.п.) — без LLM и без пустого ABCP-запроса.
+#
+# Устройство:
+#   - сигнатура токена: буква -> "A", цифра -> "9" ("5QM411105R" -> "9AA999999A");
+#     хранится множество сигнатур по каждому бренду;
+#   - префиксное дерево первых PREFIX_DEPTH символов (счётчики на узлах).
+# Поиск — O(длина токена), память — сотни байт на бренд/префикс, не на каждый OEM.
+# Исходные OEM не хранятся, поэтому повтор уже виденного номера от нового номера того же
+# формата не отличить: учитывается только то, что расширило индекс (новая пара
+# сигнатура+бренд или новый узел префикса). Повторные ABCP-ответы не меняют ни счётчики,
+# ни len(index) — и не заставляют persist_oem_index переписывать файл.
+#
+# Сохранение: с HF_CORTEX_OEM_INDEX_FILE индекс подгружается при первом обращении и
+# сохраняется обратно (persist_oem_index) — из flow после дообучения, не чаще раза в
+# HF_CORTEX_OEM_INDEX_SAVE_S секунд, и при остановке приложения (lifespan в app.py).
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+PREFIX_DEPTH = 4
+
+OEM_INDEX_FILE_ENV = "HF_CORTEX_OEM_INDEX_FILE"
+OEM_INDEX_SAVE_S_ENV = "HF_CORTEX_OEM_INDEX_SAVE_S"
+DEFAULT_SAVE_INTERVAL_S = 300.0
+
+_SIG_TABLE = str.maketrans(
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789",
+    "AAAAAAAAAAAAAAAAAAAAAAAAAA9999999999",
+)
+
+
+def oem_signature(token: str) -> str:
+    """Сигнатура формата: буквы -> A, цифры -> 9 (регистр не важен)."""
+    return (token or "").upper().translate(_SIG_TABLE)
+
+
+def _normalize_oem(raw: Any) -> Optional[str]:
+    if not isinstance(raw, str):
+        return None
+    tok = "".join(ch for ch in raw.upper() if ch.isalnum())
+    if not (6 <= len(tok) <= 25) or not tok.isascii():
+        return None
+    return tok
+
+
+def _normalize_brand(raw: Any) -> str:
+    if isinstance(raw, str) and raw.strip():
+        return raw.strip().upper()
+    return "UNKNOWN"
+
+
+class _TrieNode:
+    __slots__ = ("children", "count")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.count = 0
+
+
+class OemFormatIndex:
+    """Потокобезопасный инкрементальный индекс форматов OEM."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._signatures: Dict[str, Set[str]] = {}  # signature -> brands
+        self._root = _TrieNode()
+        self._seen = 0
+
+    def __len__(self) -> int:
+        return self._seen
+
+    @property
+    def brands(self) -> Set[str]:
+        out: Set[str] = set()
+        for brands in self._signatures.values():
+            out |= brands
+        return out
+
+    def add(self, oem: Any, brand: Any = None) -> bool:
+        """True — индекс узнал новое (формат бренда или префикс); False — не OEM или уже известно."""
+        tok = _normalize_oem(oem)
+        if tok is None:
+            return False
+
+        sig = oem_signature(tok)
+        brand_key = _normalize_brand(brand)
+        prefix = tok[:PREFIX_DEPTH]
+        with self._lock:
+            brands = self._signatures.setdefault(sig, set())
+            learned = brand_key not in brands
+            brands.add(brand_key)
+            path = []
+            node = self._root
+            for ch in prefix:
+                nxt = node.children.get(ch)
+                if nxt is None:
+                    nxt = _TrieNode()
+                    node.children[ch] = nxt
+                    learned = True
+                path.append(nxt)
+                node = nxt
+            if not learned:
+                return False
+            for nxt in path:
+                nxt.count += 1
+            self._seen += 1
+        return True
+
+    def add_many(self, items: Iterable[Tuple[Any, Any]]) -> int:
+        return sum(1 for oem, brand in items if self.add(oem, brand))
+
+    def observe_abcp(self, abcp: Any) -> int:
+        """
+        Инкрементально дообучаемся на injected_abcp ({oem: {"offers": [...]}}).
+        Ключ OEM берём с брендом первого оффера; строки с собственным полем oem
+        (замены/аналоги) тоже попадают в индекс. Возвращает, сколько номеров расширили индекс.
+        """
+        if not isinstance(abcp, dict):
+            return 0
+
+        added = 0
+        for oem, pack in abcp.items():
+            rows = pack.get("offers") if isinstance(pack, dict) else None
+            rows = rows if isinstance(rows, list) else []
+
+            key_brand = None
+            pairs: Dict[str, Any] = {}
+            for row in rows:
+                if not isinstance(row, dict):
+                    continue
+                brand = row.get("brand")
+                if key_brand is None and isinstance(brand, str) and brand.strip():
+                    key_brand = brand
+                row_oem = row.get("oem")
+                if isinstance(row_oem, str) and row_oem.strip():
+                    pairs.setdefault(row_oem, brand)
+
+            pairs.setdefault(oem, key_brand)
+            for o, b in pairs.items():
+                if self.add(o, b):
+                    added += 1
+        return added
+
+    def match(self, token: str) -> Tuple[bool, int]:
+        """
+        (сигнатура известна?, глубина совпадения префикса 0..PREFIX_DEPTH).
+        """
+        tok = (token or "").upper()
+        sig_hit = oem_signature(tok) in self._signatures
+
+        depth = 0
+        node = self._root
+        for ch in tok[:PREFIX_DEPTH]:
+            node = node.children.get(ch)  # type: ignore[assignment]
+            if node is None:
+                break
+            depth += 1
+        return sig_hit, depth
+
+    def score(self, token: str) -> int:
+        """Чем больше, тем «OEM-образнее» токен. 0 — индекс о нём ничего не знает."""
+        sig_hit, depth = self.match(token)
+        return (PREFIX_DEPTH + 1) * int(sig_hit) + depth
+
+    def brands_for(self, token: str) -> Set[str]:
+        return set(self._signatures.get(oem_signature(token), ()))
+
+    # -------------------------
+    # persistence
+    # -------------------------
+
+    def to_json(self) -> Dict[str, Any]:
+        """Компактный дамп: сигнатуры по брендам + префиксы (без исходных OEM)."""
+        prefixes: Dict[str, int] = {}
+
+        def walk(node: _TrieNode, prefix: str) -> None:
+            for ch, child in node.children.items():
+                p = prefix + ch
+                prefixes[p] = child.count
+                walk(child, p)
+
+        with self._lock:
+            walk(self._root, "")
+            return {
+                "v": 1,
+                "signatures": {sig: sorted(brands) for sig, brands in sorted(self._signatures.items())},
+                "prefixes": dict(sorted(prefixes.items())),
+                "seen": self._seen,
+            }
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "OemFormatIndex":
+        idx = cls()
+        for sig, brands in (data.get("signatures") or {}).items():
+            idx._signatures[str(sig)] = set(str(b) for b in brands or [])
+        for prefix, count in sorted((data.get("prefixes") or {}).items(), key=lambda kv: len(kv[0])):
+            node = idx._root
+            for ch in str(prefix)[:PREFIX_DEPTH]:
+                node = node.children.setdefault(ch, _TrieNode())
+            node.count = int(count or 0)
+        idx._seen = int(data.get("seen") or 0)
+        return idx
+
+    def save(self, path: Path) -> None:
+        # через временный файл: при падении посреди записи старый индекс остаётся целым
+        tmp = Path(f"{path}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_json(), f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+
+_INDEX: Optional[OemFormatIndex] = None
+_INDEX_LOCK = threading.Lock()
+# len(index) (растёт, только когда индекс узнал новое) на момент последней загрузки/сохранения
+# и когда это было
+_SAVED_SEEN = 0
+_SAVED_AT = 0.0
+
+
+def get_oem_index() -> OemFormatIndex:
+    """
+    Процессный синглтон. При первом обращении подгружается из HF_CORTEX_OEM_INDEX_FILE
+    (если задан и существует), дальше дообучается через observe_abcp.
+    """
+    global _INDEX, _SAVED_SEEN, _SAVED_AT
+    if _INDEX is None:
+        with _INDEX_LOCK:
+            if _INDEX is None:
+                idx = OemFormatIndex()
+                path = os.getenv(OEM_INDEX_FILE_ENV)
+                if path and Path(path).exists():
+                    try:
+                        with open(path, "r", encoding="utf-8") as f:
+                            idx = OemFormatIndex.from_json(json.load(f))
+                    except Exception:
+                        idx = OemFormatIndex()
+                _SAVED_SEEN, _SAVED_AT = len(idx), time.monotonic()
+                _INDEX = idx
+    return _INDEX
+
+
+def _save_interval_s() -> float:
+    try:
+        return max(0.0, float(os.getenv(OEM_INDEX_SAVE_S_ENV, DEFAULT_SAVE_INTERVAL_S)))
+    except ValueError:
+        return DEFAULT_SAVE_INTERVAL_S
+
+
+def persist_oem_index(force: bool = False) -> bool:
+    """
+    Сохраняет индекс в HF_CORTEX_OEM_INDEX_FILE, если с прошлого сохранения он дообучился.
+    Без force — не чаще раза в HF_CORTEX_OEM_INDEX_SAVE_S. True — файл записан.
+    """
+    global _SAVED_SEEN, _SAVED_AT
+    path = os.getenv(OEM_INDEX_FILE_ENV)
+    idx = _INDEX
+    if not path or idx is None:
+        return False
+    with _INDEX_LOCK:
+        seen = len(idx)
+        if seen == _SAVED_SEEN:
+            return False
+        if not force and time.monotonic() - _SAVED_AT < _save_interval_s():
+            return False
+        try:
+            idx.save(Path(path))
+        except Exception:
+            return False
+        _SAVED_SEEN, _SAVED_AT = seen, time.monotonic()
+    return True
+
+
+def reset_oem_index(index: Optional[OemFormatIndex] = None) -> None:
+    """Для тестов: подменить/сбросить глобальный индекс."""
+    global _INDEX, _SAVED_SEEN, _SAVED_AT
+    with _INDEX_LOCK:
+        _INDEX = index
+        _SAVED_SEEN, _SAVED_AT = (len(index) if index is not None else 0), time.monotonic()
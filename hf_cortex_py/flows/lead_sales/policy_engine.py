@@ -240,43 +240,85 @@ def _backfill_intent(result: CortexResult) -> None:
         result.intent = INTENT_OEM_QUERY
 
 
-def apply_policy_engine(
-    result: CortexResult,
-    *,
-    msg_text: str,
-    msg: Optional[Dict[str, Any]] = None,
-    stage_in: Optional[str] = None,
-    session_snapshot: Optional[Dict[str, Any]] = None,
-) -> CortexResult:
-    # msg/stage_in/session_snapshot оставлены в подписи для дальнейших правил.
-    _ = msg
-    _ = stage_in
-    _ = session_snapshot
-
+# Детерминированные правила в порядке приоритета. Ключ правила совпадает с intent,
+# кроме смешанного OEM+VIN (он даёт OEM_QUERY, но применяется отдельно).
+RULE_SERVICE_NOTICE = INTENT_SERVICE_NOTICE
+RULE_ORDER_STATUS = INTENT_ORDER_STATUS
+RULE_CLARIFY_NUMBER = INTENT_CLARIFY_NUMBER
+RULE_MIXED_OEM_VIN = "MIXED_OEM_VIN"
+RULE_HARD_PICK = INTENT_VIN_HARD_PICK
+RULE_LOST = INTENT_LOST
+
+_RULE_APPLIERS = {
+    RULE_SERVICE_NOTICE: _apply_service_notice,
+    RULE_ORDER_STATUS: _apply_order_status,
+    RULE_CLARIFY_NUMBER: _apply_ambiguous_number,
+    RULE_MIXED_OEM_VIN: _apply_mixed_oem_vin,
+    RULE_HARD_PICK: _apply_hard_pick,
+    RULE_LOST: _apply_lost,
+}
+
+_RULE_INTENTS = {
+    RULE_SERVICE_NOTICE: INTENT_SERVICE_NOTICE,
+    RULE_ORDER_STATUS: INTENT_ORDER_STATUS,
+    RULE_CLARIFY_NUMBER: INTENT_CLARIFY_NUMBER,
+    RULE_MIXED_OEM_VIN: INTENT_OEM_QUERY,
+    RULE_HARD_PICK: INTENT_VIN_HARD_PICK,
+    RULE_LOST: INTENT_LOST,
+}
+
+
+def match_policy_rule(msg_text: str) -> Optional[str]:
+    """Возвращает ключ первого сработавшего детерминированного правила (или None)."""
     text = _msg_text(msg_text)
     if not text:
-        _backfill_intent(result)
-        return result
+        return None
 
     digit_tokens = _collect_digit_tokens(text)
 
     if _looks_like_service_notice(text):
-        return _apply_service_notice(result)
+        return RULE_SERVICE_NOTICE
 
     if _looks_like_order_status(text, digit_tokens):
-        return _apply_order_status(result)
+        return RULE_ORDER_STATUS
 
     if _looks_like_ambiguous_number(text, digit_tokens):
-        return _apply_ambiguous_number(result)
+        return RULE_CLARIFY_NUMBER
 
     if _looks_like_mixed_oem_vin(text):
-        return _apply_mixed_oem_vin(result)
+        return RULE_MIXED_OEM_VIN
 
     if _looks_like_hard_pick(text):
-        return _apply_hard_pick(result)
+        return RULE_HARD_PICK
 
     if LOST_RE.search(text):
-        return _apply_lost(result)
+        return RULE_LOST
+
+    return None
+
+
+def classify_policy_text(msg_text: str) -> Optional[str]:
+    """Intent, который policy engine проставит детерминированно (None — решает LLM)."""
+    rule = match_policy_rule(msg_text)
+    return _RULE_INTENTS.get(rule) if rule else None
+
+
+def apply_policy_engine(
+    result: CortexResult,
+    *,
+    msg_text: str,
+    msg: Optional[Dict[str, Any]] = None,
+    stage_in: Optional[str] = None,
+    session_snapshot: Optional[Dict[str, Any]] = None,
+) -> CortexResult:
+    # msg/stage_in/session_snapshot оставлены в подписи для дальнейших правил.
+    _ = msg
+    _ = stage_in
+    _ = session_snapshot
+
+    rule = match_policy_rule(msg_text)
+    if rule:
+        return _RULE_APPLIERS[rule](result)
 
     _backfill_intent(result)
     return result
@@ -1,5 +1,7 @@
 from typing import Any, Dict, Optional, List, Union
 
+from flows.lead_sales.facts import read_session_facts, reconcile_facts
+
 
 def get_stage(session_snapshot: Dict[str, Any]) -> str:
     """Определяет текущую стадию.
@@ -121,3 +123,89 @@ def get_session_choice(session_snapshot: Dict[str, Any], key: str) -> Optional[U
             return v2
 
     return None
+
+
+_ADDRESS_KEYS = ("address", "client_address", "CLIENT_ADDRESS", "DELIVERY_ADDRESS", "delivery_address")
+
+
+class SessionView:
+    """Снимок сессии, разобранный за один проход.
+
+    Уровни sessionSnapshot обходятся один раз; приоритет для строковых ключей тот же,
+    что у get_session_str: верхний уровень -> state -> state.lead -> lead.
+    - stage: как get_stage (продвинутый state.stage важнее верхнего stage);
+    - address: первый непустой из алиасов (address, client_address, CLIENT_ADDRESS,
+      DELIVERY_ADDRESS, delivery_address), для каждого алиаса — по уровням;
+    - chosen_offer_id: как get_session_choice (верхний уровень -> state);
+    - state_oem: первый OEM из state.oems (strip/upper), без проверки на VIN;
+    - facts: блок meta.facts прошлых ходов (см. facts.py), сверенный с живыми полями
+      сессии (reconcile_facts: устаревшие факты отброшены), или None.
+
+    get_session_* оставлены для совместимости; на горячем пути используется SessionView.
+    """
+
+    __slots__ = (
+        "raw",
+        "_levels",
+        "stage",
+        "client_name",
+        "phone",
+        "address",
+        "chosen_offer_id",
+        "state_oem",
+        "facts",
+    )
+
+    def __init__(self, session_snapshot: Optional[Dict[str, Any]] = None) -> None:
+        snap = session_snapshot if isinstance(session_snapshot, dict) else {}
+        self.raw: Dict[str, Any] = snap
+
+        state = snap.get("state")
+        state = state if isinstance(state, dict) else None
+        levels: List[Dict[str, Any]] = [snap]
+        if state is not None:
+            levels.append(state)
+            state_lead = state.get("lead")
+            if isinstance(state_lead, dict):
+                levels.append(state_lead)
+        lead = snap.get("lead")
+        if isinstance(lead, dict):
+            levels.append(lead)
+        self._levels = tuple(levels)
+
+        self.stage = get_stage(snap)
+        self.client_name = self.get_str("client_name")
+        self.phone = self.get_str("phone")
+        self.address = None
+        for key in _ADDRESS_KEYS:
+            v = self.get_str(key)
+            if v:
+                self.address = v
+                break
+        self.chosen_offer_id = get_session_choice(snap, "chosen_offer_id")
+
+        self.state_oem: Optional[str] = None
+        oems = state.get("oems") if state is not None else None
+        if isinstance(oems, list) and oems:
+            first = oems[0]
+            if isinstance(first, str) and first.strip():
+                self.state_oem = first.strip().upper()
+
+        self.facts = reconcile_facts(
+            read_session_facts(snap),
+            client_name=self.client_name,
+            phone=self.phone,
+            address=self.address,
+            chosen_offer_id=self.chosen_offer_id,
+        )
+
+    def get_str(self, key: str) -> Optional[str]:
+        for level in self._levels:
+            v = level.get(key)
+            if isinstance(v, str) and v.strip():
+                return v.strip()
+        return None
+
+
+def as_session_view(session: Any) -> SessionView:
+    return session if isinstance(session, SessionView) else SessionView(session)
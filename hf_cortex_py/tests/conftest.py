@@ -1,7 +1,66 @@
 import sys
 from pathlib import Path
 
+import pytest
+
 
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture(autouse=True)
+def _isolated_oem_index():
+    # Индекс форматов OEM — процессный синглтон, который flow дообучает на injected_abcp.
+    # Каждый тест начинает с пустого индекса, чтобы порядок тестов не влиял на выбор OEM.
+    from flows.lead_sales.parsers.oem_index import reset_oem_index
+
+    reset_oem_index()
+    yield
+    reset_oem_index()
+
+
+@pytest.fixture(autouse=True)
+def _isolated_session_cache():
+    # Кэш сессий (delta-протокол), идемпотентность и бэкенд состояния — тоже процессные синглтоны.
+    from core.idempotency import reset_idempotency_store
+    from core.session_cache import reset_session_cache
+    from core.state import reset_state_backend
+
+    reset_state_backend()
+    reset_session_cache()
+    reset_idempotency_store()
+    yield
+    reset_idempotency_store()
+    reset_session_cache()
+    reset_state_backend()
+
+
+@pytest.fixture(autouse=True)
+def _isolated_abcp_cache():
+    # Кэш разбора пакетов ABCP переживает запросы — тесты не должны видеть чужие пакеты.
+    from flows.lead_sales.abcp_cache import reset_abcp_cache
+
+    reset_abcp_cache()
+    yield
+    reset_abcp_cache()
+
+
+@pytest.fixture(autouse=True)
+def _isolated_oem_graph():
+    # Граф замен OEM дообучается на injected_abcp так же, как индекс форматов.
+    from flows.lead_sales.oem_graph import reset_oem_graph
+
+    reset_oem_graph()
+    yield
+    reset_oem_graph()
+
+
+@pytest.fixture(autouse=True)
+def _isolated_price_cache():
+    # Кэш цен ABCP живёт поверх бэкенда состояния — сбрасываем вместе с ним.
+    from core.price_cache import reset_price_cache
+
+    reset_price_cache()
+    yield
+    reset_price_cache()
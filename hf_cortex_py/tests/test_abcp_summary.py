@@ -0,0 +1,219 @@
+import pytest
+
+from flows.lead_sales.abcp_summary import (
+    OfferSelection,
+    _pack_key,
+    build_offers_from_abcp,
+    ingest_abcp,
+    summarize_abcp,
+)
+
+from benchmarks.corpus import synthetic_abcp
+
+
+def _reference_picks(offers):
+    """Старое определение вариантов через полную сортировку (для сверки)."""
+
+    def days(o):
+        for k in ("minDays", "maxDays"):
+            if isinstance(o.get(k), (int, float)):
+                return int(o[k])
+        return None
+
+    fast = [(days(o), o.get("price", float("inf")), i) for i, o in enumerate(offers) if days(o) is not None]
+    cheap = [(o["price"], days(o) if days(o) is not None else 10**9, i) for i, o in enumerate(offers) if "price" in o]
+    return min(fast)[2] if fast else None, min(cheap)[2] if cheap else None
+
+
+def test_ingest_abcp_single_pass_summary_and_offers():
+    abcp = {
+        "B1": {
+            "offers": [
+                {"price": 10, "maxDays": 3, "brand": "X"},
+                {"price": 10, "minDays": 2, "supplier": 7},
+                {"minDays": 1},
+                {"price": 5},
+                "junk",
+            ]
+        },
+        "A1": {"offers": []},
+        "BAD": {"offers": "bad"},
+        "SKIP": "bad",
+    }
+    ingest = ingest_abcp(abcp)
+    s = ingest.summary_by_oem["B1"]
+
+    assert list(ingest.summary_by_oem) == ["B1", "A1", "BAD"]
+    assert (s["offers"], s["min_price"], s["max_price"], s["min_days"], s["max_days"]) == (5, 5.0, 10.0, 1, 3)
+    assert s["variant_1"] == {"minDays": 1}
+    assert s["variant_2"] == {"price": 5.0}
+    assert ingest.summary_by_oem["A1"]["variant_1"] is None
+    assert ingest.has_any is True
+
+    assert [(o.id, o.price, o.delivery_days, o.source) for o in ingest.offers] == [
+        (1, 5.0, None, None),
+        (2, 10.0, 2, "7"),
+        (3, 10.0, 3, None),
+    ]
+    assert ingest.offers[2].name == "X B1"
+
+    assert summarize_abcp(abcp) == ingest.summary_by_oem
+    assert [o.model_dump() for o in build_offers_from_abcp(abcp)] == [o.model_dump() for o in ingest.offers]
+    assert ingest_abcp({"A": {"offers": []}}).has_any is False
+
+
+def test_ingest_abcp_picks_match_full_sort_on_large_payload():
+    abcp = synthetic_abcp(2000, n_oems=4)
+    ingest = ingest_abcp(abcp)
+    assert len(ingest.offers) == 2000
+    assert [o.id for o in ingest.offers] == list(range(1, 2001))
+
+    for oem, pack in abcp.items():
+        fast_i, cheap_i = _reference_picks(pack["offers"])
+        summary = ingest.summary_by_oem[oem]
+        assert summary["variant_1"]["price"] == pack["offers"][fast_i]["price"]
+        assert summary["variant_1"]["minDays"] == pack["offers"][fast_i]["minDays"]
+        assert summary["variant_2"]["price"] == pack["offers"][cheap_i]["price"]
+        assert summary["variant_2"]["minDays"] == pack["offers"][cheap_i]["minDays"]
+
+
+def _reference_selection(offers, top_k):
+    """Отбор через полную сортировку и перебор пар (для сверки)."""
+    rows = []
+    for i, o in enumerate(offers):
+        if isinstance(o.get("price"), (int, float)):
+            d = o.get("minDays", o.get("maxDays"))
+            rows.append((float(o["price"]), int(d) if d is not None else 10**9, i))
+    rows.sort()
+    keep = set(rows[:top_k])
+    for r in rows:
+        if not any(
+            (q[0] <= r[0] and q[1] <= r[1]) and (q[:2] != r[:2] or q[2] < r[2]) for q in rows
+        ):
+            keep.add(r)
+    return sorted(keep)
+
+
+def test_ingest_abcp_top_k_and_pareto_selection(monkeypatch):
+    abcp = synthetic_abcp(3000, n_oems=3, seed=7)
+    selection = OfferSelection(top_k=5)
+    ingest = ingest_abcp(abcp, selection=selection)
+
+    expected = []
+    for oem in sorted(abcp):
+        for price, days, _ in _reference_selection(abcp[oem]["offers"], 5):
+            expected.append((oem, price, days if days != 10**9 else None))
+    assert [(o.oem, o.price, o.delivery_days) for o in ingest.offers] == expected
+    assert [o.id for o in ingest.offers] == list(range(1, len(expected) + 1))
+    assert len(ingest.offers) < 3000
+
+    # сводка считается по всем строкам, отбор её не меняет
+    assert ingest.summary_by_oem == summarize_abcp(abcp)
+    for oem, pack in ingest.selected_abcp.items():
+        assert len(pack["offers"]) == sum(1 for o in ingest.offers if o.oem == oem)
+    assert len(abcp[sorted(abcp)[0]]["offers"]) == 1000  # исходный ответ не трогаем
+
+    only_top = ingest_abcp(abcp, selection=OfferSelection(top_k=5, pareto=False))
+    assert len(only_top.offers) == 15
+
+    monkeypatch.setenv("HF_CORTEX_OFFERS_TOP_K", "5")
+    assert [o.model_dump() for o in ingest_abcp(abcp).offers] == [o.model_dump() for o in ingest.offers]
+    monkeypatch.delenv("HF_CORTEX_OFFERS_TOP_K")
+    assert len(ingest_abcp(abcp).offers) == 3000
+
+
+def test_ingest_abcp_columnar_path_matches_python():
+    pytest.importorskip("numpy")
+
+    abcp = synthetic_abcp(3000, n_oems=3, seed=11)
+    abcp["EDGE"] = {
+        "offers": [
+            {"price": 10, "maxDays": 3},
+            {"price": 10, "minDays": 3},
+            {"price": 10, "minDays": 3},
+            {"minDays": 1},
+            {"minDays": 1, "price": 7.5},
+            {"price": True, "maxDays": 2.9},
+            {"price": 5},
+            "junk",
+            None,
+        ]
+    }
+
+    def dump(ingest):
+        return ingest.summary_by_oem, [o.model_dump() for o in ingest.offers], ingest.selected_abcp
+
+    for selection in (OfferSelection(), OfferSelection(top_k=3), OfferSelection(top_k=3, pareto=False)):
+        fast = ingest_abcp(abcp, selection=selection, columnar=True)
+        slow = ingest_abcp(abcp, selection=selection, columnar=False)
+        assert dump(fast) == dump(slow)
+
+
+def test_ingest_abcp_pack_cache_hits_ttl_and_immutability():
+    from flows.lead_sales.abcp_cache import AbcpPackCache
+
+    now = [0.0]
+    cache = AbcpPackCache(max_entries=2, ttl_s=60, clock=lambda: now[0])
+    abcp = synthetic_abcp(300, n_oems=2, seed=3)
+    first = ingest_abcp(abcp, cache=cache, selection=OfferSelection())
+    assert (first.cached_packs, cache.misses, len(cache)) == (0, 2, 2)
+
+    # мутации результата не портят кэш
+    first.summary_by_oem[sorted(abcp)[0]]["min_price"] = -1
+    first.summary_by_oem[sorted(abcp)[0]]["variant_2"]["price"] = -1
+
+    # тот же пакет с другим порядком ключей в строках — тот же ключ
+    reordered = {oem: {"offers": [dict(reversed(list(o.items()))) for o in p["offers"]]} for oem, p in abcp.items()}
+    second = ingest_abcp(reordered, cache=cache, selection=OfferSelection())
+    plain = ingest_abcp(abcp, selection=OfferSelection())
+    assert second.cached_packs == 2
+    assert second.summary_by_oem == plain.summary_by_oem
+    assert second.rows == plain.rows
+    assert cache.hits == 2
+
+    # другой отбор — другой ключ; LRU на 2 пакета вытесняет старые
+    ingest_abcp(abcp, cache=cache, selection=OfferSelection(top_k=3))
+    assert cache.evictions == 2
+
+    now[0] = 61.0
+    assert ingest_abcp(abcp, cache=cache, selection=OfferSelection(top_k=3)).cached_packs == 0
+    assert cache.expired == 2
+
+    # ключ — 16-байтовый дайджест, а не копия пакета; изменение поля строки меняет ключ
+    oem = sorted(abcp)[0]
+    rows = abcp[oem]["offers"]
+    key = _pack_key(oem, rows, OfferSelection())
+    assert isinstance(key, bytes) and len(key) == 16
+    changed = [dict(rows[0], price=rows[0]["price"] + 1)] + rows[1:]
+    assert _pack_key(oem, changed, OfferSelection()) != key
+    assert "isOem" not in rows[0]  # отсутствующее поле и None — разные ключи
+    assert _pack_key(oem, [dict(rows[0], isOem=None)] + rows[1:], OfferSelection()) != key
+    assert _pack_key(oem, [dict(rows[0], brand=object())], OfferSelection()) is None
+
+
+def test_abcp_cache_env_is_parsed_defensively(monkeypatch):
+    from flows.lead_sales.abcp_cache import DEFAULT_MAX_ENTRIES, DEFAULT_TTL_S, get_abcp_cache, reset_abcp_cache
+
+    monkeypatch.setenv("HF_CORTEX_ABCP_CACHE_SIZE", "много")
+    monkeypatch.setenv("HF_CORTEX_ABCP_CACHE_TTL_S", "10m")
+    reset_abcp_cache()
+    cache = get_abcp_cache()
+    assert (cache.max_entries, cache.ttl_s) == (DEFAULT_MAX_ENTRIES, DEFAULT_TTL_S)
+
+
+def test_flow_reuses_abcp_pack_cache_across_turns(monkeypatch):
+    from core.models import CortexResult
+    from flows.lead_sales import flow as lead_sales_flow
+
+    monkeypatch.setattr(
+        lead_sales_flow,
+        "call_llm_with_cortex_request",
+        lambda req: CortexResult(action="reply", stage="CONTACT", reply="ok"),
+    )
+    abcp = synthetic_abcp(50, n_oems=2, seed=5)
+    session = {"stage": "PRICING"}
+    first = lead_sales_flow.run_lead_sales_flow({"text": "беру"}, session, injected_abcp=abcp)
+    second = lead_sales_flow.run_lead_sales_flow({"text": "беру"}, session, injected_abcp=abcp)
+    assert first.debug["abcp_cached_packs"] == 0
+    assert second.debug["abcp_cached_packs"] == 2
+    assert [o.model_dump() for o in second.offers] == [o.model_dump() for o in first.offers]
@@ -0,0 +1,38 @@
+from benchmarks.corpus import load_corpus
+from benchmarks.harness import BenchCase, BenchReport, BenchStat, compare_with_baseline, measure
+
+
+def test_corpus_has_replay_and_synthetic_messages():
+    corpus = load_corpus()
+    assert "давайте вариант 3" in corpus
+    assert any(len(t) > 2000 for t in corpus)
+
+
+def test_measure_reports_ns_and_allocations():
+    stat = measure(BenchCase("join", lambda t: [t] * 100, lambda t: (t,)), ["a", "b"], rounds=2, warmup=1)
+    assert stat.ops == 2
+    assert stat.ns_per_op > 0
+    assert stat.peak_bytes_per_op > 0
+
+
+def test_compare_with_baseline_scales_by_calibration_and_flags_regressions():
+    baseline = {
+        "calibration_ns": 1000.0,
+        "tolerance": 0.2,
+        "cases": {
+            "fast": {"ns_per_op": 10_000.0, "peak_bytes_per_op": 0.0},
+            "slow": {"ns_per_op": 10_000.0, "peak_bytes_per_op": 0.0},
+        },
+    }
+    # Машина вдвое медленнее: 23 мкс укладывается в 10 мкс * 2 * 1.2.
+    report = BenchReport(
+        calibration_ns=2000.0,
+        stats=[
+            BenchStat("fast", 1, 23_000.0, 100.0),
+            BenchStat("slow", 1, 25_000.0, 10_000.0),
+            BenchStat("new_case", 1, 1e9, 1e9),
+        ],
+    )
+
+    regressions = compare_with_baseline(report, baseline)
+    assert [(r.name, r.metric) for r in regressions] == [("slow", "ns_per_op"), ("slow", "peak_bytes_per_op")]
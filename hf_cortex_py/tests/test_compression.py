@@ -0,0 +1,67 @@
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+import app as app_module
+from core.compression import GzipMiddleware, accepts_gzip
+
+from benchmarks.corpus import synthetic_abcp
+
+URL = "/api/hf-cortex/lead_sales"
+
+
+def test_large_pricing_response_is_gzipped_above_threshold(monkeypatch):
+    monkeypatch.setattr(app_module, "HF_CORTEX_TOKEN", None)
+    client = TestClient(app_module.app)
+    abcp = synthetic_abcp(200, n_oems=3)
+    req = {"app": "t", "flow": "lead_sales", "payload": {"msg": {"text": next(iter(abcp))}, "injected_abcp": abcp}}
+
+    plain = client.post(URL, json=req)
+    assert "content-encoding" not in plain.headers  # по умолчанию выключено
+
+    monkeypatch.setenv("HF_CORTEX_GZIP_MIN_BYTES", "2048")
+    packed = client.post(URL, json=req)
+    assert packed.headers["content-encoding"] == "gzip"
+    assert packed.headers["vary"] == "Accept-Encoding"
+    assert int(packed.headers["content-length"]) < len(plain.content) / 4
+    assert packed.json()["context"] == plain.json()["context"]
+    assert packed.json()["result"]["reply"] == plain.json()["result"]["reply"]
+
+    identity = client.post(URL, json=req, headers={"accept-encoding": "gzip;q=0, identity"})
+    assert "content-encoding" not in identity.headers
+
+    small = client.get("/api/hf-cortex/abcp_cache/A1")  # 404 кэша цен — меньше порога
+    assert small.status_code == 404 and "content-encoding" not in small.headers
+
+
+def test_streaming_and_small_responses_pass_through(monkeypatch):
+    monkeypatch.setenv("HF_CORTEX_GZIP_MIN_BYTES", "16")
+    chunks = [b'{"phase":"decision"}\n', b'{"phase":"reply"}\n']
+
+    demo = FastAPI()
+    demo.add_middleware(GzipMiddleware)
+
+    @demo.get("/stream")
+    def stream():
+        return StreamingResponse(iter(chunks), media_type="application/x-ndjson")
+
+    @demo.get("/sse")
+    def sse():
+        return PlainTextResponse("data: " + "x" * 100 + "\n\n", media_type="text/event-stream")
+
+    @demo.get("/json")
+    def big():
+        return JSONResponse({"text": "y" * 100})
+
+    client = TestClient(demo)
+    r = client.get("/stream")
+    assert "content-encoding" not in r.headers and r.content == b"".join(chunks)
+    assert "content-encoding" not in client.get("/sse").headers
+
+    r = client.get("/json", headers={"accept-encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip" and r.json() == {"text": "y" * 100}
+
+    assert accepts_gzip("br, gzip;q=0.5")
+    assert accepts_gzip("*")
+    assert not accepts_gzip("gzip;q=0")
+    assert not accepts_gzip(None)
@@ -201,3 +201,35 @@ def test_flow_keeps_service_notice_policy_without_hardening_override(monkeypatch
     assert result.stage == "IN_WORK"
     assert result.action == "reply"
     assert "проверим обновление прайса" in (result.reply or "").lower()
+
+
+def test_flow_short_pricing_path_uses_channel_template(monkeypatch):
+    def _no_llm(_req):
+        raise AssertionError("short PRICING path must not call LLM")
+
+    monkeypatch.setattr(lead_sales_flow, "call_llm_with_cortex_request", _no_llm)
+    msg = {"text": "5QM411105R"}
+    session = {"stage": "NEW"}
+
+    default = run_lead_sales_flow(msg, session, injected_abcp=_mk_injected_abcp())
+    telegram = run_lead_sales_flow(msg, session, injected_abcp=_mk_injected_abcp(), channel="telegram")
+
+    assert default.debug["short_path"] == "abcp_injected_new"
+    assert "Вариант 1 — VAG 5QM411105R за 17 700 ₽, срок до 337 раб. дней." in default.reply
+    assert "1. VAG 5QM411105R — 17 700 ₽, до 337 раб. дн." in telegram.reply
+    assert [o.model_dump() for o in telegram.offers] == [o.model_dump() for o in default.offers]
+
+
+def test_flow_car_description_does_not_shadow_state_oem(monkeypatch):
+    def _no_llm(_req):
+        raise AssertionError("short PRICING path must not call LLM")
+
+    monkeypatch.setattr(lead_sales_flow, "call_llm_with_cortex_request", _no_llm)
+    injected = {"4N0907998": {"offers": [{"brand": "VAG", "price": 5400, "minDays": 5, "maxDays": 7}]}}
+    session = {"stage": "NEW", "state": {"oems": ["4N0907998"]}}
+
+    result = run_lead_sales_flow({"text": "Нужен датчик на Audi A6 C7 2012"}, session, injected_abcp=injected)
+
+    assert result.debug["requested_oem"] == "4N0907998"
+    assert "По номеру 4N0907998 есть варианты" in result.reply
+    assert "оригинальная замена" not in result.reply
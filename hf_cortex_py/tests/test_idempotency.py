@@ -0,0 +1,201 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from core.idempotency import IDEMPOTENCY_IN_PROGRESS, IdempotencyInProgress, IdempotencyStore, get_idempotency_store
+from core.models import CortexResult
+from core.state import MemoryStateBackend, SqliteStateBackend
+
+URL = "/api/hf-cortex/lead_sales"
+BODY = {"app": "t", "flow": "lead_sales", "payload": {"msg": {"text": "вариант 1"}}}
+
+
+@pytest.fixture
+def counted_flow(monkeypatch):
+    calls = []
+
+    def fake_flow(msg, session, injected_abcp, payload_offers, channel=None):
+        calls.append(msg)
+        return CortexResult(action="reply", stage="NEW", reply=f"ответ #{len(calls)}")
+
+    monkeypatch.setattr(app_module, "run_lead_sales_flow", fake_flow)
+    monkeypatch.setattr(app_module, "HF_CORTEX_TOKEN", None)
+    return calls
+
+
+def test_retry_with_same_key_replays_stored_response(counted_flow):
+    client = TestClient(app_module.app)
+    headers = {"Idempotency-Key": "portal:chat1:101:first"}
+
+    r1 = client.post(URL, json=BODY, headers=headers)
+    r2 = client.post(URL, json=BODY, headers=headers)
+    assert len(counted_flow) == 1
+    assert r2.json() == r1.json()
+    assert r2.headers.get("Idempotent-Replay") == "true"
+    assert "Idempotent-Replay" not in r1.headers
+
+    r3 = client.post(URL, json=BODY, headers={"Idempotency-Key": "portal:chat1:102:first"})
+    assert r3.json()["result"]["reply"] == "ответ #2"
+
+    # без ключа — прежнее поведение, каждый вызов считается заново
+    client.post(URL, json=BODY)
+    assert len(counted_flow) == 3
+
+
+def test_stored_response_omits_context_echo(counted_flow):
+    client = TestClient(app_module.app)
+    headers = {"Idempotency-Key": "portal:chat1:103:first"}
+    abcp = {"4N0907998": {"offers": [{"brand": "VAG", "price": 100 + i} for i in range(200)]}}
+    body = {**BODY, "payload": {**BODY["payload"], "sessionSnapshot": {"stage": "NEW"}, "injected_abcp": abcp}}
+
+    r1 = client.post(URL, json=body, headers=headers)
+    stored = get_idempotency_store().backend.get_json(f"idem:lead_sales:{headers['Idempotency-Key']}")
+    assert stored["response"]["context"] is None
+    assert stored["response"]["result"]["reply"] == "ответ #1"
+
+    # эхо context на повторе собирается из payload повтора
+    r2 = client.post(URL, json=body, headers=headers)
+    assert len(counted_flow) == 1
+    assert r2.json() == r1.json()
+    assert r2.json()["context"]["injected_abcp"] == abcp
+
+
+def test_flow_exception_fallback_is_not_stored(monkeypatch):
+    state = {"fail": True}
+
+    def flaky_flow(msg, session, injected_abcp, payload_offers, channel=None):
+        if state["fail"]:
+            raise RuntimeError("LLM timeout")
+        return CortexResult(action="reply", stage="NEW", reply="ok")
+
+    monkeypatch.setattr(app_module, "run_lead_sales_flow", flaky_flow)
+    monkeypatch.setattr(app_module, "HF_CORTEX_TOKEN", None)
+    client = TestClient(app_module.app)
+    headers = {"Idempotency-Key": "k-flaky"}
+
+    assert client.post(URL, json=BODY, headers=headers).json()["result"]["debug"] == {"flow_exception": True}
+    state["fail"] = False
+    assert client.post(URL, json=BODY, headers=headers).json()["result"]["reply"] == "ok"
+
+
+def test_concurrent_retry_waits_for_inflight_call(monkeypatch):
+    release = threading.Event()
+    calls = []
+
+    def slow_flow(msg, session, injected_abcp, payload_offers, channel=None):
+        calls.append(1)
+        release.wait(5)
+        return CortexResult(action="reply", stage="NEW", reply="единственный ответ")
+
+    monkeypatch.setattr(app_module, "run_lead_sales_flow", slow_flow)
+    monkeypatch.setattr(app_module, "HF_CORTEX_TOKEN", None)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            headers = {"Idempotency-Key": "k-concurrent"}
+            first = asyncio.create_task(client.post(URL, json=BODY, headers=headers))
+            await asyncio.sleep(0.05)
+            second = asyncio.create_task(client.post(URL, json=BODY, headers=headers))
+            await asyncio.sleep(0.05)
+            release.set()
+            return await first, await second
+
+    r1, r2 = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert r1.json() == r2.json()
+    assert r2.headers.get("Idempotent-Replay") == "true"
+
+
+def test_store_waits_for_pending_marker_of_other_worker():
+    backend = MemoryStateBackend()
+    worker_a = IdempotencyStore(backend, wait_s=2)
+    worker_b = IdempotencyStore(backend, wait_s=2)
+
+    async def compute_a():
+        await asyncio.sleep(0.2)
+        return {"reply": "A"}, True
+
+    async def compute_b():
+        raise AssertionError("второй воркер не должен считать заново")
+
+    async def scenario():
+        ta = asyncio.create_task(worker_a.run("k", compute_a))
+        await asyncio.sleep(0.01)
+        t0 = time.monotonic()
+        res_b = await worker_b.run("k", compute_b)
+        return await ta, res_b, time.monotonic() - t0
+
+    (res_a, replay_a), (res_b, replay_b), waited = asyncio.run(scenario())
+    assert res_a == res_b == {"reply": "A"}
+    assert replay_a is False and replay_b is True
+    assert waited < 2
+
+
+def test_slow_first_call_is_not_recomputed_after_wait_expires():
+    # Ход дольше ожидания повтора: маркер живёт pending_ttl_s, повтор не пересчитывает,
+    # а получает "повторите позже"; после хода — сохранённый ответ.
+    backend = MemoryStateBackend()
+    worker_a = IdempotencyStore(backend, wait_s=0.1, pending_ttl_s=30)
+    worker_b = IdempotencyStore(backend, wait_s=0.1, pending_ttl_s=30)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.4)
+        return {"reply": "A"}, True
+
+    async def scenario():
+        ta = asyncio.create_task(worker_a.run("k", compute))
+        await asyncio.sleep(0.01)
+        with pytest.raises(IdempotencyInProgress):
+            await worker_b.run("k", compute)
+        await ta
+        return await worker_b.run("k", compute)
+
+    assert asyncio.run(scenario()) == ({"reply": "A"}, True)
+    assert len(calls) == 1
+
+
+def test_endpoint_returns_retryable_503_while_other_worker_computes(counted_flow, monkeypatch):
+    monkeypatch.setenv("HF_CORTEX_IDEMPOTENCY_WAIT_S", "0.1")
+    key = "portal:chat1:104:first"
+    get_idempotency_store().backend.set(f"idem:lead_sales:{key}", b'{"state":"pending"}', 30)
+
+    r = TestClient(app_module.app).post(URL, json=BODY, headers={"Idempotency-Key": key})
+    assert r.status_code == 503
+    assert r.json()["detail"] == IDEMPOTENCY_IN_PROGRESS
+    assert int(r.headers["retry-after"]) > 0
+    assert counted_flow == []
+
+
+def test_store_does_not_block_event_loop_on_shared_backend(tmp_path):
+    loop_threads = []
+    io_threads = []
+
+    class RecordingSqlite(SqliteStateBackend):
+        def get(self, key):
+            io_threads.append(threading.get_ident())
+            return super().get(key)
+
+        def cas(self, key, expected, value, ttl_s=None):
+            io_threads.append(threading.get_ident())
+            return super().cas(key, expected, value, ttl_s)
+
+    store = IdempotencyStore(RecordingSqlite(str(tmp_path / "state.sqlite3")))
+
+    async def compute():
+        return {"reply": "ok"}, True
+
+    async def scenario():
+        loop_threads.append(threading.get_ident())
+        return await store.run("k", compute), await store.run("k", compute)
+
+    first, second = asyncio.run(scenario())
+    assert first == ({"reply": "ok"}, False) and second == ({"reply": "ok"}, True)
+    assert io_threads and loop_threads[0] not in io_threads
@@ -155,6 +155,23 @@ def test_parse_full_name_handles_order_and_rejects_incomplete():
     assert llm_client.parse_full_name(123) == {"last": None, "first": None, "middle": None}
 
 
+def test_parse_full_name_name_first_order_outside_lexicon():
+    # имён нет в лексиконе — решает полное окончание отчества
+    assert llm_client.parse_full_name("Ахмед Рашидович Алиев") == {
+        "last": "Алиев",
+        "first": "Ахмед",
+        "middle": "Рашидович",
+    }
+    assert llm_client.parse_full_name("Зульфия Ринатовна Петрова") == {
+        "last": "Петрова",
+        "first": "Зульфия",
+        "middle": "Ринатовна",
+    }
+    # слабое окончание без лексикона и "фамилия" без фамильного суффикса — не ФИО
+    assert llm_client.parse_full_name("Ахмед Ильдарич Алиев")["last"] is None
+    assert llm_client.parse_full_name("Сергей Иванович привезите")["last"] is None
+
+
 def test_normalize_llm_result_sanitizes_bad_payload_types():
     out = llm_client.normalize_llm_result(
         {
@@ -0,0 +1,53 @@
+import pytest
+from pydantic import BaseModel, ValidationError
+
+from core.models import ContactUpdate, CortexResult, Offer, construct_trusted
+from flows.lead_sales.offers import OfferRow
+
+
+def test_construct_trusted_matches_validated_offer():
+    row = OfferRow(3, "A1", "BMW", "BMW A1", 1500.0, "RUB", 2, 5, "S1", None)
+
+    trusted = row.to_offer()
+    validated = Offer(**row._asdict())
+
+    assert trusted == validated
+    assert trusted.model_dump_json() == validated.model_dump_json()
+    assert trusted.model_fields_set == validated.model_fields_set
+
+    # неполный набор: умолчания как у валидации, лишние ключи отброшены
+    partial = construct_trusted(Offer, {"id": 1, "price": 10.0, "unknown": "x"})
+    assert partial == Offer(id=1, price=10.0)
+    assert partial.model_fields_set == {"id", "price"}
+
+    with pytest.raises(ValidationError):
+        construct_trusted(Offer, {"id": 1})
+
+
+def test_construct_trusted_result_defaults_are_not_shared():
+    first = construct_trusted(CortexResult, {"stage": "PRICING", "offers": [Offer(id=1, price=1.0)]})
+    second = construct_trusted(CortexResult, {})
+
+    first.oems.append("A1")
+    first.debug["x"] = 1
+    assert second.oems == [] and second.debug == {}
+    assert second.reply == CortexResult().reply
+    assert first.model_dump() == CortexResult(stage="PRICING", oems=["A1"], offers=[Offer(id=1, price=1.0)], debug={"x": 1}).model_dump()
+
+    cu = construct_trusted(ContactUpdate, {"phone": "+79000000000"})
+    assert cu == ContactUpdate(phone="+79000000000")
+
+
+def test_construct_trusted_fills_the_same_internals_as_model_construct():
+    # construct_trusted пишет слоты BaseModel напрямую: если новая версия pydantic их поменяет,
+    # здесь должно упасть (версия закреплена в requirements.txt)
+    slots = ("__dict__", "__pydantic_fields_set__", "__pydantic_extra__", "__pydantic_private__")
+    assert set(BaseModel.__slots__) == set(slots)
+
+    full = OfferRow(3, "A1", "BMW", "BMW A1", 1500.0, "RUB", 2, 5, "S1", None)._asdict()
+    cases = [(Offer, full), (Offer, {"id": 1, "price": 10.0}), (CortexResult, {"stage": "PRICING"}), (ContactUpdate, {})]
+    for cls, values in cases:
+        trusted = construct_trusted(cls, dict(values))
+        reference = cls.model_construct(**values)
+        for slot in slots:
+            assert getattr(trusted, slot) == getattr(reference, slot), (cls.__name__, slot)
@@ -0,0 +1,131 @@
+import flows.lead_sales.flow as lead_sales_flow
+from flows.lead_sales.oem_graph import OemReplacementGraph, collapse_equivalent_oems
+
+
+def _row(oem, price, days=5, **extra):
+    return {"brand": "VAG", "price": price, "minDays": days, "maxDays": days, "oem": oem, **extra}
+
+
+def _abcp():
+    # 5Q0411105R заменён на 5QM411105R; 1K0411105AA — аналог, не замена.
+    orig = {"isOriginal": True}
+    return {
+        "5QM411105R": {"offers": [_row("5QM411105R", 17700, **orig), _row("5QM411105R", 19800, 9, **orig)]},
+        "5Q0411105R": {
+            "offers": [
+                _row("5QM411105R", 17700, **orig),
+                _row("5Q0411105R", 15000, 12, **orig),
+                _row("1K0411105AA", 900, isAnalog=True),
+            ]
+        },
+        "1K0411105AA": {"offers": [_row("1K0411105AA", 900)]},
+    }
+
+
+def test_graph_edges_chains_and_analogs():
+    graph = OemReplacementGraph()
+    assert graph.observe_abcp(_abcp()) == 1
+    assert graph.observe_abcp(_abcp()) == 0
+
+    assert graph.is_supersession("5QM411105R", "5q0 411 105 r")
+    assert not graph.is_supersession("5Q0411105R", "5QM411105R")
+    assert graph.equivalent("5Q0411105R", "5QM411105R")
+    assert not graph.equivalent("5Q0411105R", "1K0411105AA")
+    assert graph.representative("ZZZ123456") == "ZZZ123456"
+
+    graph.add_replacement("5QM411105R", "5QM411105T")
+    assert graph.equivalent("5Q0411105R", "5QM411105T")
+    assert not graph.is_supersession("5QM411105T", "5Q0411105R")
+
+    small = OemReplacementGraph(max_nodes=2)
+    assert small.add_replacement("AAA111111", "AAA111112")
+    assert not small.add_replacement("AAA111112", "AAA111113")
+    assert len(small) == 2
+
+
+def test_collapse_merges_equivalent_packs_without_duplicates():
+    graph = OemReplacementGraph()
+    abcp = _abcp()
+    assert collapse_equivalent_oems(abcp, graph) == (abcp, {})
+
+    graph.observe_abcp(abcp)
+    out, aliases = collapse_equivalent_oems(abcp, graph, prefer="5Q0411105R")
+    assert aliases == {"5QM411105R": "5Q0411105R"}
+    assert list(out) == ["5Q0411105R", "1K0411105AA"]
+    assert [r["price"] for r in out["5Q0411105R"]["offers"]] == [17700, 19800, 15000, 900]
+    assert out["1K0411105AA"] is abcp["1K0411105AA"]
+    assert len(abcp["5Q0411105R"]["offers"]) == 3  # исходный injected_abcp не меняется
+
+    out, aliases = collapse_equivalent_oems(abcp, graph)
+    assert aliases == {"5Q0411105R": "5QM411105R"}
+
+
+def test_flow_collapse_keeps_each_row_own_oem(monkeypatch):
+    monkeypatch.setattr(lead_sales_flow, "call_llm_with_cortex_request", lambda _req: None)
+    plain = lead_sales_flow.run_lead_sales_flow({"text": "5Q0411105R"}, {"stage": "NEW"}, injected_abcp=_abcp())
+    assert "oems_collapsed" not in plain.debug  # по умолчанию выключено
+
+    monkeypatch.setenv("HF_CORTEX_OEM_COLLAPSE", "1")
+    result = lead_sales_flow.run_lead_sales_flow({"text": "5Q0411105R"}, {"stage": "NEW"}, injected_abcp=_abcp())
+    assert result.debug["oems_collapsed"] == {"5QM411105R": "5Q0411105R"}
+    # строки склеенного пакета и аналог не выдаются за запрошенный номер
+    assert sorted((o.oem, o.price) for o in result.offers) == [
+        ("1K0411105AA", 900),
+        ("1K0411105AA", 900),
+        ("5Q0411105R", 15000),
+        ("5QM411105R", 17700),
+        ("5QM411105R", 19800),
+    ]
+    by_id = {o.id: o for o in result.offers}
+    for line in result.reply.splitlines():
+        if line.startswith("Вариант"):
+            off = by_id[int(line.split()[1])]
+            assert f" {off.oem} за " in line
+
+
+def test_collapsed_row_is_quoted_and_ordered_under_its_own_article(monkeypatch):
+    monkeypatch.setattr(lead_sales_flow, "call_llm_with_cortex_request", lambda _req: None)
+    monkeypatch.setenv("HF_CORTEX_OEM_COLLAPSE", "1")
+    abcp = {
+        "A1234567": {"offers": [{"brand": "BMW", "price": 120, "minDays": 3, "maxDays": 3, "isOriginal": True}]},
+        "B7654321": {
+            "offers": [
+                {"brand": "BMW", "price": 90, "minDays": 5, "maxDays": 5, "isOriginal": True, "requestedOem": "A1234567"}
+            ]
+        },
+    }
+    result = lead_sales_flow.run_lead_sales_flow({"text": "A1234567"}, {"stage": "NEW"}, injected_abcp=abcp)
+    assert result.debug["oems_collapsed"] == {"B7654321": "A1234567"}
+    cheap = next(o for o in result.offers if o.price == 90)
+    assert cheap.oem == "B7654321"
+    assert "BMW A1234567 за 90" not in result.reply and "BMW B7654321 за 90" in result.reply
+
+
+def test_graph_ignores_rows_without_explicit_original_flag():
+    # Node: isAnalog/isOriginal = null, когда ABCP флаг не прислал — это может быть аналог.
+    abcp = {
+        "REQ123": {"offers": [_row("REQ123", 120, requestedOem="REQ123", isAnalog=None, isOriginal=None)]},
+        "ALT111": {"offers": [_row("ALT111", 100, requestedOem="REQ123", isAnalog=None, isOriginal=None)]},
+        "ALT222": {"offers": [_row("ALT222", 110, requestedOem="REQ123", isAnalog=False, isOriginal=None)]},
+    }
+    graph = OemReplacementGraph()
+    assert graph.observe_abcp(abcp) == 1
+    assert not graph.equivalent("ALT111", "REQ123")
+    assert graph.is_supersession("ALT222", "REQ123")
+
+
+def test_graph_learns_from_node_grouped_packs():
+    # Node раскладывает ответ ABCP по реальному номеру и помечает requestedOem.
+    abcp = {
+        "REQ123": {"offers": [_row("REQ123", 120, requestedOem="REQ123")]},
+        "ALT111": {"offers": [_row("ALT111", 100, requestedOem="REQ123", isOriginal=True)]},
+        "AFT999": {"offers": [_row("AFT999", 50, requestedOem="REQ123", isOriginal=False)]},
+    }
+    graph = OemReplacementGraph()
+    assert graph.observe_abcp(abcp) == 1
+    assert graph.is_supersession("ALT111", "REQ123")
+    assert not graph.equivalent("AFT999", "REQ123")
+
+    out, aliases = collapse_equivalent_oems(abcp, graph, prefer="REQ123")
+    assert aliases == {"ALT111": "REQ123"}
+    assert [r["price"] for r in out["REQ123"]["offers"]] == [120, 100]
@@ -0,0 +1,112 @@
+import json
+
+from flows.lead_sales.parsers.oem import extract_oem_from_text
+from flows.lead_sales.parsers.oem_index import (
+    OemFormatIndex,
+    get_oem_index,
+    oem_signature,
+    persist_oem_index,
+    reset_oem_index,
+)
+
+
+def _abcp():
+    return {
+        "5QM411105R": {
+            "offers": [
+                {"brand": "VAG", "price": 17700, "oem": "5QM411105R"},
+                {"brand": "VAG", "price": 19800, "oem": "5QM411105S"},
+            ]
+        },
+        "A0004201720": {"offers": [{"brand": "MERCEDES-BENZ", "price": 9000}]},
+    }
+
+
+def test_signature_and_match():
+    assert oem_signature("5qm411105r") == "9AA999999A"
+
+    idx = OemFormatIndex()
+    assert idx.observe_abcp(_abcp()) == 2  # 5QM411105S — тот же формат и префикс, что 5QM411105R
+    assert idx.match("4N0907998R") == (False, 0)
+    assert idx.match("5QM411999X") == (True, 4)
+    assert idx.brands_for("1KD615301A") == {"VAG"}
+    assert "MERCEDES-BENZ" in idx.brands
+    assert idx.score("5QM411999X") > idx.score("Z1B2C3D4") == 0
+
+
+def test_index_json_roundtrip_keeps_scores():
+    idx = OemFormatIndex()
+    idx.observe_abcp(_abcp())
+    clone = OemFormatIndex.from_json(idx.to_json())
+    for tok in ("5QM411999X", "A0004201720", "ZZZ123"):
+        assert clone.score(tok) == idx.score(tok)
+    assert len(clone) == len(idx) == 2
+
+
+def test_extract_oem_prefers_known_format_over_length():
+    text = "номер 1234ABCDEFGH или 5QM411105R"
+    # Без индекса — побеждает более длинный токен.
+    assert extract_oem_from_text(text) == "1234ABCDEFGH"
+
+    get_oem_index().observe_abcp(_abcp())
+    assert extract_oem_from_text(text) == "5QM411105R"
+
+
+def test_get_oem_index_loads_file_once(tmp_path, monkeypatch):
+    idx = OemFormatIndex()
+    idx.observe_abcp(_abcp())
+    path = tmp_path / "oem_index.json"
+    idx.save(path)
+
+    monkeypatch.setenv("HF_CORTEX_OEM_INDEX_FILE", str(path))
+    reset_oem_index()
+    loaded = get_oem_index()
+    assert loaded is get_oem_index()
+    assert loaded.match("5QM411999X")[0] is True
+
+
+def test_learned_index_is_persisted_throttled_and_on_shutdown(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import app as app_module
+
+    path = tmp_path / "oem_index.json"
+    monkeypatch.setenv("HF_CORTEX_OEM_INDEX_FILE", str(path))
+    monkeypatch.setenv("HF_CORTEX_OEM_INDEX_SAVE_S", "3600")
+    reset_oem_index()
+    assert persist_oem_index(force=True) is False  # индекс ещё не загружен
+
+    get_oem_index().observe_abcp(_abcp())
+    assert persist_oem_index() is False and not path.exists()  # интервал не прошёл
+    monkeypatch.setenv("HF_CORTEX_OEM_INDEX_SAVE_S", "0")
+    assert persist_oem_index() is True
+    assert persist_oem_index() is False  # нового ничего
+
+    # остановка приложения сохраняет то, что выучено с прошлого сохранения
+    monkeypatch.setenv("HF_CORTEX_OEM_INDEX_SAVE_S", "3600")
+    with TestClient(app_module.app):
+        get_oem_index().observe_abcp({"4N0907998": {"offers": [{"brand": "VAG", "price": 1}]}})
+    reset_oem_index()
+    assert get_oem_index().match("4N0907998")[0] is True
+    assert len(get_oem_index()) == 3
+
+
+def test_repeated_observations_do_not_dirty_or_inflate_index(tmp_path, monkeypatch):
+    path = tmp_path / "oem_index.json"
+    monkeypatch.setenv("HF_CORTEX_OEM_INDEX_FILE", str(path))
+    monkeypatch.setenv("HF_CORTEX_OEM_INDEX_SAVE_S", "0")
+    reset_oem_index()
+    idx = get_oem_index()
+    assert idx.observe_abcp(_abcp()) == 2
+    assert persist_oem_index() is True
+    saved = path.read_text(encoding="utf-8")
+
+    # тот же ABCP на каждом ходу диалога: индекс не меняется, файл не переписывается
+    for _ in range(5):
+        assert idx.observe_abcp(_abcp()) == 0
+        assert persist_oem_index() is False
+    assert idx.to_json() == OemFormatIndex.from_json(json.loads(saved)).to_json()
+
+    # новый бренд для известного формата — это новое знание
+    assert idx.add("5QM411105T", "SKODA") is True
+    assert persist_oem_index() is True
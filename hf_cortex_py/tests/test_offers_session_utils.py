@@ -1,14 +1,26 @@
 from core.models import Offer
 from flows.lead_sales.offers import (
+    OfferRow,
+    as_offer_row,
+    build_canonical_offers,
     build_pricing_reply,
+    canonical_from_ordered,
     format_price_rub,
     group_offers_by_oem,
     order_oems,
+    pricing_template,
     reassign_ids_in_order,
+    render_pricing_reply,
     sanitize_chosen_offer_id,
     valid_offer_ids,
 )
-from flows.lead_sales.session_utils import get_session_choice, get_session_int, get_session_str
+from flows.lead_sales.session_utils import (
+    SessionView,
+    get_session_choice,
+    get_session_int,
+    get_session_str,
+    get_stage,
+)
 
 
 def test_session_utils_str_and_int_resolution_paths():
@@ -97,3 +109,119 @@ def test_sanitize_chosen_offer_id_variants():
 
     s, d = sanitize_chosen_offer_id({"id": 1}, valid)
     assert s is None and "chosen_offer_id_invalid_type" in d
+
+
+def test_session_view_matches_dict_helpers():
+    snap = {
+        "stage": "NEW",
+        "phone": "  ",
+        "state": {
+            "stage": "address",
+            "phone": " +79990001122 ",
+            "chosen_offer_id": ["2", 1],
+            "oems": [" abc123 ", "x"],
+            "lead": {"client_name": "Иванов Иван Иванович", "CLIENT_ADDRESS": "СПб, Невский 1"},
+            "delivery_address": "Москва, Ленина 2",
+        },
+        "lead": {"address": "Казань, Баумана 15"},
+    }
+    view = SessionView(snap)
+    assert view.stage == get_stage(snap) == "ADDRESS"
+    assert view.phone == get_session_str(snap, "phone") == "+79990001122"
+    assert view.client_name == get_session_str(snap, "client_name")
+    # первый алиас "address" найден на уровне lead — он важнее CLIENT_ADDRESS/delivery_address
+    assert view.address == "Казань, Баумана 15"
+    assert view.chosen_offer_id == get_session_choice(snap, "chosen_offer_id") == [1, 2]
+    assert view.state_oem == "ABC123"
+    assert view.facts is None
+    assert not hasattr(view, "__dict__")
+
+    empty = SessionView(None)
+    assert empty.stage == "NEW"
+    assert empty.address is None and empty.state_oem is None
+
+
+def test_canonical_offers_are_built_once_without_mutating_inputs():
+    from core.models import CortexResult
+    from flows.lead_sales.hardening import apply_strict_funnel
+
+    raw = [
+        Offer(id=1, oem="A", brand="BR", price=900, delivery_days=3),
+        Offer(id=2, oem="B", brand="BR", price=100, delivery_days=1),
+        Offer(id=3, oem="B", brand="BR", price=50, delivery_days=9),
+    ]
+    canonical = build_canonical_offers("B", raw)
+    assert canonical.oems == ("B", "A")
+    assert [(o.id, o.oem, o.price) for o in canonical.offers] == [(1, "B", 50), (2, "B", 100), (3, "A", 900)]
+    assert [o.id for o in raw] == [1, 2, 3]  # вход не перенумерован
+
+    result = CortexResult(action="reply", stage="PRICING", reply="", offers=canonical.to_offers())
+    out = apply_strict_funnel(result, stage_in="PRICING", msg_text="вариант 2, 3 шт", session_snapshot={})
+    assert out.offers[1].quantity == 3
+    assert canonical.offers[1].quantity == 1  # канон не тронут hardening-ом
+
+    ordered = canonical_from_ordered("a", [Offer(id=1, oem="b", price=1), Offer(id=2, oem="A", price=2)])
+    assert ordered.oems == ("A", "B")
+
+
+def test_offer_row_is_interchangeable_with_offer():
+    offers = [
+        Offer(id=7, oem="A", brand="BR", price=900, delivery_days=3, source="s1"),
+        Offer(id=8, oem="B", price=100),
+    ]
+    rows = [as_offer_row(o) for o in offers]
+    assert all(isinstance(r, OfferRow) for r in rows)
+    assert [r.to_dict() for r in rows] == [o.model_dump() for o in offers]
+    assert [r.to_offer() for r in rows] == offers
+
+    from_rows = build_canonical_offers("B", rows)
+    from_offers = build_canonical_offers("B", offers)
+    assert from_rows == from_offers
+    assert [(o.id, o.oem) for o in from_rows.offers] == [(1, "B"), (2, "A")]
+    assert [r.id for r in rows] == [7, 8]
+
+    # публичные обёртки по-прежнему отдают Offer; перенумерация сохраняет тип входа
+    _, _, offs = build_pricing_reply("B", rows)
+    assert all(isinstance(o, Offer) for o in offs)
+    assert from_rows.to_offers() == offs
+    renum = reassign_ids_in_order(group_offers_by_oem(offers), ["B", "A"])
+    assert all(isinstance(o, Offer) for o in renum)
+
+
+def test_render_pricing_reply_templates_and_channels():
+    rows = [
+        OfferRow(1, "B", "BR", None, 1500.0),
+        OfferRow(2, "A", None, None, 10600.4, delivery_days=5),
+        OfferRow(3, "B", "X", None, 999.5, delivery_days=0),
+    ]
+    canonical = build_canonical_offers("A", rows)
+    expected = "\n".join(
+        [
+            "Добрый день! По номеру A есть варианты:",
+            "Вариант 1 — OEM A за 10 600 ₽, срок до 5 раб. дней.",
+            "",
+            "Есть оригинальная замена B:",
+            "Вариант 2 — X B за 1 000 ₽, срок уточним.",
+            "Вариант 3 — BR B за 1 500 ₽, срок уточним.",
+            "",
+            "Выберите, пожалуйста, подходящий вариант (можно несколько).",
+        ]
+    )
+    assert render_pricing_reply("A", canonical) == expected
+    assert render_pricing_reply("A", canonical, "unknown") == expected
+    assert render_pricing_reply("A", canonical, " Telegram ").splitlines()[1] == "1. OEM A — 10 600 ₽, до 5 раб. дн."
+    assert "1 500 руб." in render_pricing_reply("A", canonical, "drom")
+    assert pricing_template("AVITO") is pricing_template("avito")
+
+    # офферы Node вперемешку по OEM: группировка по порядку canonical.oems как раньше
+    mixed = canonical_from_ordered("B", [rows[1], rows[0], rows[2]])
+    lines = render_pricing_reply("B", mixed).splitlines()
+    assert lines[:3] == [
+        "Добрый день! По номеру B есть варианты:",
+        "Вариант 1 — BR B за 1 500 ₽, срок уточним.",
+        "Вариант 3 — X B за 1 000 ₽, срок уточним.",
+    ]
+    assert lines[4] == "Есть оригинальная замена A:"
+
+    assert render_pricing_reply(None, build_canonical_offers(None, [])) == pricing_template().footer
+
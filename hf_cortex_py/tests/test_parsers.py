@@ -1,10 +1,13 @@
-from core.models import CortexResult, Offer
+from core.models import ContactUpdate, CortexResult, Offer
 
 from flows.lead_sales.hardening import apply_strict_funnel
 from flows.lead_sales.parsers.address import extract_address_or_pickup_raw
 from flows.lead_sales.parsers.choice import extract_offer_choice_from_text
+from flows.lead_sales.parsers.fio import extract_full_fio_strict
+from core.fio_lexicon import is_first_name, is_patronymic, looks_like_surname
 from flows.lead_sales.parsers.phone import extract_phone_from_text
 from flows.lead_sales.parsers.quantity import extract_quantity_from_text
+from flows.lead_sales.session_utils import as_session_view
 
 
 def test_address_pickup():
@@ -27,6 +30,30 @@ def test_address_can_capture_real_address_even_if_phone_present():
     assert extract_address_or_pickup_raw(txt) == txt
 
 
+def test_fio_lexicon_lookups():
+    assert is_first_name("Пётр") and is_first_name("анна")
+    assert is_patronymic("Ильич") and is_patronymic("Михайловна") and is_patronymic("Сергеевич")
+    assert not is_patronymic("кирпич") and not is_patronymic("нужна")
+    assert looks_like_surname("Смирнова") and not looks_like_surname("привезите")
+
+
+def test_fio_strict_uses_lexicon_for_weak_endings_and_name_first_order():
+    assert extract_full_fio_strict("Петров Пётр Ильич") == ("Петров", "Пётр", "Ильич", "Петров Пётр Ильич")
+    assert extract_full_fio_strict("Иван Иванович Иванов +79990001122") == (
+        "Иванов",
+        "Иван",
+        "Иванович",
+        "Иванов Иван Иванович",
+    )
+    assert extract_full_fio_strict("заказ на Иванов Иван Иванович")[3] == "Иванов Иван Иванович"
+
+    # слабое окончание "-на" без имени — не отчество
+    assert extract_full_fio_strict("Здравствуйте деталь нужна") is None
+    assert extract_full_fio_strict("Сергей Иванович привезите") is None
+    # имя вне лексикона, полное окончание отчества
+    assert extract_full_fio_strict("Ахмед Рашидович Алиев")[3] == "Алиев Ахмед Рашидович"
+
+
 def test_choice_and_qty_do_not_conflict():
     valid = [1, 2, 3]
     txt = "первый вариант 2 шт"
@@ -81,6 +108,29 @@ def test_strict_funnel_applies_quantity_to_chosen_offer():
     assert (out.meta or {}).get("requested_qty") == 3
 
 
+def test_strict_funnel_merges_confirmed_contact_into_llm_contact_update():
+    result = CortexResult(
+        action="reply",
+        stage="CONTACT",
+        reply="",
+        offers=[Offer(id=1, price=1.0)],
+        contact_update=ContactUpdate(name="Ваня", phone="123", address="Москва"),
+    )
+
+    out = apply_strict_funnel(
+        result,
+        stage_in="CONTACT",
+        msg_text="Иванов Иван Иванович +7 988 994-57-91",
+        session_snapshot={},
+    )
+
+    cu = out.contact_update
+    assert cu is not None
+    assert (cu.last_name, cu.name, cu.second_name) == ("Иванов", "Иван", "Иванович")
+    assert cu.phone == out.update_lead_fields["PHONE"]
+    assert cu.address == "Москва"
+
+
 def test_strict_funnel_moves_to_final_on_address_when_contact_ready():
     # Если на входе ADDRESS и уже есть ФИО/телефон в сессии, а в сообщении адрес —
     # hardening должен перевести в FINAL.
@@ -184,3 +234,134 @@ def test_strict_funnel_keeps_handover_operator_stage():
     assert out.stage == "HARD_PICK"
     assert out.action == "handover_operator"
     assert out.need_operator is True
+
+
+def test_address_gazetteer_city_street_number():
+    from flows.lead_sales.parsers.gazetteer import MEMORY_BUDGET_BYTES, gazetteer_memory_bytes
+
+    assert extract_address_or_pickup_raw("Казань Баумана 15") == "Казань Баумана 15"
+    assert extract_address_or_pickup_raw("Нижний Новгород Ленина 5") == "Нижний Новгород Ленина 5"
+    assert extract_address_or_pickup_raw("Москва бульвар Яна Райниса 7") is not None
+    # город есть, но это количество/товар, а не дом
+    assert extract_address_or_pickup_raw("в Казань 2 шт") is None
+    assert extract_address_or_pickup_raw("Казань нужна запчасть 15") is None
+    assert extract_address_or_pickup_raw("Королёв Иван Иванович +79990001122") is None
+    # город + модель машины + год — не улица и дом
+    assert extract_address_or_pickup_raw("Самара Лада Веста 2019") is None
+    assert extract_address_or_pickup_raw("Тула Приора 2010") is None
+    assert extract_address_or_pickup_raw("Москва Камри 40 2008") is None
+    assert gazetteer_memory_bytes() < MEMORY_BUDGET_BYTES
+
+
+def _node_session_after(result, stage):
+    """Сессия, как её сохраняет Node после хода (shared/session.js: applyLlmToSession)."""
+    state = {"stage": stage, "client_name": result.client_name, "cortex_facts": result.meta["facts"]}
+    if result.chosen_offer_id:
+        state["chosen_offer_id"] = result.chosen_offer_id
+    session = {"state": state}
+    if result.contact_update is not None and result.contact_update.phone:
+        session["phone"] = result.contact_update.phone
+    return session
+
+
+def test_strict_funnel_does_not_take_car_description_for_address():
+    contact = apply_strict_funnel(
+        CortexResult(action="reply", stage="CONTACT", reply="", offers=[Offer(id=1, price=1.0)], chosen_offer_id=1),
+        stage_in="CONTACT",
+        msg_text="Иванов Иван Иванович +7 999 123-45-67",
+        session_snapshot={},
+    )
+    session = _node_session_after(contact, "ADDRESS")
+
+    result = apply_strict_funnel(
+        CortexResult(action="reply", stage="ADDRESS", reply="", offers=[Offer(id=1, price=1.0)]),
+        stage_in="ADDRESS",
+        msg_text="Самара Лада Веста 2019",
+        session_snapshot=session,
+    )
+    assert result.stage == "ADDRESS"
+    assert "DELIVERY_ADDRESS" not in result.update_lead_fields
+    assert result.meta["facts"]["address"] is None
+
+
+def test_strict_funnel_emits_facts_and_trusts_them_on_next_turn():
+    from flows.lead_sales.facts import read_session_facts
+
+    first = apply_strict_funnel(
+        CortexResult(action="reply", stage="CONTACT", reply="", offers=[Offer(id=1, price=1.0)], chosen_offer_id=1),
+        stage_in="CONTACT",
+        msg_text="Иванов Иван Иванович +7 999 123-45-67",
+        session_snapshot={},
+    )
+    facts = first.meta["facts"]
+    assert facts["v"] == 1
+    assert facts["fio"] == ["Иванов", "Иван", "Иванович", "Иванов Иван Иванович"]
+    assert facts["phone"] == "+79991234567"
+    assert facts["address"] is None
+    assert facts["chosen_offer_id"] == 1
+    assert first.stage == "ADDRESS"
+
+    # Следующий ход: факты совпадают с сессией — ФИО берётся из них без повторного разбора.
+    session = _node_session_after(first, "ADDRESS")
+    assert read_session_facts(session).phone == "+79991234567"
+    assert as_session_view(session).facts.fio == tuple(facts["fio"])
+    second = apply_strict_funnel(
+        CortexResult(action="reply", stage="ADDRESS", reply="", offers=[Offer(id=1, price=1.0)]),
+        stage_in="ADDRESS",
+        msg_text="Казань Баумана 15",
+        session_snapshot=session,
+    )
+    assert second.stage == "FINAL"
+    assert second.chosen_offer_id == 1
+    assert second.update_lead_fields["LAST_NAME"] == "Иванов"
+    assert second.meta["facts"]["address"] == "Казань Баумана 15"
+
+    # Чужая версия блока игнорируется
+    assert read_session_facts({"state": {"cortex_facts": {**facts, "v": 99}}}) is None
+
+
+def test_strict_funnel_live_session_wins_over_stale_facts():
+    first = apply_strict_funnel(
+        CortexResult(action="reply", stage="CONTACT", reply="", offers=[Offer(id=1, price=1.0)], chosen_offer_id=1),
+        stage_in="CONTACT",
+        msg_text="Иванов Иван Иванович +7 999 123-45-67",
+        session_snapshot={},
+    )
+    stale = {**first.meta["facts"], "address": "Казань Баумана 15"}
+
+    # Менеджер поправил ФИО, телефон и выбор; cortex_facts Node не чистит.
+    edited = {
+        "phone": "+79990001122",
+        "state": {
+            "stage": "ADDRESS",
+            "client_name": "Петров Пётр Петрович",
+            "chosen_offer_id": 2,
+            "cortex_facts": stale,
+        },
+    }
+    assert as_session_view(edited).facts is None
+    offers = [Offer(id=1, price=1.0), Offer(id=2, price=2.0)]
+    result = apply_strict_funnel(
+        CortexResult(action="reply", stage="ADDRESS", reply="", offers=offers),
+        stage_in="ADDRESS",
+        msg_text="да",
+        session_snapshot=edited,
+    )
+    assert result.chosen_offer_id == 2
+    assert result.update_lead_fields["LAST_NAME"] == "Петров"
+    assert result.update_lead_fields["PHONE"] == "+79990001122"
+    assert "DELIVERY_ADDRESS" not in result.update_lead_fields
+    assert result.stage == "ADDRESS"
+
+    # Сброс сессии / новый лид: живых полей нет — устаревшие факты не действуют.
+    reset = {"state": {"stage": "NEW", "cortex_facts": stale}}
+    assert as_session_view(reset).facts is None
+    result = apply_strict_funnel(
+        CortexResult(action="reply", stage="CONTACT", reply="", offers=offers),
+        stage_in="CONTACT",
+        msg_text="привет",
+        session_snapshot=reset,
+    )
+    assert result.chosen_offer_id is None
+    assert not {"LAST_NAME", "PHONE", "DELIVERY_ADDRESS"} & set(result.update_lead_fields)
+    assert result.stage == "CONTACT"
@@ -0,0 +1,40 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from flows.lead_sales.parsers.batch import classify_policy_batch, extract_oem_batch, extract_phone_batch
+from flows.lead_sales.parsers.oem import extract_oem_from_text
+from flows.lead_sales.parsers.phone import extract_phone_from_text
+from flows.lead_sales.policy_engine import classify_policy_text
+
+TEXTS = [
+    "добрый день 5QM411105R сможет привезти?",
+    "Иванов Иван Иванович +79990001122",
+    "Самовывоз",
+    "Самовывоз",
+    "VIN WDB2110421A123456",
+    "Добрый день, номер заказа 102123458, подскажите статус",
+    "Не актуально, спасибо",
+    "8 999 000 11 22",
+    "",
+    None,
+]
+
+
+def test_batch_results_match_single_calls():
+    assert extract_oem_batch(TEXTS) == [extract_oem_from_text(t) for t in TEXTS]
+    assert extract_phone_batch(TEXTS) == [extract_phone_from_text(t) for t in TEXTS]
+    assert classify_policy_batch(TEXTS) == [classify_policy_text(t) if t else None for t in TEXTS]
+
+
+def test_classify_policy_batch_intents():
+    out = classify_policy_batch(TEXTS)
+    assert out[0] is None
+    assert out[4] == "VIN_HARD_PICK"
+    assert out[5] == "ORDER_STATUS"
+    assert out[6] == "LOST"
+
+
+def test_batch_with_process_pool_keeps_order():
+    texts = TEXTS * 30
+    with ProcessPoolExecutor(max_workers=2) as ex:
+        assert extract_oem_batch(texts, executor=ex, chunk_size=7) == extract_oem_batch(texts)
+        assert classify_policy_batch(iter(texts), executor=ex, chunk_size=7) == classify_policy_batch(texts)
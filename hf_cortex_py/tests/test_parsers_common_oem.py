@@ -1,5 +1,5 @@
 from flows.lead_sales.parsers.common import get_msg_text, normalize_text
-from flows.lead_sales.parsers.oem import extract_oem_from_text, looks_like_vin
+from flows.lead_sales.parsers.oem import assemble_separated_oem_candidates, extract_oem_from_text, looks_like_vin
 
 
 def test_get_msg_text_reads_top_level_and_nested_shapes():
@@ -52,3 +52,33 @@ def test_extract_oem_from_text_ignores_url_and_order_number_context():
 def test_extract_oem_from_text_ignores_pure_word_tokens():
     assert extract_oem_from_text("LFV3B20V0P3507500 Volkswagen Talagon") is None
     assert extract_oem_from_text("Volkswagen Talagon") is None
+
+
+def test_extract_oem_joins_separated_groups():
+    assert extract_oem_from_text("нужен 4N0 907 998") == "4N0907998"
+    assert extract_oem_from_text("A 000 420 17 20 есть?") == "A0004201720"
+    assert extract_oem_from_text("4N0-907-998") == "4N0907998"
+    assert extract_oem_from_text("VAG 4N0.907.998") == "4N0907998"
+    # цельный токен важнее склейки, "2 шт" к нему не приклеивается
+    assert extract_oem_from_text("5QM411105R 2 шт") == "5QM411105R"
+
+
+def test_separated_join_guards_phone_date_vin_and_order_number():
+    assert extract_oem_from_text("8 999 000 11 22") is None
+    assert extract_oem_from_text("+7 999 000 11 22") is None
+    assert extract_oem_from_text("приеду 05.01.2026") is None
+    assert extract_oem_from_text("цена 1.500.000") is None
+    assert extract_oem_from_text("WDB 2110 4 21A12 3456") is None  # VIN после склейки
+    assert extract_oem_from_text("номер заказа 102 123 458") is None
+    assert assemble_separated_oem_candidates("давайте вариант 3") == []
+
+
+def test_separated_join_skips_car_descriptions():
+    # модель + кузов + год / объём двигателя — не OEM
+    assert extract_oem_from_text("Нужны колодки на Audi A6 C7 2012 г") is None
+    assert extract_oem_from_text("BMW X5 E70 3.0d 2008 года") is None
+    assert extract_oem_from_text("Mercedes W211 E 320 CDI 2005") is None
+    assert extract_oem_from_text("Колодки на W211 E 320 CDI") is None
+    # в длинной реплике склейка — только после подсказки
+    assert extract_oem_from_text("Здравствуйте, есть ли у вас в наличии на складе 4N0 907 998 для Audi") is None
+    assert extract_oem_from_text("Добрый день, нужны колодки, артикул 4N0 907 998") == "4N0907998"
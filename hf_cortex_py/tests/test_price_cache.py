@@ -0,0 +1,96 @@
+from fastapi.testclient import TestClient
+
+import app as app_module
+from core.price_cache import FRESH, MISS, STALE, AbcpPriceCache, get_price_cache, parse_supplier_ttl
+from core.state import MemoryStateBackend, SqliteStateBackend
+
+URL = "/api/hf-cortex/abcp_cache/"
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeAbcp:
+    """Локальный ABCP: ответ на запрос OEM в формате searchManyOEMs + счётчик запросов."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.price = 17700
+
+    def search(self, oem):
+        self.calls += 1
+        row = {"brand": "VAG", "price": self.price, "minDays": 5, "maxDays": 5, "oem": oem, "supplier": "S1"}
+        return {oem: {"offers": [row]}}
+
+
+def _node_lookup(client, abcp, oem):
+    """Как Node: сначала кэш Cortex, ABCP — только на miss или по revalidate."""
+    hit = client.get(URL + oem).json()
+    if hit["status"] == MISS or hit["revalidate"]:
+        fresh = abcp.search(oem)
+        client.put(URL + oem, json={"abcp": fresh})
+        return fresh if hit["status"] == MISS else hit["abcp"]
+    return hit["abcp"]
+
+
+def test_price_cache_fresh_stale_revalidate_with_fake_abcp(monkeypatch):
+    clock = _Clock()
+    cache = AbcpPriceCache(MemoryStateBackend(clock=clock), ttl_s=60, stale_s=120, clock=clock)
+    monkeypatch.setattr(app_module, "HF_CORTEX_TOKEN", None)
+    monkeypatch.setattr(app_module, "get_price_cache", lambda: cache)
+    client = TestClient(app_module.app)
+    abcp = FakeAbcp()
+
+    first = _node_lookup(client, abcp, "5qm411105r")
+    assert abcp.calls == 1
+    for _ in range(3):
+        assert _node_lookup(client, abcp, "5QM411105R") == first
+    assert abcp.calls == 1
+
+    clock.now += 90  # устарело, но в окне stale: отдаём старую цену, обновляет один вызов
+    abcp.price = 18000
+    stale = client.get(URL + "5QM411105R").json()
+    assert (stale["status"], stale["revalidate"]) == (STALE, True)
+    assert client.get(URL + "5QM411105R").json()["revalidate"] is False
+    client.put(URL + "5QM411105R", json={"abcp": abcp.search("5QM411105R")})
+    assert client.get(URL + "5QM411105R").json()["abcp"]["5QM411105R"]["offers"][0]["price"] == 18000
+
+    clock.now += 60 + 120  # за окном stale запись уходит из бэкенда
+    assert client.get(URL + "5QM411105R").json()["status"] == MISS
+
+
+def test_price_cache_supplier_ttl_and_shared_lease(tmp_path):
+    assert parse_supplier_ttl("S1=30, bad, S2=x, =5 ,S3=900") == {"S1": 30.0, "S3": 900.0}
+
+    clock = _Clock()
+    path = str(tmp_path / "state.sqlite3")
+    w1 = AbcpPriceCache(SqliteStateBackend(path, clock=clock), ttl_s=300, supplier_ttl={"S1": 30}, clock=clock)
+    w2 = AbcpPriceCache(SqliteStateBackend(path, clock=clock), ttl_s=300, supplier_ttl={"S1": 30}, clock=clock)
+
+    rows = [{"price": 1, "supplier": "S1"}, {"price": 2, "supplier": "S9"}, {"price": 3}]
+    assert w1.put("A1", {"A1": {"offers": rows}}) == 30
+    assert w1.ttl_for({"A1": {"offers": rows[1:]}}) == 300
+
+    assert w2.get("A1").status == FRESH
+    clock.now += 31
+    # два воркера видят одну запись; в ABCP идёт только один
+    assert [w.get("A1").revalidate for w in (w1, w2, w2)] == [True, False, False]
+    assert w2.get("ZZ").status == MISS
+
+
+def test_price_cache_endpoint_disabled_and_env(monkeypatch):
+    monkeypatch.setattr(app_module, "HF_CORTEX_TOKEN", None)
+    client = TestClient(app_module.app)
+    assert client.get(URL + "A1").status_code == 404
+
+    monkeypatch.setenv("HF_CORTEX_PRICE_CACHE", "1")
+    monkeypatch.setenv("HF_CORTEX_PRICE_CACHE_SUPPLIER_TTL", "S1=15")
+    assert get_price_cache().supplier_ttl == {"S1": 15.0}
+    assert client.get(URL + "A1").json()["status"] == MISS
+    assert client.put(URL + "A1", json={"abcp": {}}).json()["fresh_s"] == 300
+    assert client.put(URL + "A1", json={"offers": []}).status_code == 422
@@ -0,0 +1,102 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from core import request_body
+from core.models import CortexResult
+from core.request_body import ABCP_ROW_FIELDS, compact_abcp, parse_request_body
+
+from benchmarks.corpus import synthetic_abcp
+
+URL = "/api/hf-cortex/lead_sales"
+
+
+def _body(abcp):
+    abcp = dict(abcp)
+    abcp["ODD"] = {"offers": ["junk", {"price": 1, "extra": {"deep": [1, {"x": 2}]}, "brand": "B"}], "note": "n"}
+    abcp["BAD"] = "not-a-pack"
+    return {
+        "app": "t",
+        "flow": "lead_sales",
+        "payload": {
+            "msg": {"text": "x", "offers": [{"price": 1, "deliveryRaw": "keep"}]},
+            "sessionSnapshot": {"state": {"injected_abcp": {"A": {"offers": [{"deliveryRaw": "keep"}]}}}},
+            "injected_abcp": abcp,
+        },
+    }
+
+
+def test_compact_abcp_keeps_only_fields_cortex_reads():
+    body = _body(synthetic_abcp(40, n_oems=2))
+    raw = json.dumps(body, ensure_ascii=False).encode("utf-8")
+
+    full = parse_request_body(raw, compact=False)
+    assert full == body
+
+    compact = compact_abcp(body["payload"]["injected_abcp"])
+    for oem, pack in compact.items():
+        if isinstance(pack, dict):
+            for row in pack["offers"]:
+                assert not isinstance(row, dict) or set(row) <= ABCP_ROW_FIELDS
+    assert compact["ODD"] == {"offers": ["junk", {"price": 1, "brand": "B"}], "note": "n"}
+    # ключи заказа (abcpOrder.js в Node) переживают компактизацию
+    order_row = {"itemKey": "k1", "supplierCode": "77", "code": "c1", "number": "A1", "numberFix": "A1",
+                 "brand": "VAG", "price": 10, "availabilityRaw": "drop"}
+    assert compact_abcp({"A1": {"offers": [order_row]}})["A1"]["offers"] == [
+        {k: v for k, v in order_row.items() if k != "availabilityRaw"}
+    ]
+    assert compact["BAD"] == "not-a-pack"
+
+    expected = dict(body, payload=dict(body["payload"], injected_abcp=compact))
+    assert parse_request_body(raw, compact=True) == expected
+
+    # тот же результат без ijson (json.loads + компактизация)
+    saved = request_body._ijson
+    request_body._ijson = None
+    try:
+        assert parse_request_body(raw, compact=True) == expected
+    finally:
+        request_body._ijson = saved
+
+
+def test_streaming_builder_matches_json_loads():
+    pytest.importorskip("ijson")
+    body = _body(synthetic_abcp(200, n_oems=3))
+    body["payload"]["injected_abcp"]["5Q0411105R"]["offers"][0]["price"] = 1234.5
+    raw = json.dumps(body, ensure_ascii=False).encode("utf-8")
+    parsed = parse_request_body(raw, compact=True)
+    assert parsed["payload"]["injected_abcp"] == compact_abcp(body["payload"]["injected_abcp"])
+    assert parsed["payload"]["msg"] == body["payload"]["msg"]
+    assert isinstance(parsed["payload"]["injected_abcp"]["5Q0411105R"]["offers"][0]["price"], float)
+
+
+def test_endpoint_compact_mode_and_validation_errors(monkeypatch):
+    seen = []
+
+    def fake_flow(msg, session, injected_abcp, payload_offers, channel=None):
+        seen.append(injected_abcp)
+        return CortexResult(action="reply", stage="NEW", reply="ok")
+
+    monkeypatch.setattr(app_module, "run_lead_sales_flow", fake_flow)
+    monkeypatch.setattr(app_module, "HF_CORTEX_TOKEN", None)
+    client = TestClient(app_module.app)
+    body = _body(synthetic_abcp(20, n_oems=1))
+
+    assert client.post(URL, json=body).status_code == 200
+    assert "deliveryRaw" in seen[-1]["5Q0411105R"]["offers"][0]
+
+    monkeypatch.setenv("HF_CORTEX_ABCP_COMPACT", "1")
+    r = client.post(URL, json=body)
+    assert r.status_code == 200
+    assert seen[-1] == compact_abcp(body["payload"]["injected_abcp"])
+    assert r.json()["context"]["injected_abcp"] == seen[-1]
+
+    bad = client.post(URL, content=b'{"app": "t", "flow": ', headers={"content-type": "application/json"})
+    assert bad.status_code == 422
+    assert bad.json()["detail"][0]["type"] == "json_invalid"
+
+    missing = client.post(URL, json={"flow": "lead_sales", "payload": {}})
+    assert missing.status_code == 422
+    assert missing.json()["detail"][0]["loc"] == ["body", "app"]
@@ -0,0 +1,72 @@
+from fastapi.testclient import TestClient
+
+import app as app_module
+from core.models import CortexResult
+from core.session_cache import SessionCache, apply_merge_patch
+
+
+def test_apply_merge_patch_rfc7386():
+    target = {"a": 1, "state": {"stage": "NEW", "oems": ["X"]}, "drop": True}
+    patch = {"state": {"stage": "CONTACT", "oems": ["Y", "Z"]}, "drop": None, "b": {"c": None, "d": 2}}
+    out = apply_merge_patch(target, patch)
+    assert out == {"a": 1, "state": {"stage": "CONTACT", "oems": ["Y", "Z"]}, "b": {"d": 2}}
+    assert target["state"]["stage"] == "NEW"
+
+
+def test_session_cache_lru_ttl_and_version_check():
+    now = [0.0]
+    cache = SessionCache(max_entries=2, ttl_s=10, clock=lambda: now[0])
+
+    assert cache.resolve("d1", version=1, snapshot={"x": 1}) == {"x": 1}
+    assert cache.resolve("d1", version=2, delta={"y": 2}, base_version=1) == {"x": 1, "y": 2}
+    # base_version устарела -> нужен resync
+    assert cache.resolve("d1", version=3, delta={"z": 3}, base_version=1) is None
+
+    cache.put("d2", 1, {})
+    cache.put("d3", 1, {})
+    assert cache.get("d1") is None  # вытеснен по LRU
+    assert len(cache) == 2
+
+    now[0] = 11.0
+    assert cache.get("d2") is None  # истёк TTL
+
+
+def test_endpoint_delta_protocol_and_resync(monkeypatch):
+    seen = []
+
+    def fake_flow(msg, session, injected_abcp, payload_offers, channel=None):
+        seen.append(session)
+        return CortexResult(action="reply", stage="NEW", reply="ok")
+
+    monkeypatch.setattr(app_module, "run_lead_sales_flow", fake_flow)
+    monkeypatch.setattr(app_module, "HF_CORTEX_TOKEN", None)
+    client = TestClient(app_module.app)
+
+    def post(payload):
+        return client.post("/api/hf-cortex/lead_sales", json={"app": "t", "flow": "lead_sales", "payload": payload})
+
+    full = {"state": {"stage": "NEW", "offers": [{"id": 1}]}, "leadId": 7}
+    r1 = post({"msg": {"text": "a"}, "sessionKey": "p:1", "sessionVersion": 1, "sessionSnapshot": full})
+    assert r1.status_code == 200
+    assert "sessionSnapshot" not in r1.json()["context"]
+    assert r1.json()["context"]["sessionVersion"] == 1
+
+    r2 = post(
+        {
+            "msg": {"text": "b"},
+            "sessionKey": "p:1",
+            "sessionVersion": 2,
+            "sessionBaseVersion": 1,
+            "sessionDelta": {"state": {"stage": "CONTACT"}},
+        }
+    )
+    assert r2.status_code == 200
+    assert seen[-1] == {"state": {"stage": "CONTACT", "offers": [{"id": 1}]}, "leadId": 7}
+
+    r3 = post({"msg": {"text": "c"}, "sessionKey": "p:1", "sessionVersion": 3, "sessionBaseVersion": 1, "sessionDelta": {}})
+    assert r3.status_code == 409
+    assert r3.json()["detail"] == "session_resync_required"
+
+    # без версии — прежний контракт (эхо снимка)
+    r4 = post({"msg": {"text": "d"}, "sessionSnapshot": full})
+    assert r4.json()["context"]["sessionSnapshot"] == full
@@ -0,0 +1,160 @@
+import os
+import threading
+
+import pytest
+
+from core.session_cache import SessionCache, get_session_cache
+from core.state import (
+    MemoryStateBackend,
+    RedisStateBackend,
+    SqliteStateBackend,
+    StateBackend,
+    get_state_backend,
+    is_shared_state_backend,
+)
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _memory(tmp_path, clock):
+    return MemoryStateBackend(clock=clock)
+
+
+def _sqlite(tmp_path, clock):
+    return SqliteStateBackend(str(tmp_path / "state.sqlite3"), clock=clock)
+
+
+@pytest.mark.parametrize("factory", [_memory, _sqlite], ids=["memory", "sqlite"])
+def test_state_backend_contract(tmp_path, factory):
+    clock = _Clock()
+    backend = factory(tmp_path, clock)
+
+    assert backend.get("k") is None
+    backend.set("k", b"v1", ttl_s=10)
+    assert backend.get("k") == b"v1"
+    assert backend.ttl("k") == pytest.approx(10)
+
+    # CAS: только при совпадении ожидаемого значения; None — "ключа нет"
+    assert backend.cas("k", b"other", b"v2") is False
+    assert backend.cas("k", b"v1", b"v2", ttl_s=5) is True
+    assert backend.get("k") == b"v2"
+    assert backend.cas("new", None, b"x") is True
+    assert backend.cas("new", None, b"y") is False
+    assert backend.ttl("new") is None
+
+    clock.now += 6
+    assert backend.get("k") is None
+    assert backend.cas("k", None, b"again") is True
+
+    backend.set_json("j", {"a": [1, "б"]})
+    assert backend.get_json("j") == {"a": [1, "б"]}
+    backend.delete("j")
+    assert backend.get_json("j") is None
+    backend.close()
+
+
+def test_memory_backend_evicts_by_byte_budget():
+    backend = MemoryStateBackend(max_bytes=1000)
+    for i in range(5):
+        backend.set(f"k{i}", b"x" * 300)
+    assert backend.size_bytes <= 1000
+    assert backend.get("k0") is None and backend.get("k4") == b"x" * 300
+
+    backend.set("k4", b"y")  # перезапись пересчитывает размер
+    backend.delete("k3")
+    assert backend.size_bytes == sum(len(k) + len(backend.get(k)) for k in ("k2", "k4"))
+
+
+def test_sqlite_backend_purges_keys_that_are_never_read_again(tmp_path):
+    clock = _Clock()
+    backend = SqliteStateBackend(str(tmp_path / "state.sqlite3"), clock=clock, purge_interval_s=60)
+    for i in range(50):
+        backend.set(f"idem:{i}", b"reply", ttl_s=10)
+    backend.set("keep", b"v")
+    assert backend.cas("lease", None, b"x", ttl_s=100) is True
+
+    def rows() -> int:
+        return backend._conn().execute("SELECT COUNT(*) FROM kv").fetchone()[0]
+
+    clock.now += 30
+    backend.set("other", b"v", ttl_s=10)
+    assert rows() == 53  # интервал очистки ещё не прошёл
+
+    clock.now += 31  # idem:* и other просрочены, их больше никто не читает
+    backend.set("trigger", b"v")
+    assert rows() == 3
+    assert backend.get("keep") == b"v" and backend.get("lease") == b"x"
+    assert backend.purge_expired() == 0
+    backend.close()
+
+
+def test_state_backend_is_abstract():
+    with pytest.raises(TypeError):
+        StateBackend()
+
+    class Partial(StateBackend):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_sqlite_backend_cas_is_atomic_across_threads(tmp_path):
+    backend = SqliteStateBackend(str(tmp_path / "state.sqlite3"))
+    backend.set("counter", b"0")
+
+    def worker() -> None:
+        for _ in range(20):
+            while True:
+                cur = backend.get("counter")
+                if backend.cas("counter", cur, str(int(cur) + 1).encode()):
+                    break
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert backend.get("counter") == b"80"
+
+
+def test_session_cache_is_shared_through_sqlite_backend(tmp_path, monkeypatch):
+    monkeypatch.setenv("HF_CORTEX_STATE_BACKEND", "sqlite")
+    monkeypatch.setenv("HF_CORTEX_STATE_URL", str(tmp_path / "shared.sqlite3"))
+    assert is_shared_state_backend()
+
+    # два "воркера": общий файл, разные экземпляры кэша
+    worker_a = get_session_cache()
+    worker_b = SessionCache(backend=SqliteStateBackend(str(tmp_path / "shared.sqlite3")))
+    worker_b_prefixed = SessionCache(backend=get_state_backend())
+
+    worker_a.resolve("p:1", version=1, snapshot={"state": {"stage": "NEW"}})
+    merged = worker_b_prefixed.resolve("p:1", version=2, delta={"phone": "+7"}, base_version=1)
+    assert merged == {"state": {"stage": "NEW"}, "phone": "+7"}
+    assert worker_a.get("p:1") == (2, merged)
+    # без префикса ключи не пересекаются
+    assert worker_b.get("p:1") is None
+
+
+def test_redis_backend_contract():
+    pytest.importorskip("redis")
+    url = os.getenv("HF_CORTEX_TEST_REDIS_URL")
+    if not url:
+        pytest.skip("HF_CORTEX_TEST_REDIS_URL is not set")
+
+    backend = RedisStateBackend(url)
+    key = "hf_cortex_test:cas"
+    backend.delete(key)
+    assert backend.cas(key, None, b"a", ttl_s=5) is True
+    assert backend.cas(key, b"x", b"b") is False
+    assert backend.cas(key, b"a", b"b") is True
+    assert backend.get(key) == b"b"
+    backend.delete(key)
+    backend.close()
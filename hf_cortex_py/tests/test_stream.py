@@ -0,0 +1,88 @@
+import json
+
+from fastapi.testclient import TestClient
+
+import app as app_module
+import flows.lead_sales.flow as flow_module
+from core.models import CortexResult
+
+from benchmarks.corpus import synthetic_abcp
+
+URL = "/api/hf-cortex/lead_sales/stream"
+
+
+def _events(resp):
+    return [json.loads(line) for line in resp.text.splitlines() if line]
+
+
+def test_stream_short_path_decision_is_final(monkeypatch):
+    monkeypatch.setenv("HF_CORTEX_ABCP_CACHE_SIZE", "0")
+    monkeypatch.setattr(app_module, "HF_CORTEX_TOKEN", None)
+    client = TestClient(app_module.app)
+    abcp = synthetic_abcp(20, n_oems=1)
+    req = {"app": "t", "flow": "lead_sales", "payload": {"msg": {"text": next(iter(abcp))}, "injected_abcp": abcp}}
+
+    r = client.post(URL, json=req)
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    decision, result = _events(r)
+    assert decision["event"] == "decision" and decision["final"] is True
+    assert decision["stage"] == "PRICING" and decision["decision"]["offers"]
+    assert result["event"] == "result" and result["decision_changed"] == []
+    assert {k: result["result"][k] for k in flow_module.DECISION_FIELDS} == decision["decision"]
+
+    # итог потока совпадает с обычным эндпоинтом
+    plain = client.post("/api/hf-cortex/lead_sales", json=req).json()
+    assert result["result"] == plain["result"] and result["context"] == plain["context"]
+
+
+def test_stream_llm_path_reports_changed_decision_fields(monkeypatch):
+    monkeypatch.setattr(app_module, "HF_CORTEX_TOKEN", None)
+    calls = []
+
+    def fake_llm(cortex_request):
+        calls.append(cortex_request)
+        return CortexResult(stage="NEW", reply="Уточните, пожалуйста, номер.", intent="CLARIFY_NUMBER_TYPE")
+
+    monkeypatch.setattr(flow_module, "call_llm_with_cortex_request", fake_llm)
+    client = TestClient(app_module.app)
+    req = {"app": "t", "flow": "lead_sales", "payload": {"msg": {"text": "здравствуйте"}, "sessionSnapshot": {}}}
+
+    decision, result = _events(client.post(URL, json=req))
+    assert len(calls) == 1  # LLM вызван один раз, решение — без него
+    assert decision["final"] is False and decision["decision"]["intent"] is None
+    assert result["result"]["reply"] == "Уточните, пожалуйста, номер."
+    assert "intent" in result["decision_changed"] and "offers" not in result["decision_changed"]
+
+    sse = client.post(URL, json=req, headers={"accept": "text/event-stream"})
+    assert sse.headers["content-type"].startswith("text/event-stream")
+    blocks = [b for b in sse.text.split("\n\n") if b]
+    assert [b.split("\n", 1)[0] for b in blocks] == ["event: decision", "event: result"]
+    assert json.loads(blocks[1].split("data: ", 1)[1])["result"]["intent"] == "CLARIFY_NUMBER_TYPE"
+
+    # Idempotency-Key: повтор — только сохранённый result, LLM не вызывается
+    headers = {"idempotency-key": "p:d:m:first"}
+    first = client.post(URL, json=req, headers=headers)
+    replay = client.post(URL, json=req, headers=headers)
+    assert len(calls) == 3
+    assert [e["event"] for e in _events(replay)] == ["result"]
+    assert replay.headers["idempotent-replay"] == "true" and "idempotent-replay" not in first.headers
+    assert _events(replay)[0]["result"] == _events(first)[1]["result"]
+
+
+def test_stream_errors_before_first_frame_are_plain_json(monkeypatch):
+    monkeypatch.setattr(app_module, "HF_CORTEX_TOKEN", "secret")
+    client = TestClient(app_module.app)
+    req = {
+        "app": "t",
+        "flow": "lead_sales",
+        "payload": {"msg": {"text": "x"}, "sessionKey": "s1", "sessionVersion": 2, "sessionDelta": {"a": 1}},
+    }
+    assert client.post(URL, json=req).status_code == 401
+
+    resync = client.post(URL, json=req, headers={"x-hf-cortex-token": "secret"})
+    assert resync.status_code == 409
+    assert resync.json()["detail"] == app_module.SESSION_RESYNC_REQUIRED
+
+    req["flow"] = "other"
+    assert client.post(URL, json=req, headers={"x-hf-cortex-token": "secret"}).status_code == 400
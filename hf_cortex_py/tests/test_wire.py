@@ -0,0 +1,81 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from core import wire
+from core.models import CortexResult
+from core.request_body import compact_abcp
+from core.wire import MSGPACK_MEDIA_TYPE, prefers_msgpack
+from flows.lead_sales import flow as lead_sales_flow
+
+from benchmarks.corpus import load_trace_requests, synthetic_abcp
+
+msgpack = pytest.importorskip("msgpack")
+
+URL = "/api/hf-cortex/lead_sales"
+MSGPACK_HEADERS = {"content-type": MSGPACK_MEDIA_TYPE, "accept": MSGPACK_MEDIA_TYPE}
+
+
+def _strip_volatile(resp):
+    return {k: v for k, v in resp.items() if k not in ("request_id", "ts")}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app_module, "HF_CORTEX_TOKEN", None)
+    monkeypatch.setattr(
+        lead_sales_flow,
+        "call_llm_with_cortex_request",
+        lambda _req: CortexResult(action="reply", stage="CONTACT", reply="ok", chosen_offer_id=1),
+    )
+    return TestClient(app_module.app)
+
+
+def test_trace_requests_give_same_response_over_msgpack(client, monkeypatch):
+    monkeypatch.setenv("HF_CORTEX_ABCP_CACHE_SIZE", "0")  # иначе второй вызов отличается debug.abcp_cached_packs
+    for req in load_trace_requests():
+        as_json = client.post(URL, json=req)
+        as_msgpack = client.post(URL, content=msgpack.packb(req), headers=MSGPACK_HEADERS)
+
+        assert as_json.status_code == as_msgpack.status_code == 200
+        assert as_msgpack.headers["content-type"] == MSGPACK_MEDIA_TYPE
+        assert len(as_msgpack.content) < len(as_json.content)
+        assert _strip_volatile(msgpack.unpackb(as_msgpack.content)) == _strip_volatile(as_json.json())
+
+
+def test_msgpack_negotiation_replay_and_compact(client, monkeypatch):
+    assert prefers_msgpack("application/msgpack")
+    assert prefers_msgpack("application/json;q=0.5, application/x-msgpack")
+    assert not prefers_msgpack("application/json, application/msgpack;q=0.9")
+    assert not prefers_msgpack("application/msgpack;q=0")
+    assert not prefers_msgpack(None)
+
+    req = {
+        "app": "t",
+        "flow": "lead_sales",
+        "payload": {"msg": {"text": "5Q0411105R"}, "sessionSnapshot": {}, "injected_abcp": synthetic_abcp(20, n_oems=1)},
+    }
+    body = msgpack.packb(req)
+
+    # msgpack-тело, JSON-ответ (Accept без msgpack)
+    r = client.post(URL, content=body, headers={"content-type": MSGPACK_MEDIA_TYPE})
+    assert r.status_code == 200 and r.json()["stage"] == "PRICING"
+
+    # повтор по Idempotency-Key отдаётся в том же формате
+    headers = dict(MSGPACK_HEADERS, **{"Idempotency-Key": "k-msgpack"})
+    first = client.post(URL, content=body, headers=headers)
+    replay = client.post(URL, content=body, headers=headers)
+    assert replay.headers.get("Idempotent-Replay") == "true"
+    assert msgpack.unpackb(replay.content) == msgpack.unpackb(first.content)
+
+    monkeypatch.setenv("HF_CORTEX_ABCP_COMPACT", "1")
+    r = client.post(URL, content=body, headers=MSGPACK_HEADERS)
+    assert msgpack.unpackb(r.content)["context"]["injected_abcp"] == compact_abcp(req["payload"]["injected_abcp"])
+
+    bad = client.post(URL, content=b"\xc1", headers=MSGPACK_HEADERS)
+    assert bad.status_code == 422
+    assert bad.json()["detail"][0]["msg"] == "MessagePack decode error"
+
+    monkeypatch.setattr(wire, "_msgpack", None)
+    assert client.post(URL, content=body, headers=MSGPACK_HEADERS).status_code == 415
+    assert client.post(URL, json=req, headers={"accept": MSGPACK_MEDIA_TYPE}).json()["stage"] == "PRICING"
@@ -0,0 +1,107 @@
+// @ts-check
+
+// src/core/cortexSessionDelta.js
+// Delta-протокол sessionSnapshot для HF-CORTEX.
+// Вместо полного снимка сессии Node шлёт JSON Merge Patch (RFC 7386) относительно версии,
+// которую Cortex уже видел. При расхождении версий Cortex отвечает 409 session_resync_required,
+// и клиент переотправляет полный снимок.
+
+export const SESSION_RESYNC_REQUIRED = "session_resync_required";
+
+const DEFAULT_MAX_ENTRIES = 500;
+
+/** @param {any} v */
+function isPlainObject(v) {
+  return v !== null && typeof v === "object" && !Array.isArray(v);
+}
+
+/**
+ * Строит merge patch: применив его к prev, получим next.
+ * Массивы заменяются целиком (как и требует RFC 7386).
+ * null в снимке передаётся как удаление ключа — для Cortex это эквивалентно.
+ * @param {any} prev
+ * @param {any} next
+ * @returns {Record<string, any>}
+ */
+export function createMergePatch(prev, next) {
+  /** @type {Record<string, any>} */
+  const patch = {};
+  const a = isPlainObject(prev) ? prev : {};
+  const b = isPlainObject(next) ? next : {};
+
+  for (const key of Object.keys(a)) {
+    if (!(key in b) || b[key] === undefined) patch[key] = null;
+  }
+
+  for (const [key, value] of Object.entries(b)) {
+    if (value === undefined) continue;
+    const old = a[key];
+    if (isPlainObject(value) && isPlainObject(old)) {
+      const sub = createMergePatch(old, value);
+      if (Object.keys(sub).length > 0) patch[key] = sub;
+    } else if (JSON.stringify(old) !== JSON.stringify(value)) {
+      patch[key] = value;
+    }
+  }
+
+  return patch;
+}
+
+/** @param {any} v */
+function cloneJson(v) {
+  return v === undefined ? undefined : JSON.parse(JSON.stringify(v));
+}
+
+/**
+ * Что последним отправили в Cortex по каждому sessionKey (ограниченный LRU в памяти процесса).
+ * Потеря записи не страшна: следующий вызов просто уйдёт полным снимком.
+ */
+export class CortexSessionTracker {
+  /** @param {{ maxEntries?: number }} [opts] */
+  constructor(opts = {}) {
+    this.maxEntries = Math.max(1, Number(opts.maxEntries) || DEFAULT_MAX_ENTRIES);
+    /** @type {Map<string, { version: number, snapshot: any }>} */
+    this.entries = new Map();
+  }
+
+  /**
+   * Готовит поля payload для очередного вызова.
+   * @param {string} sessionKey
+   * @param {any} snapshot
+   * @param {{ forceFull?: boolean }} [opts]
+   */
+  prepare(sessionKey, snapshot, opts = {}) {
+    const prev = this.entries.get(sessionKey);
+    const version = (prev?.version || 0) + 1;
+    const clone = cloneJson(snapshot || {});
+
+    /** @type {Record<string, any>} */
+    const fields =
+      prev && !opts.forceFull
+        ? {
+            sessionKey,
+            sessionVersion: version,
+            sessionBaseVersion: prev.version,
+            sessionDelta: createMergePatch(prev.snapshot, clone),
+          }
+        : { sessionKey, sessionVersion: version, sessionSnapshot: clone };
+
+    return {
+      fields,
+      commit: () => {
+        this.entries.delete(sessionKey);
+        this.entries.set(sessionKey, { version, snapshot: clone });
+        while (this.entries.size > this.maxEntries) {
+          const oldest = this.entries.keys().next().value;
+          if (oldest === undefined) break;
+          this.entries.delete(oldest);
+        }
+      },
+    };
+  }
+
+  /** @param {string} sessionKey */
+  forget(sessionKey) {
+    this.entries.delete(sessionKey);
+  }
+}
@@ -7,6 +7,13 @@
 import fs from "node:fs/promises";
 import path from "node:path";
 
+import { CortexSessionTracker, SESSION_RESYNC_REQUIRED } from "./cortexSessionDelta.js";
+
+// Что последним отправили в Cortex по каждой сессии (для delta-режима, HF_CORTEX_SESSION_DELTA=true)
+const sessionTracker = new CortexSessionTracker({
+  maxEntries: Number(process.env.HF_CORTEX_SESSION_DELTA_MAX_ENTRIES || 0) || undefined,
+});
+
 /**
  * @typedef {Object} CortexLogger
  * @property {(ctxOrMsg?: any, maybeMsg?: string) => void} [debug]
@@ -60,18 +67,66 @@ async function dumpCortexToFile(dumpId, kind, obj) {
   );
 }
 
+/**
+ * Тело потокового ответа Cortex (NDJSON): событие decision — в onDecision сразу по приходу,
+ * событие result — итоговый CortexResponse (с decision_changed).
+ * @param {any} res
+ * @param {(decision: any) => void} onDecision
+ * @returns {Promise<CortexResponse|null>}
+ */
+async function readCortexStream(res, onDecision) {
+  /** @type {CortexResponse|null} */
+  let result = null;
+
+  /** @param {string} line */
+  const handleLine = (line) => {
+    if (!line.trim()) return;
+    const { event, ...body } = JSON.parse(line);
+    if (event === "decision") onDecision(body);
+    else if (event === "result") result = body;
+  };
+
+  if (!res.body) {
+    (await res.text()).split("\n").forEach(handleLine);
+    return result;
+  }
+
+  const decoder = new TextDecoder();
+  let buf = "";
+  for await (const chunk of res.body) {
+    buf += decoder.decode(chunk, { stream: true });
+    let nl;
+    while ((nl = buf.indexOf("\n")) >= 0) {
+      handleLine(buf.slice(0, nl));
+      buf = buf.slice(nl + 1);
+    }
+  }
+  handleLine(buf + decoder.decode());
+  return result;
+}
+
 /**
  * @param {any} payload
  * @param {CortexLogger} [logger]
+ * @param {{ idempotencyKey?: string|null, onDecision?: (decision: any) => any }} [opts]
+ *   idempotencyKey — портал:диалог:сообщение:проход; ретрай с тем же ключом получит
+ *   сохранённый Cortex-ответ вместо нового ответа LLM.
+ *   onDecision — при HF_CORTEX_STREAM=true запрос идёт в потоковый эндпоинт
+ *   (.../lead_sales/stream): решение Cortex без LLM ({ stage, final, decision }) приходит
+ *   сюда до ответа LLM (можно начинать обновлять CRM); ошибки колбэка только логируются.
+ *   В итоговом ответе decision_changed — поля, которые LLM поменял относительно решения.
  * @returns {Promise<CortexResponse|null>}
  */
-export async function callCortexLeadSales(payload, logger) {
+export async function callCortexLeadSales(payload, logger, opts = {}) {
   const {
     HF_CORTEX_ENABLED,
     HF_CORTEX_URL,
     HF_CORTEX_TIMEOUT_MS,
     HF_CORTEX_API_KEY,
     HF_CORTEX_TOKEN,
+    HF_CORTEX_SESSION_DELTA,
+    HF_CORTEX_STREAM,
+    HF_CORTEX_STREAM_URL,
   } = process.env;
 
   const authToken = HF_CORTEX_TOKEN || HF_CORTEX_API_KEY;
@@ -92,6 +147,12 @@ export async function callCortexLeadSales(payload, logger) {
     return null;
   }
 
+  const onDecision = typeof opts?.onDecision === "function" ? opts.onDecision : null;
+  const useStream = HF_CORTEX_STREAM === "true" && !!onDecision;
+  const url = useStream
+    ? HF_CORTEX_STREAM_URL || `${HF_CORTEX_URL.replace(/\/+$/, "")}/stream`
+    : HF_CORTEX_URL;
+
   const timeoutMs = Number(HF_CORTEX_TIMEOUT_MS || 20000);
   const controller = new AbortController();
   const timeout = setTimeout(() => controller.abort(), timeoutMs);
@@ -99,39 +160,78 @@ export async function callCortexLeadSales(payload, logger) {
   try {
     logger?.debug(
       {
-        url: HF_CORTEX_URL,
+        url,
         timeoutMs,
       },
       "[HF-CORTEX] sending request",
     );
 
-    const requestBody = {
-      app: "hf-rozatti-py",
-      flow: "lead_sales",
-      payload, // текст клиента + снимок сессии/контекста
+    // Delta-режим: вместо полного sessionSnapshot шлём merge patch к версии, которую Cortex уже видел.
+    const sessionKey =
+      typeof payload?.sessionKey === "string" && payload.sessionKey ? payload.sessionKey : null;
+    const useSessionDelta =
+      HF_CORTEX_SESSION_DELTA === "true" && !!sessionKey && !!payload?.sessionSnapshot;
+
+    /** @param {boolean} forceFull */
+    const prepareSession = (forceFull) =>
+      useSessionDelta && sessionKey
+        ? sessionTracker.prepare(sessionKey, payload.sessionSnapshot, { forceFull })
+        : null;
+
+    /** @param {ReturnType<typeof prepareSession>} prepared */
+    const buildRequestBody = (prepared) => {
+      let outPayload = payload;
+      if (prepared) {
+        const { sessionSnapshot: _full, ...rest } = payload;
+        outPayload = { ...rest, ...prepared.fields };
+      }
+      return {
+        app: "hf-rozatti-py",
+        flow: "lead_sales",
+        payload: outPayload, // текст клиента + снимок (или delta) сессии/контекста
+      };
     };
 
     const dumpId = makeDumpId(payload);
-    await dumpCortexToFile(dumpId, "request", requestBody);
-
-    const res = await fetch(HF_CORTEX_URL, {
-      method: "POST",
-      signal: controller.signal,
-      headers: {
-        "Content-Type": "application/json",
-        ...(authToken
-          ? {
-              // Единый режим авторизации Node → HF-CORTEX (рекомендуемый)
-              "X-HF-CORTEX-TOKEN": authToken,
-              // Совместимость со старым режимом
-              Authorization: `Bearer ${authToken}`,
-            }
-          : {}),
-      },
-      body: JSON.stringify(requestBody),
-    });
+
+    /** @param {any} requestBody */
+    const post = async (requestBody) => {
+      await dumpCortexToFile(dumpId, "request", requestBody);
+      return fetch(url, {
+        method: "POST",
+        signal: controller.signal,
+        headers: {
+          "Content-Type": "application/json",
+          ...(opts?.idempotencyKey ? { "Idempotency-Key": String(opts.idempotencyKey) } : {}),
+          ...(authToken
+            ? {
+                // Единый режим авторизации Node → HF-CORTEX (рекомендуемый)
+                "X-HF-CORTEX-TOKEN": authToken,
+                // Совместимость со старым режимом
+                Authorization: `Bearer ${authToken}`,
+              }
+            : {}),
+        },
+        body: JSON.stringify(requestBody),
+      });
+    };
+
+    let prepared = prepareSession(false);
+    let res = await post(buildRequestBody(prepared));
+
+    if (res.status === 409 && prepared && "sessionDelta" in prepared.fields) {
+      // Cortex потерял/не узнал версию (рестарт, вытеснение, другой воркер) — полный resync
+      const text = await res.text().catch(() => "");
+      logger?.info(
+        { sessionKey, text },
+        `[HF-CORTEX] ${SESSION_RESYNC_REQUIRED}, resending full snapshot`,
+      );
+      prepared = prepareSession(true);
+      res = await post(buildRequestBody(prepared));
+    }
 
     if (!res.ok) {
+      if (sessionKey) sessionTracker.forget(sessionKey);
       const text = await res.text().catch(() => undefined);
 
       await dumpCortexToFile(dumpId, "response_http_error", {
@@ -149,12 +249,26 @@ export async function callCortexLeadSales(payload, logger) {
       throw err;
     }
 
-    const rawText = await res.text().catch(() => "");
+    /** @param {any} decision */
+    const notifyDecision = (decision) => {
+      void dumpCortexToFile(dumpId, "decision", decision).catch(() => {});
+      // не ждём: CRM обновляется параллельно с ответом LLM
+      Promise.resolve()
+        .then(() => onDecision?.(decision))
+        .catch((err) => logger?.warn({ err }, "[HF-CORTEX] onDecision failed"));
+    };
+
+    let rawText = "";
     /** @type {CortexResponse|null} */
     let data;
 
     try {
-      data = rawText ? JSON.parse(rawText) : null;
+      if (useStream) {
+        data = await readCortexStream(res, notifyDecision);
+      } else {
+        rawText = await res.text().catch(() => "");
+        data = rawText ? JSON.parse(rawText) : null;
+      }
     } catch (e) {
       const err = new Error("[HF-CORTEX] invalid JSON in response");
       err.cause = e;
@@ -171,6 +285,7 @@ export async function callCortexLeadSales(payload, logger) {
     }
 
     await dumpCortexToFile(dumpId, "response", data);
+    prepared?.commit();
 
     logger?.debug(
       { ok: data?.ok, flow: data?.flow, stage: data?.stage },
@@ -185,3 +300,89 @@ export async function callCortexLeadSales(payload, logger) {
     clearTimeout(timeout);
   }
 }
+
+// ---------------------------------------------------------------------------
+// Кэш цен ABCP в Cortex (GET/PUT /api/hf-cortex/abcp_cache/{oem}, HF_CORTEX_PRICE_CACHE=true).
+// Ошибки и таймауты кэша не мешают поиску: вызывающий просто идёт в ABCP.
+// ---------------------------------------------------------------------------
+
+/**
+ * @typedef {Object} CortexAbcpCacheHit
+ * @property {"fresh"|"stale"|"miss"} status
+ * @property {Record<string, { offers: any[] }>|null} [abcp]
+ * @property {boolean} [revalidate]  этот вызов должен обновить запись из ABCP
+ */
+
+function priceCacheEnabled() {
+  return process.env.HF_CORTEX_ENABLED === "true" && process.env.HF_CORTEX_PRICE_CACHE === "true";
+}
+
+/** @param {string} oem */
+function priceCacheUrl(oem) {
+  const { HF_CORTEX_PRICE_CACHE_URL, HF_CORTEX_URL } = process.env;
+  // по умолчанию — рядом с lead_sales: .../api/hf-cortex/lead_sales -> .../api/hf-cortex/abcp_cache/
+  const base = HF_CORTEX_PRICE_CACHE_URL || new URL("abcp_cache/", HF_CORTEX_URL || "").toString();
+  return `${base.replace(/\/+$/, "")}/${encodeURIComponent(oem)}`;
+}
+
+function cortexAuthHeaders() {
+  const authToken = process.env.HF_CORTEX_TOKEN || process.env.HF_CORTEX_API_KEY;
+  return authToken ? { "X-HF-CORTEX-TOKEN": authToken, Authorization: `Bearer ${authToken}` } : {};
+}
+
+/**
+ * @param {string} oem
+ * @param {RequestInit} init
+ * @param {CortexLogger} [logger]
+ */
+async function priceCacheFetch(oem, init, logger) {
+  const controller = new AbortController();
+  const timeout = setTimeout(
+    () => controller.abort(),
+    Number(process.env.HF_CORTEX_PRICE_CACHE_TIMEOUT_MS || 1500),
+  );
+  try {
+    const res = await fetch(priceCacheUrl(oem), { ...init, signal: controller.signal });
+    if (!res.ok) {
+      logger?.warn({ oem, status: res.status }, "[HF-CORTEX] price cache: bad status");
+      return null;
+    }
+    return await res.json();
+  } catch (err) {
+    logger?.warn({ oem, err: String(err) }, "[HF-CORTEX] price cache: call error");
+    return null;
+  } finally {
+    clearTimeout(timeout);
+  }
+}
+
+/**
+ * @param {string} oem
+ * @param {CortexLogger} [logger]
+ * @returns {Promise<CortexAbcpCacheHit|null>} null — кэш выключен/недоступен
+ */
+export async function getCortexAbcpCache(oem, logger) {
+  if (!priceCacheEnabled()) return null;
+  const data = await priceCacheFetch(oem, { method: "GET", headers: cortexAuthHeaders() }, logger);
+  return data && typeof data.status === "string" ? data : null;
+}
+
+/**
+ * @param {string} oem
+ * @param {Record<string, { offers: any[] }>} abcp  ответ ABCP на этот OEM (+ замены)
+ * @param {CortexLogger} [logger]
+ * @returns {Promise<boolean>}
+ */
+export async function putCortexAbcpCache(oem, abcp, logger) {
+  if (!priceCacheEnabled()) return false;
+  const data = await priceCacheFetch(
+    oem,
+    {
+      method: "PUT",
+      headers: { "Content-Type": "application/json", ...cortexAuthHeaders() },
+      body: JSON.stringify({ abcp }),
+    },
+    logger,
+  );
+  return !!data?.ok;
+}
@@ -277,17 +277,53 @@ async function tryCreateAbcpOrderIfNeeded({ llm, api, portalDomain, session, dia
   return llm;
 }
 
+/**
+ * Потоковый Cortex (HF_CORTEX_STREAM=true): решение без LLM ({ stage, final, decision })
+ * приходит раньше ответа — лид/контакт обновляем, пока LLM пишет reply.
+ * settle() дожидается этой записи: session дальше меняется, а итоговый
+ * safeUpdateLeadAndContact не должен гоняться с ранним.
+ */
+function makeEarlyCrmUpdate({ portalDomain, dialogId, chatId, session, text }) {
+  let pending = null;
+  return {
+    onDecision: (event) => {
+      const llm = mapCortexResultToLlmResponse({
+        stage: event?.stage,
+        result: event?.decision || {},
+      });
+      pending = safeUpdateLeadAndContact({
+        portal: portalDomain,
+        dialogId,
+        chatId,
+        session,
+        llm,
+        lastUserMessage: text,
+        usedBackend: "HF_CORTEX",
+      });
+      return pending;
+    },
+    // ошибку ранней записи уже залогировал hfCortexClient — итоговая запись всё равно будет
+    settle: async () => {
+      if (pending) await pending.catch(() => {});
+    },
+  };
+}
+
 export async function runCortexTwoPassFlow({
   api,
   portalDomain,
   portalCfg,
   dialogId,
   chatId,
+  messageId = null,
   text,
   session,
   baseCtx = "modules/bot/handler_llm_manager",
 }) {
   const ctx = `${baseCtx}.processIncomingBitrixMessage`;
+  // Ключ идемпотентности Cortex: ретрай того же прохода по тому же сообщению не даёт нового ответа
+  const idempotencyKeyFor = (pass) =>
+    messageId ? `${portalDomain}:${dialogId}:${messageId}:${pass}` : null;
   const sendBotReply = async (message, kind = null) => {
     const safeMessage = String(message || "").trim();
     if (!safeMessage) return;
@@ -318,15 +354,19 @@ export async function runCortexTwoPassFlow({
       : null;
 
   // 4.1. ПЕРВЫЙ ВЫЗОВ HF-CORTEX
+  const earlyCrm1 = makeEarlyCrmUpdate({ portalDomain, dialogId, chatId, session, text });
   const cortexRaw1 = await callCortexLeadSales(
     {
       msg: { text },
       sessionSnapshot: session,
+      sessionKey: `${portalDomain}:${dialogId}`,
       ...(session.abcp ? { injected_abcp: session.abcp } : {}),
       ...(sessionOffers ? { offers: sessionOffers } : {}),
     },
     logger,
+    { idempotencyKey: idempotencyKeyFor("first"), onDecision: earlyCrm1.onDecision },
   );
+  await earlyCrm1.settle();
 
   logger.info(
     { ctx: `${ctx}.CORTEX_FIRST_PASS`, cortexRaw: cortexRaw1 },
@@ -402,15 +442,19 @@ export async function runCortexTwoPassFlow({
             ? session.state.offers
             : null;
 
+        const earlyCrm2 = makeEarlyCrmUpdate({ portalDomain, dialogId, chatId, session, text });
         const cortexRaw2 = await callCortexLeadSales(
           {
             msg: { text },
             sessionSnapshot: session,
+            sessionKey: `${portalDomain}:${dialogId}`,
             injected_abcp: abcpData,
             ...(sessionOffers2 ? { offers: sessionOffers2 } : {}),
           },
           logger,
+          { idempotencyKey: idempotencyKeyFor("second"), onDecision: earlyCrm2.onDecision },
         );
+        await earlyCrm2.settle();
 
         logger.info(
           { ctx: `${ctxAbcp}.CORTEX_SECOND_PASS`, cortexRaw: cortexRaw2 },
@@ -575,6 +575,7 @@ export async function processIncomingBitrixMessage({ body, portal, domain }) {
         portalCfg: ctx.portal,
         dialogId: ctx.message.dialogId,
         chatId: ctx.message.chatId,
+        messageId: ctx.message.messageId ?? null,
         text: ctx.message.text,
         session,
         baseCtx: "modules/bot/handler/v2",
@@ -116,6 +116,10 @@ export function mapCortexResultToLlmResponse(cortex) {
       payload.contact_update && typeof payload.contact_update === "object"
         ? payload.contact_update
         : null,
+
+    // Разобранные Cortex факты (ФИО/телефон/адрес/выбор/кол-во) — храним в сессии как есть.
+    facts:
+      payload.meta?.facts && typeof payload.meta.facts === "object" ? payload.meta.facts : null,
   };
 
   logger.debug({ ctx, mapped }, "Mapped CortexResult → LLM-формат");
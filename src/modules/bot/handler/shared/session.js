@@ -87,6 +87,11 @@ export function applyLlmToSession(session, llm) {
     session.state.chosen_offer_id = llm.chosen_offer_id;
   }
 
+  // Факты Cortex возвращаются в sessionSnapshot, чтобы не разбирать историю заново
+  if (llm.facts && typeof llm.facts === "object" && Number.isFinite(Number(llm.facts.v))) {
+    session.state.cortex_facts = llm.facts;
+  }
+
   session.state.last_reply = llm.reply;
   session.updatedAt = Date.now();
 }
@@ -9,6 +9,7 @@
 
 import axios from "axios";
 
+import { getCortexAbcpCache, putCortexAbcpCache } from "../../../core/hfCortexClient.js";
 import { logger } from "../../../core/logger.js";
 
 const CTX = "ABCP";
@@ -452,6 +453,8 @@ function normalizeAbcpResponse(oem, rows) {
       deliveryRaw: deadlineRaw,
       // новенькое:
       oem: offerOem,
+      // по какому номеру ABCP отдал строку: Cortex строит по нему граф замен OEM
+      requestedOem: oem,
       isAnalog,
       isOriginal,
       // Поля для последующего заказа через basket/add
@@ -498,86 +501,135 @@ function normalizeAbcpResponse(oem, rows) {
 
 // --------- ОСНОВНОЙ ПОИСК ПО НЕСКОЛЬКИМ OEM ---------
 
-export async function searchManyOEMs(oems = []) {
-  const result = {};
+/**
+ * Ответ ABCP на один запрошенный OEM: { oem: { offers } } — запрошенный номер + замены.
+ * @param {string} requestedOem
+ */
+async function searchOneOem(requestedOem) {
+  logger.info({ ctx: CTX, oem: requestedOem }, "Поиск по OEM");
 
-  for (const requestedOemRaw of oems) {
-    const requestedOem = String(requestedOemRaw || "").trim().toUpperCase();
-    if (!requestedOem) continue;
+  const brands = await queryBrands(requestedOem);
 
-    logger.info({ ctx: CTX, oem: requestedOem }, "Поиск по OEM");
+  if (!brands.length) {
+    logger.info(
+      { ctx: CTX, oem: requestedOem },
+      "Бренды не найдены, предложений нет",
+    );
+    return { [requestedOem]: { offers: [] } };
+  }
 
-    const brands = await queryBrands(requestedOem);
+  const brandObj = brands[0] || {};
+  const brand = brandObj.brand || brandObj.Brand || brandObj.name || null;
 
-    if (!brands.length) {
-      logger.info(
-        { ctx: CTX, oem: requestedOem },
-        "Бренды не найдены, предложений нет",
-      );
-      result[requestedOem] = result[requestedOem] || { offers: [] };
-      continue;
-    }
+  if (!brand) {
+    logger.warn(
+      { ctx: CTX, oem: requestedOem, brandObj },
+      "Не удалось определить brand из search/brands",
+    );
+    return { [requestedOem]: { offers: [] } };
+  }
 
-    const brandObj = brands[0] || {};
-    const brand = brandObj.brand || brandObj.Brand || brandObj.name || null;
+  logger.info(
+    { ctx: CTX, oem: requestedOem, brand },
+    "Используем brand для поиска статей",
+  );
 
-    if (!brand) {
-      logger.warn(
-        { ctx: CTX, oem: requestedOem, brandObj },
-        "Не удалось определить brand из search/brands",
-      );
-      result[requestedOem] = result[requestedOem] || { offers: [] };
-      continue;
-    }
+  const rows = await queryArticle(requestedOem, brand);
+  const offers = normalizeAbcpResponse(requestedOem, rows);
+
+  // === КЛЮЧЕВАЯ ПРАВКА ===
+  // ABCP может вернуть строки по "оригинальным заменам" (другой OEM),
+  // поэтому раскладываем офферы по реальному offer.oem в отдельные ключи.
+  const grouped = {};
+  for (const off of offers) {
+    const key = String(off?.oem || requestedOem).trim().toUpperCase();
+    if (!key) continue;
+    if (!grouped[key]) grouped[key] = [];
+    grouped[key].push(off);
+  }
+
+  // Сортируем каждую группу по цене (детерминированно)
+  const slice = {};
+  for (const [k, arr] of Object.entries(grouped)) {
+    arr.sort((a, b) => (a.price || 0) - (b.price || 0));
+    slice[k] = { offers: arr };
+  }
+
+  // Если вдруг вообще ничего не пришло — оставим пусто хотя бы по запрошенному
+  if (!Object.keys(grouped).length) {
+    slice[requestedOem] = { offers: [] };
+  }
+
+  // Логируем: сколько OEM получилось из одного запроса
+  const keys = Object.keys(grouped);
+  logger.info(
+    {
+      ctx: CTX,
+      requestedOem,
+      groupedOems: keys,
+      groupedCounts: keys.reduce((acc, k) => {
+        acc[k] = grouped[k].length;
+        return acc;
+      }, {}),
+    },
+    "searchManyOEMs grouped result (requested + replacements)",
+  );
+
+  return slice;
+}
+
+/** @param {Record<string, { offers: any[] }>} slice */
+function sliceHasOffers(slice) {
+  return Object.values(slice).some((pack) => (pack?.offers || []).length > 0);
+}
+
+/**
+ * Сначала кэш цен в Cortex (HF_CORTEX_PRICE_CACHE=true), ABCP — только на miss.
+ * stale отдаём сразу; если Cortex выдал revalidate — обновляем запись в фоне.
+ * @param {string} requestedOem
+ */
+async function searchOneOemCached(requestedOem) {
+  const hit = await getCortexAbcpCache(requestedOem, logger);
 
+  if (hit?.abcp && (hit.status === "fresh" || hit.status === "stale")) {
     logger.info(
-      { ctx: CTX, oem: requestedOem, brand },
-      "Используем brand для поиска статей",
+      { ctx: CTX, oem: requestedOem, status: hit.status, revalidate: hit.revalidate },
+      "ABCP: ответ из кэша Cortex",
     );
-
-    const rows = await queryArticle(requestedOem, brand);
-    const offers = normalizeAbcpResponse(requestedOem, rows);
-
-    // === КЛЮЧЕВАЯ ПРАВКА ===
-    // ABCP может вернуть строки по "оригинальным заменам" (другой OEM),
-    // поэтому раскладываем офферы по реальному offer.oem в отдельные ключи.
-    const grouped = {};
-    for (const off of offers) {
-      const key = String(off?.oem || requestedOem).trim().toUpperCase();
-      if (!key) continue;
-      if (!grouped[key]) grouped[key] = [];
-      grouped[key].push(off);
+    if (hit.revalidate) {
+      searchOneOem(requestedOem)
+        .then((fresh) => (sliceHasOffers(fresh) ? putCortexAbcpCache(requestedOem, fresh, logger) : false))
+        .catch((err) =>
+          logger.warn({ ctx: CTX, oem: requestedOem, error: String(err) }, "ABCP: фоновое обновление кэша не удалось"),
+        );
     }
+    return hit.abcp;
+  }
+
+  const fresh = await searchOneOem(requestedOem);
+  // пустой ответ не кэшируем: он же бывает и при сбое ABCP
+  if (hit && sliceHasOffers(fresh)) {
+    await putCortexAbcpCache(requestedOem, fresh, logger);
+  }
+  return fresh;
+}
+
+export async function searchManyOEMs(oems = []) {
+  const result = {};
+
+  for (const requestedOemRaw of oems) {
+    const requestedOem = String(requestedOemRaw || "").trim().toUpperCase();
+    if (!requestedOem) continue;
 
-    // Сортируем каждую группу по цене (детерминированно)
-    for (const [k, arr] of Object.entries(grouped)) {
-      arr.sort((a, b) => (a.price || 0) - (b.price || 0));
-      // мерджим в общий result
+    const slice = await searchOneOemCached(requestedOem);
+
+    // мерджим в общий result
+    for (const [k, pack] of Object.entries(slice)) {
       if (!result[k]) result[k] = { offers: [] };
-      result[k].offers = [...(result[k].offers || []), ...arr].sort(
+      result[k].offers = [...(result[k].offers || []), ...(pack?.offers || [])].sort(
         (a, b) => (a.price || 0) - (b.price || 0),
       );
     }
-
-    // Если вдруг вообще ничего не пришло — оставим пусто хотя бы по запрошенному
-    if (!Object.keys(grouped).length) {
-      result[requestedOem] = result[requestedOem] || { offers: [] };
-    }
-
-    // Логируем: сколько OEM получилось из одного запроса
-    const keys = Object.keys(grouped);
-    logger.info(
-      {
-        ctx: CTX,
-        requestedOem,
-        groupedOems: keys,
-        groupedCounts: keys.reduce((acc, k) => {
-          acc[k] = grouped[k].length;
-          return acc;
-        }, {}),
-      },
-      "searchManyOEMs grouped result (requested + replacements)",
-    );
   }
 
   logger.info(
@@ -81,6 +81,7 @@ test("abcp: searchManyOEMs groups offers by real OEM and normalizes delivery/qty
   assert.equal(out.ALT111.offers[0].minDays, 7);
   assert.equal(out.ALT222.offers[0].minDays, 9);
   assert.equal(out.ALT222.offers[0].maxDays, 9);
+  assert.equal(out.ALT111.offers[0].requestedOem, "REQ123");
   assert.equal(out.REQ123.offers.length, 2);
   assert.equal(out.REQ123.offers[0].price, 120);
   assert.equal(out.REQ123.offers[1].maxDays, 18);
@@ -170,3 +171,50 @@ test("abcp: limits 429 retries for search/articles", { concurrency: false }, asy
   assert.equal(out.R42901.offers.length, 0);
   assert.equal(articleCalls, 2);
 });
+
+test("abcp: fresh Cortex price cache hit skips ABCP", { concurrency: false }, async () => {
+  const prevEnv = {
+    HF_CORTEX_ENABLED: process.env.HF_CORTEX_ENABLED,
+    HF_CORTEX_PRICE_CACHE: process.env.HF_CORTEX_PRICE_CACHE,
+    HF_CORTEX_PRICE_CACHE_URL: process.env.HF_CORTEX_PRICE_CACHE_URL,
+  };
+  process.env.HF_CORTEX_ENABLED = "true";
+  process.env.HF_CORTEX_PRICE_CACHE = "true";
+  process.env.HF_CORTEX_PRICE_CACHE_URL = "http://cortex.local/api/hf-cortex/abcp_cache/";
+
+  const originalFetch = global.fetch;
+  const fetchCalls = [];
+  global.fetch = async (url, options) => {
+    fetchCalls.push({ url, method: options?.method });
+    return {
+      ok: true,
+      status: 200,
+      json: async () => ({
+        ok: true,
+        oem: "CACHED1",
+        status: "fresh",
+        abcp: { CACHED1: { offers: [{ oem: "CACHED1", price: 500 }] } },
+        revalidate: false,
+      }),
+    };
+  };
+
+  let abcpCalls = 0;
+  stubGetImpl = async () => {
+    abcpCalls += 1;
+    return { data: [] };
+  };
+
+  try {
+    const out = await mod.searchManyOEMs(["cached1"]);
+    assert.equal(out.CACHED1.offers[0].price, 500);
+    assert.equal(abcpCalls, 0);
+    assert.deepEqual(fetchCalls, [{ url: "http://cortex.local/api/hf-cortex/abcp_cache/CACHED1", method: "GET" }]);
+  } finally {
+    global.fetch = originalFetch;
+    for (const [k, v] of Object.entries(prevEnv)) {
+      if (v === undefined) delete process.env[k];
+      else process.env[k] = v;
+    }
+  }
+});
@@ -0,0 +1,43 @@
+import assert from "node:assert/strict";
+import test from "node:test";
+
+import { CortexSessionTracker, createMergePatch } from "../core/cortexSessionDelta.js";
+
+test("cortexSessionDelta: createMergePatch emits only changed keys and deletions", () => {
+  const prev = { leadId: 1, state: { stage: "NEW", offers: [{ id: 1 }] }, tmp: "x" };
+  const next = { leadId: 1, state: { stage: "CONTACT", offers: [{ id: 1 }] }, phone: "+7999" };
+
+  assert.deepEqual(createMergePatch(prev, next), {
+    tmp: null,
+    state: { stage: "CONTACT" },
+    phone: "+7999",
+  });
+  assert.deepEqual(createMergePatch(next, next), {});
+});
+
+test("cortexSessionDelta: tracker sends full snapshot first, then delta after commit", () => {
+  const tracker = new CortexSessionTracker({ maxEntries: 1 });
+
+  const first = tracker.prepare("p:1", { a: 1 });
+  assert.deepEqual(first.fields, {
+    sessionKey: "p:1",
+    sessionVersion: 1,
+    sessionSnapshot: { a: 1 },
+  });
+  first.commit();
+
+  const second = tracker.prepare("p:1", { a: 2 });
+  assert.deepEqual(second.fields, {
+    sessionKey: "p:1",
+    sessionVersion: 2,
+    sessionBaseVersion: 1,
+    sessionDelta: { a: 2 },
+  });
+
+  const forced = tracker.prepare("p:1", { a: 2 }, { forceFull: true });
+  assert.equal(forced.fields.sessionSnapshot.a, 2);
+
+  // LRU: вторая сессия вытесняет первую -> снова полный снимок
+  tracker.prepare("p:2", {}).commit();
+  assert.ok("sessionSnapshot" in tracker.prepare("p:1", { a: 3 }).fields);
+});
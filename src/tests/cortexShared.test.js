@@ -152,3 +152,10 @@ test("cortex shared: processCortexResult falls back to operator on error", async
     action: "handover_operator",
   });
 });
+
+test("cortex shared: mapCortexResultToLlmResponse passes meta.facts through", () => {
+  const facts = { v: 1, phone: "+79991234567" };
+  assert.deepEqual(mapCortexResultToLlmResponse({ result: { meta: { facts } } }).facts, facts);
+  assert.equal(mapCortexResultToLlmResponse({ result: { meta: { facts: "x" } } }).facts, null);
+  assert.equal(mapCortexResultToLlmResponse({ result: {} }).facts, null);
+});
@@ -13,6 +13,8 @@ const originalEnv = {
   HF_CORTEX_URL: process.env.HF_CORTEX_URL,
   HF_CORTEX_API_KEY: process.env.HF_CORTEX_API_KEY,
   HF_CORTEX_TIMEOUT_MS: process.env.HF_CORTEX_TIMEOUT_MS,
+  HF_CORTEX_STREAM: process.env.HF_CORTEX_STREAM,
+  HF_CORTEX_STREAM_URL: process.env.HF_CORTEX_STREAM_URL,
 };
 
 let stubAbcpGet = async () => ({ data: [] });
@@ -828,3 +830,88 @@ test("flows: cortexTwoPassFlow converts lead to deal after successful ABCP order
   assert.equal(session.lastLeadConversion?.ok, true);
   assert.equal(session.lastLeadConversion?.dealId, 55501);
 });
+
+test("flows: cortexTwoPassFlow streams Cortex decisions when HF_CORTEX_STREAM=true", async () => {
+  process.env.HF_CORTEX_ENABLED = "true";
+  process.env.HF_CORTEX_URL = "http://cortex.test/flow";
+  process.env.HF_CORTEX_TIMEOUT_MS = "1000";
+  process.env.HF_CORTEX_STREAM = "true";
+  delete process.env.HF_CORTEX_STREAM_URL;
+
+  stubAbcpGet = async (url, { params }) => {
+    if (url === "/search/brands") return { data: [{ brand: "BMW" }] };
+    if (url === "/search/articles") {
+      return {
+        data: [{ isOriginal: true, number: params.number, price: 333, deadline: "6 дней" }],
+      };
+    }
+    return { data: [] };
+  };
+
+  const passes = [
+    [
+      { event: "decision", stage: "PRICING", final: false, decision: { stage: "PRICING" } },
+      {
+        event: "result",
+        result: {
+          action: "abcp_lookup",
+          stage: "PRICING",
+          reply: "Собираю цены",
+          oems: ["AAA111"],
+        },
+      },
+    ],
+    [
+      { event: "decision", stage: "PRICING", final: true, decision: { stage: "PRICING" } },
+      {
+        event: "result",
+        result: {
+          action: "reply",
+          stage: "PRICING",
+          reply: "Нашел предложение",
+          offers: [{ id: 1, price: 333 }],
+        },
+      },
+    ],
+  ];
+  const urls = [];
+  global.fetch = async (url) => {
+    const events = passes[Math.min(urls.length, passes.length - 1)];
+    urls.push(url);
+    return {
+      ok: true,
+      status: 200,
+      statusText: "OK",
+      async text() {
+        return events.map((e) => JSON.stringify(e)).join("\n");
+      },
+    };
+  };
+
+  const { api, calls } = makeApiSpy();
+  const session = {
+    leadId: null,
+    phone: "+79991234567",
+    state: { stage: "NEW", offers: [] },
+  };
+
+  try {
+    const handled = await runCortexTwoPassFlow({
+      api,
+      portalDomain: "audit-two-pass-stream.bitrix24.ru",
+      portalCfg: { baseUrl: "http://127.0.0.1:9/rest", accessToken: "token" },
+      dialogId: "chat-two-007",
+      chatId: "7",
+      text: "AAA111",
+      session,
+    });
+
+    assert.equal(handled, true);
+    // оба прохода идут в потоковый эндпоинт: флоу передаёт onDecision
+    assert.deepEqual(urls, ["http://cortex.test/flow/stream", "http://cortex.test/flow/stream"]);
+    assert.match(String(calls[0].params?.MESSAGE || ""), /Собираю цены/);
+    assert.match(String(calls[1].params?.MESSAGE || ""), /Нашел предложение/);
+  } finally {
+    delete process.env.HF_CORTEX_STREAM;
+  }
+});
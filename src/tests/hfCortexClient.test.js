@@ -3,7 +3,11 @@ import fs from "node:fs";
 import path from "node:path";
 import test from "node:test";
 
-import { callCortexLeadSales } from "../core/hfCortexClient.js";
+import {
+  callCortexLeadSales,
+  getCortexAbcpCache,
+  putCortexAbcpCache,
+} from "../core/hfCortexClient.js";
 
 function withEnv(nextEnv, fn) {
   const prev = {};
@@ -211,3 +215,252 @@ test("hfCortexClient: writes request/response dumps when enabled", async () => {
     },
   );
 });
+
+test("hfCortexClient: session delta mode sends merge patch and resyncs on 409", async () => {
+  await withEnv(
+    {
+      HF_CORTEX_ENABLED: "true",
+      HF_CORTEX_URL: "http://cortex.local/delta",
+      HF_CORTEX_SESSION_DELTA: "true",
+      HF_CORTEX_DUMP: "0",
+    },
+    async () => {
+      const originalFetch = global.fetch;
+      const bodies = [];
+      let nextStatus = [200];
+      global.fetch = async (_url, options) => {
+        bodies.push(JSON.parse(options.body).payload);
+        const status = nextStatus.shift() ?? 200;
+        return {
+          ok: status === 200,
+          status,
+          statusText: status === 200 ? "OK" : "Conflict",
+          text: async () =>
+            status === 200
+              ? JSON.stringify({ ok: true, flow: "lead_sales" })
+              : JSON.stringify({ detail: "session_resync_required" }),
+        };
+      };
+
+      try {
+        const session = { state: { stage: "NEW", offers: [{ id: 1 }] } };
+        await callCortexLeadSales({
+          msg: { text: "a" },
+          sessionSnapshot: session,
+          sessionKey: "p:delta",
+        });
+        assert.deepEqual(bodies[0].sessionSnapshot, session);
+        assert.equal(bodies[0].sessionVersion, 1);
+
+        session.state.stage = "CONTACT";
+        await callCortexLeadSales({
+          msg: { text: "b" },
+          sessionSnapshot: session,
+          sessionKey: "p:delta",
+        });
+        assert.equal("sessionSnapshot" in bodies[1], false);
+        assert.deepEqual(bodies[1].sessionDelta, { state: { stage: "CONTACT" } });
+        assert.equal(bodies[1].sessionBaseVersion, 1);
+
+        nextStatus = [409, 200];
+        session.phone = "+79990001122";
+        const data = await callCortexLeadSales({
+          msg: { text: "c" },
+          sessionSnapshot: session,
+          sessionKey: "p:delta",
+        });
+        assert.equal(data?.ok, true);
+        assert.deepEqual(bodies[2].sessionDelta, { phone: "+79990001122" });
+        assert.deepEqual(bodies[3].sessionSnapshot, session);
+      } finally {
+        global.fetch = originalFetch;
+      }
+    },
+  );
+});
+
+test("hfCortexClient: sends Idempotency-Key header when provided", async () => {
+  await withEnv(
+    {
+      HF_CORTEX_ENABLED: "true",
+      HF_CORTEX_URL: "http://cortex.local/idem",
+      HF_CORTEX_DUMP: "0",
+    },
+    async () => {
+      const originalFetch = global.fetch;
+      const calls = [];
+      global.fetch = async (_url, options) => {
+        calls.push(options);
+        return {
+          ok: true,
+          status: 200,
+          statusText: "OK",
+          text: async () => JSON.stringify({ ok: true }),
+        };
+      };
+
+      try {
+        await callCortexLeadSales({ msg: { text: "a" } }, undefined, {
+          idempotencyKey: "portal:chat:42:first",
+        });
+        await callCortexLeadSales({ msg: { text: "b" } });
+        assert.equal(calls[0].headers["Idempotency-Key"], "portal:chat:42:first");
+        assert.equal("Idempotency-Key" in calls[1].headers, false);
+      } finally {
+        global.fetch = originalFetch;
+      }
+    },
+  );
+});
+
+test("hfCortexClient: stream mode hands decision to onDecision before the result", async () => {
+  await withEnv(
+    {
+      HF_CORTEX_ENABLED: "true",
+      HF_CORTEX_URL: "http://cortex.local/api/hf-cortex/lead_sales/",
+      HF_CORTEX_STREAM: "true",
+      HF_CORTEX_STREAM_URL: undefined,
+      HF_CORTEX_DUMP: "0",
+    },
+    async () => {
+      const originalFetch = global.fetch;
+      const calls = [];
+      const seen = [];
+      const events = [
+        { event: "decision", stage: "PRICING", final: false, decision: { stage: "PRICING" } },
+        { event: "result", ok: true, stage: "CONTACT", decision_changed: ["stage"] },
+      ];
+      const lines = events.map((e) => JSON.stringify(e) + "\n").join("");
+      const bytes = new TextEncoder().encode(lines);
+      global.fetch = async (url, options) => {
+        calls.push({ url, options });
+        return {
+          ok: true,
+          status: 200,
+          statusText: "OK",
+          // кадры режутся посреди строки — как придут из сети
+          body: (async function* () {
+            for (let i = 0; i < bytes.length; i += 7) {
+              seen.push("chunk");
+              yield bytes.slice(i, i + 7);
+            }
+          })(),
+        };
+      };
+
+      try {
+        const data = await callCortexLeadSales({ msg: { text: "a" } }, undefined, {
+          onDecision: (d) => {
+            seen.push(`decision:${d.stage}`);
+            throw new Error("crm down"); // ошибка колбэка не ломает ход
+          },
+        });
+        assert.equal(calls[0].url, "http://cortex.local/api/hf-cortex/lead_sales/stream");
+        assert.equal(data?.stage, "CONTACT");
+        assert.deepEqual(data?.decision_changed, ["stage"]);
+        assert.equal("event" in (data ?? {}), false);
+        const decisionAt = seen.indexOf("decision:PRICING");
+        assert.ok(decisionAt > 0 && decisionAt < seen.length - 1, "decision before the last chunk");
+
+        // без onDecision — обычный эндпоинт
+        global.fetch = async (url) => {
+          calls.push({ url });
+          return { ok: true, status: 200, statusText: "OK", text: async () => '{"ok":true}' };
+        };
+        await callCortexLeadSales({ msg: { text: "b" } });
+        assert.equal(calls[1].url, "http://cortex.local/api/hf-cortex/lead_sales/");
+      } finally {
+        global.fetch = originalFetch;
+      }
+    },
+  );
+});
+
+test("hfCortexClient: price cache helpers are no-op when disabled", async () => {
+  await withEnv(
+    {
+      HF_CORTEX_ENABLED: "true",
+      HF_CORTEX_URL: "http://cortex.local/api/hf-cortex/lead_sales",
+      HF_CORTEX_PRICE_CACHE: undefined,
+    },
+    async () => {
+      const originalFetch = global.fetch;
+      let calls = 0;
+      global.fetch = async () => {
+        calls += 1;
+        throw new Error("must not be called");
+      };
+
+      try {
+        assert.equal(await getCortexAbcpCache("A1"), null);
+        assert.equal(await putCortexAbcpCache("A1", { A1: { offers: [] } }), false);
+        assert.equal(calls, 0);
+      } finally {
+        global.fetch = originalFetch;
+      }
+    },
+  );
+});
+
+test("hfCortexClient: price cache GET/PUT go next to lead_sales endpoint", async () => {
+  await withEnv(
+    {
+      HF_CORTEX_ENABLED: "true",
+      HF_CORTEX_URL: "http://cortex.local/api/hf-cortex/lead_sales",
+      HF_CORTEX_PRICE_CACHE: "true",
+      HF_CORTEX_PRICE_CACHE_URL: undefined,
+      HF_CORTEX_TOKEN: "secret-key",
+    },
+    async () => {
+      const originalFetch = global.fetch;
+      const calls = [];
+      global.fetch = async (url, options) => {
+        calls.push({ url, options });
+        const body =
+          options.method === "GET"
+            ? { ok: true, oem: "A1", status: "stale", abcp: { A1: { offers: [] } }, revalidate: true }
+            : { ok: true, oem: "A1", status: "fresh", fresh_s: 300 };
+        return { ok: true, status: 200, json: async () => body };
+      };
+
+      try {
+        const hit = await getCortexAbcpCache("A 1/2");
+        assert.equal(hit?.status, "stale");
+        assert.equal(hit?.revalidate, true);
+        assert.equal(calls[0].url, "http://cortex.local/api/hf-cortex/abcp_cache/A%201%2F2");
+        assert.equal(calls[0].options.headers["X-HF-CORTEX-TOKEN"], "secret-key");
+
+        const abcp = { A1: { offers: [{ price: 100 }] } };
+        assert.equal(await putCortexAbcpCache("A1", abcp), true);
+        assert.equal(calls[1].options.method, "PUT");
+        assert.deepEqual(JSON.parse(calls[1].options.body), { abcp });
+      } finally {
+        global.fetch = originalFetch;
+      }
+    },
+  );
+});
+
+test("hfCortexClient: price cache errors fall back to null", async () => {
+  await withEnv(
+    {
+      HF_CORTEX_ENABLED: "true",
+      HF_CORTEX_PRICE_CACHE: "true",
+      HF_CORTEX_PRICE_CACHE_URL: "http://cortex.local/cache/",
+    },
+    async () => {
+      const originalFetch = global.fetch;
+      global.fetch = async () => ({ ok: false, status: 404, json: async () => ({}) });
+
+      try {
+        assert.equal(await getCortexAbcpCache("A1"), null);
+        global.fetch = async () => {
+          throw new Error("ECONNREFUSED");
+        };
+        assert.equal(await putCortexAbcpCache("A1", {}), false);
+      } finally {
+        global.fetch = originalFetch;
+      }
+    },
+  );
+});
@@ -96,3 +96,21 @@ test("session shared: normalizeOemCandidates trims/deduplicates and drops empty"
   assert.deepEqual(out, ["AAA111", "BBB222", "12345"]);
   assert.deepEqual(normalizeOemCandidates(null), []);
 });
+
+test("session shared: applyLlmToSession stores versioned cortex facts", () => {
+  const session = { state: { cortex_facts: { v: 1, phone: "+70000000000" } } };
+  const facts = {
+    v: 1,
+    fio: null,
+    phone: "+79991234567",
+    address: null,
+    chosen_offer_id: 2,
+    quantity: 1,
+  };
+
+  applyLlmToSession(session, { facts: { phone: "no-version" } });
+  assert.equal(session.state.cortex_facts.phone, "+70000000000");
+
+  applyLlmToSession(session, { facts });
+  assert.deepEqual(session.state.cortex_facts, facts);
+});